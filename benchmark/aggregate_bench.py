@@ -0,0 +1,74 @@
+"""
+Nested binary calls versus one variadic call, from 10 to 10k arguments.
+
+`max(max(max(x1, x2), x3), ...)` is what users wrote before max took any
+number of arguments; `max(x1, x2, x3, ...)` is the same value in one call.
+Also times `sum` and `stdev` over the same arguments. Arguments are
+distinct expressions of one variable, so nothing is folded at compile
+time. Results are checked by test/test_aggregates.py.
+
+Run with:
+    python -m benchmark.aggregate_bench [largest argument count]
+"""
+import sys
+import time
+from typing import Callable, List
+
+from calculator.stack_queue_calc import StackQueueCalculator
+
+VARIABLES = ("x",)
+X = 0.37
+
+
+def arguments(count: int) -> List[str]:
+    return [f"x*{i % 97 + 1}+{i}" for i in range(count)]
+
+
+def nested(name: str, args: List[str]) -> str:
+    query = args[0]
+    for arg in args[1:]:
+        query = f"{name}({query},{arg})"
+    return query
+
+
+def variadic(name: str, args: List[str]) -> str:
+    return f"{name}({','.join(args)})"
+
+
+def seconds(run: Callable[[], object], repeats: int = 3) -> float:
+    """Best of `repeats` runs."""
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        run()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main() -> None:
+    largest = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+    calc = StackQueueCalculator()
+    binding = {"x": X}
+
+    print(f"{'query':>12} {'args':>6} {'compile us':>11} {'run us':>9}")
+    count = 10
+    while count <= largest:
+        args = arguments(count)
+        queries = {
+            "nested max": nested("max", args),
+            "max": variadic("max", args),
+            "sum": variadic("sum", args),
+            "stdev": variadic("stdev", args),
+        }
+        for label, query in queries.items():
+            compile_time = seconds(lambda: calc.compile(query, VARIABLES))
+            program = calc.compile(query, VARIABLES)
+            for _ in range(10):
+                program.evaluate(binding)  # Past the interpreted warm-up, onto the native code
+            run = seconds(lambda: program.evaluate(binding))
+            print(f"{label:>12} {count:>6} {compile_time * 1e6:>11.0f} {run * 1e6:>9.1f}")
+        count *= 10
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,37 @@
+"""
+Scaling of StackQueueCalculator.evaluate_batch across worker processes.
+
+Run with:
+    python -m benchmark.batch_bench [expressions]
+"""
+import os
+import sys
+import time
+
+from calculator.stack_queue_calc import StackQueueCalculator
+from test.test_cases import test_cases
+
+
+def build_workload(count: int) -> list:
+    """Distinct expressions derived from the test corpus (so the program cache cannot help)."""
+    corpus = [query for query, _ in test_cases]
+    return [f"{corpus[i % len(corpus)]}+{i}" for i in range(count)]
+
+
+def main() -> None:
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    queries = build_workload(count)
+    calc = StackQueueCalculator(cache_size=0)
+    print(f"{count} expressions on {os.cpu_count()} CPU(s)")
+    print(f"{'workers':>8} {'seconds':>10} {'expr/s':>10} {'speedup':>8}")
+    baseline = None
+    for workers in (1, 2, 4, 8):
+        start = time.perf_counter()
+        calc.evaluate_batch(queries, workers=workers)
+        seconds = time.perf_counter() - start
+        baseline = baseline or seconds
+        print(f"{workers:>8} {seconds:>10.3f} {count / seconds:>10.0f} {baseline / seconds:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
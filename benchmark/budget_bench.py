@@ -0,0 +1,82 @@
+"""
+Latency of ordinary requests mixed with expensive ones, with and without a Budget.
+
+A stream of corpus expressions is interleaved with hostile requests: huge
+exact integer powers, very long sums and deeply nested towers. Every
+hostile request is distinct (so caches cannot absorb it) and every one is
+evaluated on the same thread, as one worker of a server would. Reports
+latency percentiles over all requests and the time to reject a hostile
+request.
+
+Run with:
+    python -m benchmark.budget_bench [requests]
+"""
+import math
+import random
+import sys
+import time
+from typing import List, Optional, Tuple
+
+from benchmark.workloads import corpus
+from calculator.stack_queue_calc import StackQueueCalculator
+from calculator.util.budget import Budget, BudgetExceeded
+from calculator.util.session import Session
+
+
+def hostile(i: int) -> str:
+    """An expensive expression, different for every `i`."""
+    kind = i % 3
+    if kind == 0:
+        return f"floor({10 + i % 7})^floor({200_000 + i})"     # ~700k-bit exact integer
+    if kind == 1:
+        return "+".join(f"sin({j % 13 + i})" for j in range(2_000))  # 8k-token expression
+    return "(" * 1_500 + str(i) + "+1)" * 1_500                     # deep nesting
+
+
+def workload(requests: int, hostile_rate: float, seed: int = 3) -> List[Tuple[bool, str]]:
+    rng = random.Random(seed)
+    valid = corpus()
+    return [(True, hostile(i)) if rng.random() < hostile_rate else (False, rng.choice(valid))
+            for i in range(requests)]
+
+
+def run(requests: List[Tuple[bool, str]], budget: Optional[Budget]) -> Tuple[List[float], List[float], int]:
+    """Per-request latencies (seconds), latencies of hostile requests and how many were rejected."""
+    calc = StackQueueCalculator()
+    session = Session(budget=budget)
+    latencies, hostile_latencies = [], []
+    rejected = 0
+    for is_hostile, query in requests:
+        start = time.perf_counter()
+        try:
+            calc.evaluate(query, session=session)
+        except BudgetExceeded:
+            rejected += 1
+        except Exception:
+            pass  # Ordinary errors (the corpus has some) are part of the load
+        elapsed = time.perf_counter() - start
+        latencies.append(elapsed)
+        if is_hostile:
+            hostile_latencies.append(elapsed)
+    return latencies, hostile_latencies, rejected
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, math.ceil(fraction * len(ordered)) - 1)]
+
+
+def main() -> None:
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 3_000
+    requests = workload(count, hostile_rate=0.02)
+    print(f"{count} requests, {sum(h for h, _ in requests)} hostile; latency in microseconds")
+    print(f"{'budget':>8} {'p50':>8} {'p99':>9} {'p99.9':>9} {'max':>9} {'hostile p50':>12} {'rejected':>9}")
+    for label, budget in (("none", None), ("default", Budget())):
+        latencies, hostile_latencies, rejected = run(requests, budget)
+        print(f"{label:>8} {percentile(latencies, 0.5) * 1e6:>8.1f} {percentile(latencies, 0.99) * 1e6:>9.1f} "
+              f"{percentile(latencies, 0.999) * 1e6:>9.1f} {max(latencies) * 1e6:>9.1f} "
+              f"{percentile(hostile_latencies, 0.5) * 1e6:>12.1f} {rejected:>9}")
+
+
+if __name__ == "__main__":
+    main()
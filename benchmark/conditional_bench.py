@@ -0,0 +1,67 @@
+"""
+Eager selection by arithmetic masking versus short-circuit `if`.
+
+A tiered price applies a cheap flat rate to most quantities and an
+expensive volume formula above a threshold. Written without conditionals
+it is `(q > T)*volume + (q <= T)*flat`, which computes both tiers for
+every quantity; `if(q > T, volume, flat)` computes only the tier it
+needs. Times compiled scalar runs and vectorized runs over a batch in
+which `share` of the quantities fall in the expensive tier;
+test/test_conditionals.py checks that both forms give the same prices.
+
+Run with:
+    python -m benchmark.conditional_bench [batch size]
+"""
+import random
+import sys
+import time
+from typing import Callable
+
+import numpy as np
+
+from calculator.stack_queue_calc import StackQueueCalculator
+
+VARIABLES = ("q",)
+THRESHOLD = 1000
+FLAT = "q*2.5"
+VOLUME = "+".join(f"ln(q+{i})*sqrt(q/{i})*exp(-{i}/q)" for i in range(1, 41))
+
+EAGER = f"(q > {THRESHOLD})*({VOLUME}) + (q <= {THRESHOLD})*({FLAT})"
+LAZY = f"if(q > {THRESHOLD}, {VOLUME}, {FLAT})"
+
+
+def seconds(run: Callable[[], object], repeats: int = 3) -> float:
+    """Best of `repeats` runs."""
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        run()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main() -> None:
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 20_000
+    calc = StackQueueCalculator()
+    eager, lazy = calc.compile(EAGER, VARIABLES), calc.compile(LAZY, VARIABLES)
+    rng = random.Random(5)
+
+    print(f"{size} quantities; time in milliseconds")
+    print(f"{'share':>6} {'eager':>9} {'if':>9} {'speedup':>8} {'eager vec':>10} {'if vec':>9} {'speedup':>8}")
+    for share in (0.0, 0.01, 0.1, 0.5, 1.0):
+        quantities = [rng.uniform(THRESHOLD + 1, 10 * THRESHOLD) if rng.random() < share
+                      else rng.uniform(1, THRESHOLD) for _ in range(size)]
+        bindings = [{"q": q} for q in quantities]
+        column = np.array(quantities)
+
+        scalar_eager = seconds(lambda: [eager.evaluate(b) for b in bindings])
+        scalar_lazy = seconds(lambda: [lazy.evaluate(b) for b in bindings])
+        vector_eager = seconds(lambda: calc.evaluate_vectorized(EAGER, q=column))
+        vector_lazy = seconds(lambda: calc.evaluate_vectorized(LAZY, q=column))
+        print(f"{share:>6.2f} {scalar_eager * 1e3:>9.1f} {scalar_lazy * 1e3:>9.1f} "
+              f"{scalar_eager / scalar_lazy:>7.1f}x {vector_eager * 1e3:>10.2f} {vector_lazy * 1e3:>9.2f} "
+              f"{vector_eager / vector_lazy:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Savings from common-subexpression elimination on formulas that repeat subterms.
+
+Compiles each formula with and without CSE and times evaluation over x, y
+on both backends (the postfix interpreter and the native translation).
+
+Run with:
+    python -m benchmark.cse_bench [repeats]
+"""
+import sys
+import time
+from typing import Callable, Dict, List
+
+from benchmark.workloads import repetitive_expressions
+from calculator.stack_queue_calc import StackQueueCalculator
+from calculator.util.postfix_compiler import PostfixCompiler
+from calculator.util.program import CompiledProgram
+
+
+def compile_all(calc: StackQueueCalculator, queries: List[str], cse: bool) -> List[CompiledProgram]:
+    programs = []
+    for query in queries:
+        postfix = calc.optimizer.optimize(calc.parser.parse_postfix(query, ("x", "y")))
+        if cse:
+            postfix = calc.cse.eliminate(postfix)
+        programs.append(CompiledProgram(query, postfix, calc.evaluator, ("x", "y")))
+    return programs
+
+
+def time_runs(runs: List[Callable], repeats: int) -> float:
+    """Microseconds per evaluation."""
+    bindings = [{"x": 0.5 + i / 10, "y": 30.0 + i} for i in range(repeats)]
+    start = time.perf_counter()
+    for run in runs:
+        for variables in bindings:
+            run(variables)
+    return (time.perf_counter() - start) / (len(runs) * repeats) * 1e6
+
+
+def backends(calc: StackQueueCalculator, programs: List[CompiledProgram]) -> Dict[str, List[Callable]]:
+    compiler = PostfixCompiler(calc.evaluator)
+    evaluate = calc.evaluator.evaluate
+    return {
+        "interpreted": [lambda variables, postfix=p.postfix: evaluate(postfix, variables) for p in programs],
+        "native": [compiler.compile(p.postfix, p.variables) for p in programs],
+    }
+
+
+def main() -> None:
+    repeats = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    calc = StackQueueCalculator()
+    queries = repetitive_expressions()
+    plain = compile_all(calc, queries, cse=False)
+    shared = compile_all(calc, queries, cse=True)
+
+    tokens = sum(len(p.postfix) for p in plain) / len(plain)
+    operations = sum(len(p.postfix) for p in shared) / len(shared)
+    print(f"{len(queries)} formulas, postfix length {tokens:.1f} -> {operations:.1f} with CSE")
+    for plain_program, shared_program in zip(plain, shared):
+        assert plain_program.evaluate({"x": 0.7, "y": 12.0}) == shared_program.evaluate({"x": 0.7, "y": 12.0})
+
+    print(f"{'backend':>12} {'plain us':>10} {'cse us':>10} {'speedup':>8}")
+    plain_runs = backends(calc, plain)
+    shared_runs = backends(calc, shared)
+    for backend in plain_runs:
+        before = time_runs(plain_runs[backend], repeats)
+        after = time_runs(shared_runs[backend], repeats)
+        print(f"{backend:>12} {before:>10.2f} {after:>10.2f} {before / after:>8.2f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Error-heavy batches: try/except around evaluate() versus no-raise batch arrays.
+
+Each workload mixes valid corpus expressions with invalid ones (domain
+errors, division by zero, syntax errors) at a given error rate. "repeated"
+rows are drawn from a fixed pool, as in recurring batch jobs; "distinct"
+rows append a unique term so no cache can help. test/test_batch.py checks
+that both batch forms classify every row alike.
+
+Run with:
+    python -m benchmark.error_bench [rows]
+"""
+import math
+import random
+import sys
+import time
+from typing import Callable, List
+
+from calculator.stack_queue_calc import StackQueueCalculator
+from test.test_cases import test_cases
+
+INVALID = [
+    "sqrt(-1)", "recip(0)", "(2+3", "2+*3", "ln(0)", "1/0", "fact(-1)", "2+3)",
+    "sin(", "acos(2)", "nCr(5)", "2 $ 3", "log(-10)*2", "((1+2)*3", "5 % 0",
+]
+
+
+def workload(rows: int, error_rate: float, distinct: bool, seed: int = 7) -> List[str]:
+    rng = random.Random(seed)
+    valid = [query for query, _ in test_cases]
+    queries = []
+    for i in range(rows):
+        query = rng.choice(INVALID) if rng.random() < error_rate else rng.choice(valid)
+        queries.append(f"{query}+{i}" if distinct else query)
+    return queries
+
+
+def try_each(calc: StackQueueCalculator, queries: List[str]) -> List:
+    """What callers do today: one try/except around every evaluate()."""
+    results = []
+    for query in queries:
+        try:
+            results.append(calc.evaluate(query))
+        except Exception as e:
+            results.append(e)
+    return results
+
+
+def timed(run: Callable, calc: StackQueueCalculator, queries: List[str]) -> float:
+    """Best-of-3 microseconds per row; the first pass warms the caches, as a long-running job would."""
+    run(calc, queries)
+    best = math.inf
+    for _ in range(3):
+        start = time.perf_counter()
+        run(calc, queries)
+        best = min(best, time.perf_counter() - start)
+    return best / len(queries) * 1e6
+
+
+def main() -> None:
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 20_000
+    runs = {
+        "try/except": try_each,
+        "evaluate_batch": lambda calc, queries: calc.evaluate_batch(queries),
+        "batch_arrays": lambda calc, queries: calc.evaluate_batch_arrays(queries),
+    }
+    print(f"{rows} rows, microseconds per row")
+    print(f"{'rows':>9} {'errors':>7} " + " ".join(f"{name:>15}" for name in runs) + f" {'speedup':>8}")
+    for distinct in (False, True):
+        for error_rate in (0.0, 0.05, 0.5):
+            queries = workload(rows, error_rate, distinct)
+            times = [timed(run, StackQueueCalculator(), queries) for run in runs.values()]
+            label = "distinct" if distinct else "repeated"
+            print(f"{label:>9} {error_rate:>7.0%} " + " ".join(f"{t:>15.2f}" for t in times)
+                  + f" {times[1] / times[2]:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+"""
+Interpreter vs native backend for cached programs.
+
+Run with:
+    python -m benchmark.native_bench
+"""
+import timeit
+
+from calculator.stack_queue_calc import StackQueueCalculator
+
+FORMULAS = [
+    "2*sin(x)+y^2",
+    "sqrt(x^2 + y^2)",
+    "1000*(1 + x/12)^(12*y)",
+    "0.5*x*y^2",
+    "(ln(x/95) + (0.05 + y^2/2)*1)/(y*sqrt(1))",
+    "x*cos(rad(45)) - y*sin(rad(45))",
+    "e(-(x-0)^2/(2*y^2))/sqrt(2*pi*y^2)",
+    "((2+x)*4-5)/6+y^2-8*9+10",
+]
+VALUES = {"x": 100.0, "y": 0.2}
+
+
+def main(number: int = 20_000) -> None:
+    calc = StackQueueCalculator()
+    print(f"{'formula':<45} {'interp us':>10} {'native us':>10} {'speedup':>8}")
+    total_interp = total_native = 0.0
+    for formula in FORMULAS:
+        program = calc.compile(formula, VALUES.keys())
+        evaluator = calc.evaluator
+        postfix = program.postfix
+        interp = timeit.timeit(lambda: evaluator.evaluate(postfix, VALUES), number=number) / number
+        program.compile_native()
+        native = timeit.timeit(lambda: program.evaluate(VALUES), number=number) / number
+        total_interp += interp
+        total_native += native
+        print(f"{formula:<45} {interp * 1e6:>10.2f} {native * 1e6:>10.2f} {interp / native:>8.2f}")
+    print(f"{'total':<45} {total_interp * 1e6:>10.2f} {total_native * 1e6:>10.2f} "
+          f"{total_interp / total_native:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Postfix lists versus compact opcode programs.
+
+For every workload, measures the memory held by the compiled form (list of
+tokens vs. OpcodeProgram arrays, via tracemalloc) and the time to interpret
+it (PostfixEvaluator vs. OpcodeEvaluator); test/test_opcodes.py checks
+that both give the same results. Constant folding is skipped: most workloads are constant-only and would
+fold to one number, while stored formulas usually depend on variables.
+
+Run with:
+    python -m benchmark.opcode_bench [repeats]
+"""
+import sys
+import time
+import tracemalloc
+from typing import Callable, List
+
+from benchmark.workloads import all_workloads, repetitive_expressions
+from calculator.stack_queue_calc import StackQueueCalculator
+from calculator.util.cse import Load, Store
+
+VARIABLES = ("x", "y")
+BINDING = {"x": 0.7, "y": 42.0}
+
+
+def allocated(build: Callable[[], List]) -> int:
+    """Bytes still allocated by the objects `build` returns."""
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    objects = build()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del objects
+    return after - before
+
+
+def fresh_copy(postfix: List) -> List:
+    """Copy of `postfix` owning its own number and marker objects, as a freshly parsed list does."""
+    copy = []
+    for token in postfix:
+        if isinstance(token, (int, float)):
+            token = type(token)(repr(token)) if isinstance(token, float) else int(str(token))
+        elif isinstance(token, (Store, Load)):
+            token = type(token)(token.slot)
+        copy.append(token)
+    return copy
+
+
+def per_run(run: Callable, programs: List, repeats: int) -> float:
+    """Microseconds per program run."""
+    start = time.perf_counter()
+    for _ in range(repeats):
+        for program in programs:
+            run(program, BINDING)
+    return (time.perf_counter() - start) / (repeats * len(programs)) * 1e6
+
+
+def main() -> None:
+    repeats = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    calc = StackQueueCalculator()
+    evaluator = calc.evaluator
+    opcodes = evaluator.opcodes
+    workloads = all_workloads()
+    workloads["repetitive"] = repetitive_expressions()
+
+    print(f"{'workload':>16} {'tokens':>7} {'list B':>8} {'opcode B':>9} {'ratio':>6} "
+          f"{'list us':>9} {'opcode us':>10} {'speedup':>8}")
+    for name, queries in workloads.items():
+        postfixes = []
+        for query in queries:
+            try:
+                postfix = calc.cse.eliminate(calc.parser.parse_postfix(query, VARIABLES))
+                evaluator.evaluate(postfix, BINDING)
+            except Exception:
+                continue  # Failing expressions are covered elsewhere
+            postfixes.append(postfix)
+
+        list_bytes = allocated(lambda: [fresh_copy(p) for p in postfixes])
+        code_bytes = allocated(lambda: [opcodes.assemble(p, VARIABLES) for p in postfixes])
+        programs = [opcodes.assemble(p, VARIABLES) for p in postfixes]
+        list_us = per_run(evaluator.evaluate, postfixes, repeats)
+        code_us = per_run(opcodes.evaluate, programs, repeats)
+        tokens = sum(map(len, postfixes)) / len(postfixes)
+        print(f"{name:>16} {tokens:>7.1f} {list_bytes / len(postfixes):>8.0f} {code_bytes / len(postfixes):>9.0f} "
+              f"{list_bytes / code_bytes:>6.1f} {list_us:>9.2f} {code_us:>10.2f} {list_us / code_us:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
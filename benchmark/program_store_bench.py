@@ -0,0 +1,75 @@
+"""
+Cold versus warm start for a catalogue of formulas.
+
+Cold: a calculator compiles every formula from text. Warm: a new
+calculator loads the same programs from a ProgramStore written by an
+earlier "process" (fresh store object, freshly mapped file and registry
+fingerprint recomputed). test/test_program_store.py checks that loaded
+programs are identical.
+
+Run with:
+    python -m benchmark.program_store_bench [catalogue size]
+"""
+import os
+import shutil
+import sys
+import tempfile
+import time
+from typing import List
+
+from benchmark.workloads import corpus, repetitive_expressions
+from calculator.funtions.registry import FunctionRegistry
+from calculator.stack_queue_calc import StackQueueCalculator
+from calculator.util.program_store import ProgramStore
+
+VARIABLES = ("x", "y")
+
+
+def catalogue(size: int) -> List[str]:
+    """Distinct formulas over x and y, half of them short, plus the constant-only corpus."""
+    calc = StackQueueCalculator()
+    formulas = (repetitive_expressions(size // 2, terms=4, seed=11)
+                + repetitive_expressions(size - size // 2, terms=12, seed=12))
+    for query in corpus():
+        try:
+            calc.compile(query, VARIABLES)
+        except Exception:
+            continue  # The corpus includes expressions that are expected to fail
+        formulas.append(query)
+    return formulas
+
+
+def compile_all(calc: StackQueueCalculator, formulas: List[str]) -> List:
+    return [calc.compile(query, VARIABLES).postfix for query in formulas]
+
+
+def main() -> None:
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    formulas = catalogue(size)
+    directory = tempfile.mkdtemp(prefix="calc-programs-")
+    try:
+        start = time.perf_counter()
+        cold = compile_all(StackQueueCalculator(), formulas)
+        cold_seconds = time.perf_counter() - start
+
+        with ProgramStore(directory) as store:
+            compile_all(StackQueueCalculator(program_store=store), formulas)
+        file_bytes = sum(os.path.getsize(os.path.join(directory, name)) for name in os.listdir(directory))
+
+        FunctionRegistry.for_unit(StackQueueCalculator().angle_unit)._fingerprint = None
+        start = time.perf_counter()
+        store = ProgramStore(directory)
+        compile_all(StackQueueCalculator(program_store=store), formulas)
+        warm_seconds = time.perf_counter() - start
+
+        print(f"{len(formulas)} formulas, {sum(map(len, cold))} postfix tokens")
+        print(f"{'cold compile':>14}: {cold_seconds * 1e3:8.1f} ms")
+        print(f"{'warm load':>14}: {warm_seconds * 1e3:8.1f} ms  ({cold_seconds / warm_seconds:.1f}x)")
+        print(f"{'store size':>14}: {file_bytes / 1024:8.1f} KiB")
+        print(f"store: {store.stats()}")
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+    main()
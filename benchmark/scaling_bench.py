@@ -0,0 +1,102 @@
+"""
+Compile and run time per token for expressions of 1k to 1M tokens.
+
+Each shape stresses a different part of the parser: a long flat sum,
+deeply nested parentheses, a right-associative power tower, a chain of
+unary minus and nested function calls. For a linear pipeline the time per
+token stays flat as the expression grows; the "ratio" column is the time
+per token relative to the smallest size. Inputs are given both as str and
+as UTF-8 bytes (memoryview), which is decoded once; test/test_parser.py
+checks that both give the same programs.
+
+Run with:
+    python -m benchmark.scaling_bench [largest token count]
+"""
+import sys
+import time
+from typing import Callable, Dict
+
+from calculator.stack_queue_calc import StackQueueCalculator
+
+VARIABLES = ("x",)
+BINDING = {"x": 0.5}
+
+
+def flat(tokens: int) -> str:
+    """x*1 + x*2 - x*3 + ..., four tokens per term."""
+    terms = [f"x*{i % 9 + 1}" for i in range(max(1, tokens // 4))]
+    return "".join(("+" if i % 2 else "-") + term if i else term for i, term in enumerate(terms))
+
+
+def nested(tokens: int) -> str:
+    """((((x+1)*2+1)*2 ...), six tokens per level."""
+    depth = max(1, tokens // 6)
+    return "(" * depth + "x" + "+1)*2" * depth
+
+
+def tower(tokens: int) -> str:
+    """x^1^1^...^1, right-associative, two tokens per level."""
+    return "x" + "^1" * max(1, tokens // 2)
+
+
+def negations(tokens: int) -> str:
+    """---...-x"""
+    return "-" * max(1, tokens - 1) + "x"
+
+
+def calls(tokens: int) -> str:
+    """abs(abs(...(x)...)), three tokens per call."""
+    depth = max(1, tokens // 3)
+    return "abs(" * depth + "x" + ")" * depth
+
+
+SHAPES: Dict[str, Callable[[int], str]] = {
+    "flat": flat,
+    "nested": nested,
+    "tower": tower,
+    "negations": negations,
+    "calls": calls,
+}
+
+
+def seconds(run: Callable[[], object], repeats: int) -> float:
+    """Best of `repeats` runs."""
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        run()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main() -> None:
+    largest = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    sizes = []
+    size = 1000
+    while size <= largest:
+        sizes.append(size)
+        size *= 10
+
+    calc = StackQueueCalculator()
+    print(f"{'shape':>10} {'tokens':>9} {'parse ns':>9} {'bytes ns':>9} {'compile ns':>11} "
+          f"{'run ns':>8} {'ratio':>6}")
+    for name, shape in SHAPES.items():
+        base = None
+        for size in sizes:
+            query = shape(size)
+            data = memoryview(query.encode())
+            repeats = 3 if size <= 100_000 else 1
+            parse = seconds(lambda: calc.parser.parse_postfix(query, VARIABLES), repeats)
+            parse_bytes = seconds(lambda: calc.parser.parse_postfix(data, VARIABLES), repeats)
+            compile_time = seconds(lambda: calc.compile(query, VARIABLES), repeats)
+            program = calc.compile(data, VARIABLES)
+            run = seconds(lambda: program.evaluate(BINDING), repeats)
+            per_token = [t / size * 1e9 for t in (parse, parse_bytes, compile_time, run)]
+            if base is None:
+                base = per_token[2]
+            print(f"{name:>10} {size:>9} {per_token[0]:>9.0f} {per_token[1]:>9.0f} {per_token[2]:>11.0f} "
+                  f"{per_token[3]:>8.0f} {per_token[2] / base:>6.2f}")
+
+
+if __name__ == "__main__":
+    main()
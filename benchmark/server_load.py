@@ -0,0 +1,117 @@
+"""
+Load generator for the JSON-lines evaluation server.
+
+Opens `--connections` concurrent clients, each sending `--requests`
+expressions one at a time (closed loop), and reports throughput and
+p50/p90/p99 latency. Without --port or --unix a server is started in a
+background thread of this process.
+
+Run with:
+    python -m benchmark.server_load [--connections 32] [--requests 200] [--unique]
+    python -m benchmark.server_load --port 8765      # against `calculator.py serve`
+"""
+import argparse
+import asyncio
+import json
+import os
+import threading
+import time
+from typing import List, Optional, Tuple
+
+from benchmark.workloads import corpus
+from calculator.server import CalculatorServer
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    index = min(len(sorted_values) - 1, int(fraction * len(sorted_values)))
+    return sorted_values[index]
+
+
+async def client(host: str, port: Optional[int], unix_path: Optional[str],
+                 queries: List[str], latencies: List[float]) -> int:
+    """Send `queries` sequentially over one connection; return the number of error responses."""
+    if unix_path:
+        reader, writer = await asyncio.open_unix_connection(unix_path)
+    else:
+        reader, writer = await asyncio.open_connection(host, port)
+    errors = 0
+    clock = time.perf_counter
+    for request_id, query in enumerate(queries):
+        start = clock()
+        writer.write(json.dumps({"id": request_id, "expr": query}).encode() + b"\n")
+        await writer.drain()
+        response = json.loads(await reader.readline())
+        latencies.append(clock() - start)
+        errors += "error" in response
+    writer.close()
+    await writer.wait_closed()
+    return errors
+
+
+async def run_load(args: argparse.Namespace, port: Optional[int]) -> None:
+    expressions = corpus()
+    latencies: List[float] = []
+    jobs = []
+    for connection in range(args.connections):
+        queries = []
+        for i in range(args.requests):
+            query = expressions[(connection + i) % len(expressions)]
+            queries.append(f"{query}+{connection * args.requests + i}" if args.unique else query)
+        jobs.append(client(args.host, port, args.unix, queries, latencies))
+
+    start = time.perf_counter()
+    errors = sum(await asyncio.gather(*jobs))
+    seconds = time.perf_counter() - start
+
+    latencies.sort()
+    print(f"{len(latencies)} requests over {args.connections} connections "
+          f"on {os.cpu_count()} CPU(s), {errors} error responses")
+    print(f"{'seconds':>10} {'req/s':>10} {'p50 ms':>8} {'p90 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+    print(f"{seconds:>10.3f} {len(latencies) / seconds:>10.0f} "
+          f"{percentile(latencies, 0.50) * 1e3:>8.3f} {percentile(latencies, 0.90) * 1e3:>8.3f} "
+          f"{percentile(latencies, 0.99) * 1e3:>8.3f} {latencies[-1] * 1e3:>8.3f}")
+
+
+def start_local_server(workers: int, max_pending: int) -> Tuple[CalculatorServer, int]:
+    """Run a server on an ephemeral port in a daemon thread with its own event loop."""
+    server = CalculatorServer(workers=workers, max_pending=max_pending)
+    ready = threading.Event()
+    bound = {}
+
+    async def main():
+        listener = await server.start_tcp("127.0.0.1", 0)
+        bound["port"] = listener.sockets[0].getsockname()[1]
+        ready.set()
+        async with listener:
+            await listener.serve_forever()
+
+    threading.Thread(target=asyncio.run, args=(main(),), daemon=True).start()
+    ready.wait()
+    return server, bound["port"]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, help="connect to a running server instead of starting one")
+    parser.add_argument("--unix", metavar="PATH", help="connect to a running server's Unix socket")
+    parser.add_argument("--connections", type=int, default=32)
+    parser.add_argument("--requests", type=int, default=200, help="requests per connection")
+    parser.add_argument("--unique", action="store_true",
+                        help="make every expression distinct so nothing is coalesced or cached")
+    parser.add_argument("--workers", type=int, default=4, help="threads for the in-process server")
+    parser.add_argument("--max-pending", type=int, default=256)
+    args = parser.parse_args()
+
+    server = None
+    port = args.port
+    if port is None and args.unix is None:
+        server, port = start_local_server(args.workers, args.max_pending)
+
+    asyncio.run(run_load(args, port))
+    if server is not None:
+        print(f"server: {server.stats()}")
+
+
+if __name__ == "__main__":
+    main()
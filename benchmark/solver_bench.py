@@ -0,0 +1,100 @@
+"""
+Root-finding and minimization on compiled expressions.
+
+Solves a family of problems, one per parameter value, four ways: Brent's
+method driving calc.evaluate() from outside (parse-cache lookup and
+variable dictionary per step, the way a caller would without solve()),
+solve() with Brent's method and with safeguarded Newton on the compiled
+program, and solve_vectorized() over the whole family at once. Then the
+same for minimize(). Reports time per problem, mean steps and program
+runs, and the largest difference between the methods' answers.
+
+Run with:
+    python -m benchmark.solver_bench [problems]
+"""
+import sys
+import time
+from typing import Callable
+
+import numpy as np
+
+from calculator.stack_queue_calc import StackQueueCalculator
+from calculator.util.solver import brent_minimum, brent_root
+
+ROOTS = [
+    ("x^3-2*x-a", (1.0, 4.0)),
+    ("cos(x)-a*x", (0.0, 2.0)),
+    ("x*exp(x)-a-1", (0.0, 3.0)),
+    ("ln(1+x^2)+atan(x)-a-1", (0.0, 5.0)),
+]
+MINIMA = [
+    ("(x-a)^2+sin(x)/2", (-3.0, 3.0)),
+    ("cosh(x-a)+x^2/10", (-5.0, 5.0)),
+    ("x^4-3*x^2+a*x", (0.2, 3.0)),
+]
+
+
+def seconds(run: Callable[[], object], repeats: int = 3) -> float:
+    """Best of `repeats` runs."""
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        run()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main() -> None:
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    calc = StackQueueCalculator()
+    parameters = np.linspace(0.1, 0.9, count)
+
+    print(f"{count} problems each; time per problem in microseconds, then mean steps / program runs")
+    header = (f"{'expression':<24} {'outer loop':>10} {'brent':>8} {'newton':>8} {'batch':>7} "
+              f"{'brent it/ev':>12} {'newton it/ev':>13} {'batch passes':>13} {'max diff':>9}")
+    print(header)
+    for query, bracket in ROOTS:
+        def outer():
+            return [brent_root(lambda x: calc.evaluate(query, {"x": x, "a": a}), *bracket, 2e-12, 100)[0]
+                    for a in parameters]
+
+        solve = lambda method: [calc.solve(query, "x", bracket, variables={"a": a}, method=method)
+                                for a in parameters]
+        batch = lambda: calc.solve_vectorized(query, "x", bracket, variables={"a": parameters})
+        times = [seconds(outer), seconds(lambda: solve("brent")), seconds(lambda: solve("newton")),
+                 seconds(batch)]
+        brent, newton, vectorized = solve("brent"), solve("newton"), batch()
+        reference = np.array([r.x for r in brent])
+        difference = max(np.max(np.abs(np.array(outer()) - reference)),
+                         np.max(np.abs(np.array([r.x for r in newton]) - reference)),
+                         np.max(np.abs(vectorized.x - reference)))
+        print(f"{query:<24} " + " ".join(f"{t / count * 1e6:>{w}.1f}" for t, w in zip(times, (10, 8, 8, 7)))
+              + f" {np.mean([r.iterations for r in brent]):>5.1f}/{np.mean([r.evaluations for r in brent]):<6.1f}"
+              f" {np.mean([r.iterations for r in newton]):>6.1f}/{np.mean([r.evaluations for r in newton]):<6.1f}"
+              f" {vectorized.evaluations:>13} {difference:>9.1e}")
+
+    print()
+    print(header.replace("newton", "secant"))
+    for query, bracket in MINIMA:
+        def outer():
+            return [brent_minimum(lambda x: calc.evaluate(query, {"x": x, "a": a}), *bracket, 1e-10, 100)[0]
+                    for a in parameters]
+
+        minimize = lambda method: [calc.minimize(query, "x", bracket, variables={"a": a}, method=method)
+                                   for a in parameters]
+        batch = lambda: calc.minimize_vectorized(query, "x", bracket, variables={"a": parameters})
+        times = [seconds(outer), seconds(lambda: minimize("brent")), seconds(lambda: minimize("secant")),
+                 seconds(batch)]
+        brent, secant, vectorized = minimize("brent"), minimize("secant"), batch()
+        # Brent's minimizer only locates the minimum to about 1e-8
+        reference = np.array([r.x for r in secant])
+        difference = max(np.max(np.abs(np.array([r.x for r in brent]) - reference)),
+                         np.max(np.abs(vectorized.x - reference)))
+        print(f"{query:<24} " + " ".join(f"{t / count * 1e6:>{w}.1f}" for t, w in zip(times, (10, 8, 8, 7)))
+              + f" {np.mean([r.iterations for r in brent]):>5.1f}/{np.mean([r.evaluations for r in brent]):<6.1f}"
+              f" {np.mean([r.iterations for r in secant]):>6.1f}/{np.mean([r.evaluations for r in secant]):<6.1f}"
+              f" {vectorized.evaluations:>13} {difference:>9.1e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+"""
+Per-stage benchmark suite with JSON results and baseline regression checks.
+
+Run with:
+    python -m benchmark.suite --save results.json
+    python -m benchmark.suite --baseline results.json --threshold 0.10
+
+Exits with status 1 when any stage is slower than the baseline by more than
+the threshold.
+"""
+import argparse
+import json
+import platform
+import statistics
+import sys
+import time
+from typing import Callable, Dict, List
+
+from benchmark.workloads import all_workloads
+from calculator.stack_queue_calc import StackQueueCalculator
+
+STAGES = ("tokenize", "implicit_mult", "convert", "parse", "optimize", "evaluate", "end_to_end")
+
+
+def _time(func: Callable, inputs: List, repeat: int) -> float:
+    """Median seconds to apply `func` to every input once."""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for item in inputs:
+            func(item)
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples)
+
+
+def _prepare(calc: StackQueueCalculator, queries: List[str]) -> Dict[str, List]:
+    """Run the pipeline once so every stage can be timed on its real input."""
+    tokens = [calc.tokenizer.tokenize(q) for q in queries]
+    with_mult = [calc.add_implicit_multiplication(t) for t in tokens]
+    postfix = [calc.parser.parse_postfix(q) for q in queries]
+    return {"tokens": tokens, "with_mult": with_mult, "postfix": postfix}
+
+
+def _safe(func: Callable) -> Callable:
+    """Benchmark inputs may include domain errors; time the failure path too."""
+    def call(item):
+        try:
+            func(item)
+        except (ValueError, ZeroDivisionError, OverflowError):
+            pass
+    return call
+
+
+def run_workload(queries: List[str], repeat: int) -> Dict[str, Dict[str, float]]:
+    calc = StackQueueCalculator(cache_size=0)
+    data = _prepare(calc, queries)
+    timings = {
+        "tokenize": _time(calc.tokenizer.tokenize, queries, repeat),
+        "implicit_mult": _time(calc.add_implicit_multiplication, data["tokens"], repeat),
+        "convert": _time(calc.postfix_converter.convert, data["with_mult"], repeat),
+        "parse": _time(calc.parser.parse_postfix, queries, repeat),
+        "optimize": _time(calc.optimizer.optimize, data["postfix"], repeat),
+        "evaluate": _time(_safe(calc.evaluator.evaluate), data["postfix"], repeat),
+        "end_to_end": _time(_safe(calc.evaluate), queries, repeat),
+    }
+    count = len(queries)
+    return {
+        stage: {"seconds": seconds, "us_per_expr": seconds / count * 1e6}
+        for stage, seconds in timings.items()
+    }
+
+
+def run_suite(repeat: int = 5) -> Dict:
+    workloads = all_workloads()
+    return {
+        "meta": {
+            "python": platform.python_version(),
+            "implementation": platform.python_implementation(),
+            "machine": platform.machine(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "repeat": repeat,
+            "sizes": {name: len(queries) for name, queries in workloads.items()},
+        },
+        "results": {name: run_workload(queries, repeat) for name, queries in workloads.items()},
+    }
+
+
+def compare(current: Dict, baseline: Dict, threshold: float) -> List[str]:
+    """Return a description of every stage slower than baseline by more than `threshold`."""
+    regressions = []
+    for workload, stages in current["results"].items():
+        for stage, timing in stages.items():
+            base = baseline.get("results", {}).get(workload, {}).get(stage)
+            if not base or base["us_per_expr"] <= 0:
+                continue
+            ratio = timing["us_per_expr"] / base["us_per_expr"]
+            if ratio > 1 + threshold:
+                regressions.append(f"{workload}/{stage}: {base['us_per_expr']:.2f}us -> "
+                                   f"{timing['us_per_expr']:.2f}us ({ratio:.2f}x)")
+    return regressions
+
+
+def print_report(current: Dict, baseline: Dict = None) -> None:
+    header = f"{'workload':<16}" + "".join(f"{stage:>14}" for stage in STAGES)
+    print("us per expression" + (" (ratio vs baseline)" if baseline else ""))
+    print(header)
+    for workload, stages in current["results"].items():
+        row = f"{workload:<16}"
+        for stage in STAGES:
+            value = stages[stage]["us_per_expr"]
+            cell = f"{value:.1f}"
+            base = (baseline or {}).get("results", {}).get(workload, {}).get(stage)
+            if base and base["us_per_expr"] > 0:
+                cell += f" ({value / base['us_per_expr']:.2f})"
+            row += f"{cell:>14}"
+        print(row)
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5, help="runs per measurement (median is kept)")
+    parser.add_argument("--save", help="write results as JSON to this path")
+    parser.add_argument("--baseline", help="compare against a JSON file written by --save")
+    parser.add_argument("--threshold", type=float, default=0.10,
+                        help="allowed slowdown before a stage counts as a regression (default 0.10)")
+    args = parser.parse_args(argv)
+
+    current = run_suite(args.repeat)
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as handle:
+            baseline = json.load(handle)
+
+    print_report(current, baseline)
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as handle:
+            json.dump(current, handle, indent=2)
+
+    if baseline:
+        regressions = compare(current, baseline, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) above {args.threshold:.0%}:")
+            for line in regressions:
+                print(f"  {line}")
+            return 1
+        print(f"\nNo regressions above {args.threshold:.0%}.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,78 @@
+"""
+Throughput of one shared StackQueueCalculator driven from many threads.
+
+Every thread has its own Session and evaluates the same amount of work, so
+ideal scaling keeps per-thread time flat and total throughput linear in the
+thread count. That only happens on a free-threaded build (python3.13t); with
+the GIL the numbers show the serialisation instead. test/test_threads.py
+checks that sessions never see each other's `ans`.
+
+Run with:
+    python -m benchmark.threads_bench [evaluations per thread]
+"""
+import sys
+import threading
+import time
+from typing import Callable
+
+from benchmark.workloads import corpus
+from calculator.stack_queue_calc import StackQueueCalculator
+from calculator.util.session import Session
+
+
+def run_threads(threads: int, work: Callable[[int], None]) -> float:
+    barrier = threading.Barrier(threads + 1)
+
+    def worker(index: int) -> None:
+        barrier.wait()
+        work(index)
+
+    pool = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    for thread in pool:
+        thread.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for thread in pool:
+        thread.join()
+    return time.perf_counter() - start
+
+
+def main() -> None:
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 50_000
+    calc = StackQueueCalculator()
+    queries = [q for q in corpus() if 'ans' not in q and 'rand' not in q]
+    programs = []
+    for query in queries:
+        try:
+            program = calc.compile(query)
+            program.compile_native()
+            programs.append(program)
+            calc.evaluate(query)
+        except Exception:
+            pass  # The corpus includes expressions that are expected to fail
+    usable = [p.source for p in programs]
+
+    def evaluate_work(index: int) -> None:
+        session = Session()
+        for i in range(count):
+            calc.evaluate(usable[i % len(usable)], session=session)
+
+    def program_work(index: int) -> None:
+        session = Session()
+        for i in range(count):
+            programs[i % len(programs)].evaluate(session=session)
+
+    gil = getattr(sys, "_is_gil_enabled", lambda: True)()
+    print(f"{count} evaluations per thread, GIL {'enabled' if gil else 'disabled'}")
+    print(f"{'mode':>10} {'threads':>8} {'seconds':>10} {'eval/s':>12} {'scaling':>8}")
+    for mode, work in (("evaluate", evaluate_work), ("program", program_work)):
+        baseline = None
+        for threads in (1, 2, 4, 8):
+            seconds = run_threads(threads, work)
+            rate = threads * count / seconds
+            baseline = baseline or rate
+            print(f"{mode:>10} {threads:>8} {seconds:>10.3f} {rate:>12.0f} {rate / baseline:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
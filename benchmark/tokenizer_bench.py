@@ -0,0 +1,55 @@
+"""
+Tokenizer throughput on long generated expressions, before and after NameTrie.
+
+"before" is BaselineTokenizer (benchmark/baseline_tokenizer.py), the linear
+scans over the name tables that NameTrie replaced, on the same registry.
+
+Run with:
+    python -m benchmark.tokenizer_bench
+"""
+import time
+
+from benchmark.baseline_tokenizer import BaselineTokenizer
+from calculator.stack_queue_calc import StackQueueCalculator
+
+TERMS = ["sin(0.5)", "2pi", "sqrt(16)", "log2(8)", "3.25", "e^2", "nCr(10,3)", "-cos(1)", "tau"]
+
+
+def build_expression(length: int) -> str:
+    """Build a syntactically valid expression of roughly `length` characters."""
+    parts = []
+    size = 0
+    i = 0
+    while size < length:
+        term = TERMS[i % len(TERMS)]
+        parts.append(term)
+        size += len(term) + 1
+        i += 1
+    return "+".join(parts)
+
+
+def bench_tokenize(tokenizer, expr: str, repeat: int = 5) -> float:
+    """Best-of-`repeat` wall time for a single tokenize call."""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        tokenizer.tokenize(expr)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main() -> None:
+    calc = StackQueueCalculator()
+    registry = calc.registry
+    baseline = BaselineTokenizer(registry.functions, registry.binary_functions, registry.constants)
+    print(f"{'chars':>10} {'before ns/char':>15} {'after ns/char':>14} {'after MB/s':>11} {'speedup':>8}")
+    for length in (1_000, 10_000, 100_000):
+        expr = build_expression(length)
+        before = bench_tokenize(baseline, expr)
+        after = bench_tokenize(calc.tokenizer, expr)
+        print(f"{len(expr):>10} {before / len(expr) * 1e9:>15.0f} {after / len(expr) * 1e9:>14.0f} "
+              f"{len(expr) / after / 1e6:>11.2f} {before / after:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
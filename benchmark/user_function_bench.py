@@ -0,0 +1,73 @@
+"""
+Cost of calling a user-defined function versus writing its body out.
+
+The same formula is evaluated three ways over a range of variable values:
+written out by hand, through a small user function (inlined into the
+calling program) and through a user function whose body is too large to
+inline (called as one compiled function). Reports compile time and run
+time per evaluation; test/test_user_functions.py checks that all three
+agree.
+
+Run with:
+    python -m benchmark.user_function_bench [evaluations]
+"""
+import sys
+import time
+from typing import Callable
+
+from calculator.funtions.user_function import UserFunction
+from calculator.stack_queue_calc import StackQueueCalculator
+
+BODY = "0.5*m*v^2 + m*9.81*h"
+HAND_WRITTEN = "0.5*x*y^2 + x*9.81*z + sqrt(x)"
+VARIABLES = ("x", "y", "z")
+
+
+def padded(body: str) -> str:
+    """`body` plus terms that add nothing, enough to exceed the inlining limit."""
+    terms = (UserFunction.INLINE_MAX_NODES // 4) + 1
+    return body + "".join(f" + 0*m*{i}" for i in range(terms))
+
+
+def seconds(run: Callable[[], object], repeats: int = 5) -> float:
+    """Best of `repeats` runs."""
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        run()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main() -> None:
+    evaluations = int(sys.argv[1]) if len(sys.argv) > 1 else 20_000
+    calc = StackQueueCalculator()
+    calc.define("energy(m, v, h)", BODY)
+    large = calc.define("energy_called(m, v, h)", padded(BODY))
+    assert large.body is None, "padding no longer exceeds the inlining limit"
+
+    queries = {
+        "hand-written": HAND_WRITTEN,
+        "inlined": "energy(x, y, z) + sqrt(x)",
+        "called": "energy_called(x, y, z) + sqrt(x)",
+    }
+    bindings = [{"x": 1 + i % 50, "y": i % 7 * 0.5, "z": i % 11} for i in range(evaluations)]
+
+    print(f"{evaluations} evaluations per query")
+    print(f"{'query':>13} {'compile us':>11} {'run ns/eval':>12} {'postfix':>8}")
+    for label, query in queries.items():
+        compile_time = seconds(lambda: calc.compile(query, VARIABLES))
+        program = calc.compile(query, VARIABLES)
+
+        def run() -> None:
+            for binding in bindings:
+                program.evaluate(binding)
+
+        run()  # Past the interpreted warm-up, onto the native code
+        elapsed = seconds(run)
+        print(f"{label:>13} {compile_time * 1e6:>11.1f} {elapsed / evaluations * 1e9:>12.0f} "
+              f"{len(program.postfix):>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""Expression workloads shared by the benchmarks."""
+import random
+from typing import Dict, List
+
+from test.test_cases import test_cases
+
+FUNCTIONS = ["sin", "cos", "tan", "sqrt", "abs", "ln", "log", "log2", "atan", "sinh", "cosh", "cbrt"]
+BINARY_FUNCTIONS = ["nCr", "nPr", "hypot", "max", "min", "gcd", "lcm", "logb"]
+OPERATORS = ["+", "-", "*", "/"]
+
+
+def corpus() -> List[str]:
+    """The correctness corpus from test/test_cases.py."""
+    return [query for query, _ in test_cases]
+
+
+def _number(rng: random.Random) -> str:
+    return str(rng.choice([rng.randint(1, 99), round(rng.uniform(1, 99), 3)]))
+
+
+def long_expressions(count: int = 20, terms: int = 400, seed: int = 1) -> List[str]:
+    """Flat arithmetic chains of `terms` operands."""
+    rng = random.Random(seed)
+    result = []
+    for _ in range(count):
+        parts = [_number(rng)]
+        for _ in range(terms - 1):
+            parts.append(rng.choice(OPERATORS))
+            parts.append(_number(rng))
+        result.append("".join(parts))
+    return result
+
+
+def nested_expressions(count: int = 50, depth: int = 60, seed: int = 2) -> List[str]:
+    """Deeply nested parentheses and unary function calls."""
+    rng = random.Random(seed)
+    result = []
+    for _ in range(count):
+        expression = _number(rng)
+        for _ in range(depth):
+            if rng.random() < 0.5:
+                expression = f"abs({expression})"
+            else:
+                expression = f"({expression}{rng.choice(OPERATORS[:3])}{_number(rng)})"
+        result.append(expression)
+    return result
+
+
+def function_heavy_expressions(count: int = 200, calls: int = 20, seed: int = 3) -> List[str]:
+    """Sums of unary and binary function calls."""
+    rng = random.Random(seed)
+    result = []
+    for _ in range(count):
+        parts = []
+        for _ in range(calls):
+            if rng.random() < 0.7:
+                parts.append(f"{rng.choice(FUNCTIONS)}({_number(rng)})")
+            else:
+                parts.append(f"{rng.choice(BINARY_FUNCTIONS)}({rng.randint(10, 20)},{rng.randint(2, 9)})")
+        result.append("+".join(parts))
+    return result
+
+
+def implicit_multiplication_expressions(count: int = 200, factors: int = 20, seed: int = 4) -> List[str]:
+    """Products written without '*', e.g. 2(3+1)(4)sin(1)."""
+    rng = random.Random(seed)
+    result = []
+    for _ in range(count):
+        parts = [_number(rng)]
+        for _ in range(factors):
+            choice = rng.random()
+            if choice < 0.4:
+                parts.append(f"({_number(rng)}+{_number(rng)})")
+            elif choice < 0.7:
+                parts.append(f"{rng.choice(FUNCTIONS[:3])}({_number(rng)})")
+            else:
+                parts.append(f"({_number(rng)})")
+        result.append("".join(parts))
+    return result
+
+
+SUBTERMS = ["sqrt(x/9.8)", "sin(rad(y))", "cos(rad(y))", "(x+y)^2", "e(-x/2)", "ln(1+x^2)", "hypot(x,y)"]
+
+
+def repetitive_expressions(count: int = 200, terms: int = 16, pool: int = 3, seed: int = 5) -> List[str]:
+    """Formulas over x and y that reuse a few subterms many times, e.g. sqrt(x/9.8)."""
+    rng = random.Random(seed)
+    result = []
+    for _ in range(count):
+        chosen = rng.sample(SUBTERMS, pool)
+        parts = [rng.choice(chosen)]
+        for _ in range(terms - 1):
+            parts.append(rng.choice(OPERATORS[:3]))
+            parts.append(f"{_number(rng)}*{rng.choice(chosen)}")
+        result.append("".join(parts))
+    return result
+
+
+def all_workloads() -> Dict[str, List[str]]:
+    return {
+        "corpus": corpus(),
+        "long": long_expressions(),
+        "nested": nested_expressions(),
+        "function_heavy": function_heavy_expressions(),
+        "implicit_mult": implicit_multiplication_expressions(),
+    }
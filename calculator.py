@@ -1,9 +1,7 @@
+import sys
 
-from calculator.stack_queue_calc import StackQueueCalculator
-from test.calculator_tester import print_results, run_tests
+from calculator.cli import main
 
 
 if __name__ == "__main__":
-    calc = StackQueueCalculator()
-    results = run_tests(calc)
-    print_results(results)
+    sys.exit(main())
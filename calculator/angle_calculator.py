@@ -1,6 +1,17 @@
 from calculator.enum.angle import AngleUnit
 from calculator.stack_queue_calc import StackQueueCalculator
 
+ANGLE_UNITS = {
+    "radians": AngleUnit.RADIANS,
+    "rad": AngleUnit.RADIANS,
+    "degrees": AngleUnit.DEGREES,
+    "deg": AngleUnit.DEGREES,
+    "gradians": AngleUnit.GRADIANS,
+    "grad": AngleUnit.GRADIANS,
+    "turns": AngleUnit.TURNS,
+    "turn": AngleUnit.TURNS,
+}
+
 
 def create_calculator(angle_unit: str = "radians") -> StackQueueCalculator:
     """
@@ -12,17 +23,6 @@ def create_calculator(angle_unit: str = "radians") -> StackQueueCalculator:
     Returns:
         Configured StackQueueCalculator instance
     """
-    unit_map = {
-        "radians": AngleUnit.RADIANS,
-        "rad": AngleUnit.RADIANS,
-        "degrees": AngleUnit.DEGREES,
-        "deg": AngleUnit.DEGREES,
-        "gradians": AngleUnit.GRADIANS,
-        "grad": AngleUnit.GRADIANS,
-        "turns": AngleUnit.TURNS,
-        "turn": AngleUnit.TURNS,
-    }
-    
-    unit = unit_map.get(angle_unit.lower(), AngleUnit.RADIANS)
+    unit = ANGLE_UNITS.get(angle_unit.lower(), AngleUnit.RADIANS)
     return StackQueueCalculator(unit)
 
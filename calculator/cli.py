@@ -0,0 +1,138 @@
+import argparse
+import asyncio
+import sys
+from typing import Iterable, Iterator, List, Optional, TextIO
+
+from calculator.angle_calculator import ANGLE_UNITS, create_calculator
+from calculator.util.batch import BatchError, iter_batch
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="calculator.py",
+        description="Scientific calculator. Runs the test suite when no command is given.",
+    )
+    commands = parser.add_subparsers(dest="command")
+
+    commands.add_parser("test", help="run the built-in test suite (default)")
+
+    stream = commands.add_parser(
+        "stream",
+        help="evaluate one expression per line from files or stdin",
+        description="Evaluate one expression per input line and write one result per "
+                    "output line, in input order. Failed lines print 'error: <type>: <message>'.",
+    )
+    stream.add_argument("files", nargs="*", default=["-"],
+                        help="input files ('-' or none for stdin)")
+    stream.add_argument("--workers", type=int, default=1,
+                        help="worker processes for parallel evaluation (default: 1)")
+    stream.add_argument("--chunksize", type=int, default=None,
+                        help="lines per worker task (default: 1 in-process, 512 with workers)")
+    stream.add_argument("--angle", default="radians", type=str.lower, choices=ANGLE_UNITS,
+                        help="angle unit: radians, degrees, gradians or turns")
+
+    serve = commands.add_parser(
+        "serve",
+        help="run the JSON-lines evaluation server",
+        description="Serve {\"id\": ..., \"expr\": ...} requests, one JSON object per line, "
+                    "over TCP or a Unix socket. Each connection has its own ans/memory session.",
+    )
+    serve.add_argument("--host", default="127.0.0.1", help="TCP address (default: 127.0.0.1)")
+    serve.add_argument("--port", type=int, default=8765, help="TCP port (default: 8765)")
+    serve.add_argument("--unix", metavar="PATH", help="listen on a Unix socket instead of TCP")
+    serve.add_argument("--workers", type=int, default=4,
+                       help="evaluation threads (default: 4)")
+    serve.add_argument("--max-pending", type=int, default=256,
+                       help="queued evaluations before clients are throttled (default: 256)")
+    serve.add_argument("--angle", default="radians", type=str.lower, choices=ANGLE_UNITS,
+                       help="initial angle unit: radians, degrees, gradians or turns")
+    serve.add_argument("--program-cache", metavar="DIR",
+                       help="load compiled programs from DIR and save new ones there on shutdown")
+    serve.add_argument("--max-steps", type=int, metavar="N",
+                       help="reject expressions that compile to more than N operations")
+    serve.add_argument("--max-int-bits", type=int, metavar="N",
+                       help="reject expressions known to build integers larger than N bits")
+    return parser
+
+
+def read_lines(paths: Iterable[str], stdin: TextIO) -> Iterator[str]:
+    """Yield input lines lazily, one at a time, without their line endings."""
+    for path in paths:
+        if path == "-":
+            for line in stdin:
+                yield line.rstrip("\r\n")
+        else:
+            with open(path, encoding="utf-8") as handle:
+                for line in handle:
+                    yield line.rstrip("\r\n")
+
+
+def format_result(result) -> str:
+    if isinstance(result, BatchError):
+        return f"error: {result.error_type}: {result.message}"
+    return repr(result)
+
+
+def stream(args: argparse.Namespace, stdin: TextIO, stdout: TextIO) -> int:
+    """Evaluate expressions as they arrive, keeping memory bounded by the chunk window."""
+    calc = create_calculator(args.angle)
+    chunksize = args.chunksize or (1 if args.workers == 1 else 512)
+    interactive = stdin.isatty() if hasattr(stdin, "isatty") else False
+
+    for result in iter_batch(calc, read_lines(args.files, stdin), args.workers, chunksize):
+        stdout.write(format_result(result))
+        stdout.write("\n")
+        if interactive:
+            stdout.flush()
+    stdout.flush()
+    return 0
+
+
+def server_budget(args: argparse.Namespace):
+    """The Budget for `serve`: only the limits given on the command line, or None."""
+    from calculator.util.budget import Budget
+
+    if args.max_steps is None and args.max_int_bits is None:
+        return None
+    return Budget(max_length=None, max_steps=args.max_steps, max_work=None, max_int_bits=args.max_int_bits)
+
+
+def run_server(args: argparse.Namespace) -> int:
+    from calculator.server import CalculatorServer, serve
+    from calculator.util.program_store import ProgramStore
+
+    angle_unit = ANGLE_UNITS[args.angle]
+    store = ProgramStore(args.program_cache) if args.program_cache else None
+    server = CalculatorServer(angle_unit, workers=args.workers, max_pending=args.max_pending,
+                              program_store=store, budget=server_budget(args))
+    try:
+        asyncio.run(serve(server, args.host, args.port, args.unix))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+def run_test_suite() -> int:
+    """The expression corpus (test/test_cases.py), then the unit tests in test/test_*.py."""
+    import os
+    import unittest
+
+    import test
+    from calculator.stack_queue_calc import StackQueueCalculator
+    from test.calculator_tester import print_results, run_tests
+
+    results = run_tests(StackQueueCalculator())
+    print_results(results)
+    directory = os.path.dirname(os.path.abspath(test.__file__))
+    suite = unittest.defaultTestLoader.discover(directory, top_level_dir=os.path.dirname(directory))
+    units = unittest.TextTestRunner(verbosity=1).run(suite)
+    return 0 if results.failed == 0 and results.errors == 0 and units.wasSuccessful() else 1
+
+
+def main(argv: Optional[List[str]] = None, stdin: TextIO = None, stdout: TextIO = None) -> int:
+    args = build_parser().parse_args(argv)
+    if args.command == "stream":
+        return stream(args, stdin or sys.stdin, stdout or sys.stdout)
+    if args.command == "serve":
+        return run_server(args)
+    return run_test_suite()
@@ -0,0 +1,30 @@
+from enum import IntEnum
+
+from calculator.util.budget import BudgetExceeded
+
+
+class ErrorCode(IntEnum):
+    """Why an expression failed, as reported by no-raise batch evaluation."""
+    OK = 0
+    SYNTAX = 1          # ValueError while parsing (has a position)
+    DOMAIN = 2          # ValueError from a function, e.g. sqrt(-1)
+    ZERO_DIVISION = 3   # ZeroDivisionError, e.g. 1/0 or recip(0)
+    OVERFLOW = 4        # OverflowError, including results too large for a float
+    TYPE = 5            # TypeError, including non-real results such as (-8)^(1/3)
+    OTHER = 6           # Any other exception
+    BUDGET = 7          # BudgetExceeded: rejected by the session's Budget without running
+
+    @classmethod
+    def classify(cls, error: BaseException, parsing: bool = False) -> "ErrorCode":
+        """Code for an exception raised while parsing (`parsing`) or evaluating."""
+        if isinstance(error, BudgetExceeded):
+            return cls.BUDGET
+        if isinstance(error, ZeroDivisionError):
+            return cls.ZERO_DIVISION
+        if isinstance(error, ValueError):
+            return cls.SYNTAX if parsing else cls.DOMAIN
+        if isinstance(error, OverflowError):
+            return cls.OVERFLOW
+        if isinstance(error, TypeError):
+            return cls.TYPE
+        return cls.OTHER
@@ -0,0 +1,184 @@
+import math
+from types import MappingProxyType
+from typing import Callable, List, Mapping, Sequence
+
+from calculator.enum.angle import AngleUnit
+from calculator.funtions.vectorized_functions import require_numpy
+from calculator.util.angle_converter import AngleConverter
+from calculator.util.cse import COMPARISONS
+
+
+class Derivatives:
+    """
+    Derivative rules for every function and operator, for forward-mode differentiation.
+
+    `unary[name](x, y)` is the derivative of y = name(x). `binary[name]`
+    is a pair of rules (a, b, y) -> ∂y/∂a and (a, b, y) -> ∂y/∂b, so a
+    partial is only computed for an argument that depends on a variable.
+    `variadic[name](values, y)` returns one partial per argument.
+
+    Rules are written with plain arithmetic and the function table they
+    are given, so the same rules serve scalars (MathFunctions) and arrays
+    (VectorizedDerivatives); trigonometric rules carry the factor that
+    converts the calculator's angle unit to radians. Functions in CONSTANT
+    are step functions or defined on integers only: their derivative is
+    zero wherever they are defined, and they have no rule.
+    """
+
+    CONSTANT = frozenset({'floor', 'ceil', 'round', 'trunc', 'sign', 'not', 'fact', 'rand',
+                          'nPr', 'nCr', 'gcd', *COMPARISONS})
+
+    def __init__(self, functions: Mapping[str, Callable], variadic_functions: Mapping[str, Callable],
+                 angle_unit: AngleUnit = AngleUnit.RADIANS):
+        self.functions = functions
+        self.variadic_functions = variadic_functions
+        k = AngleConverter.to_radians(1.0, angle_unit)  # d(radians)/d(angle in the calculator's unit)
+        sqrt, ln, sign, floor = functions['sqrt'], functions['ln'], functions['sign'], functions['floor']
+        sin, cos = functions['sin'], functions['cos']
+        sinh, cosh, tanh = functions['sinh'], functions['cosh'], functions['tanh']
+        ln10, ln2 = math.log(10), math.log(2)
+
+        self.unary: Mapping[str, Callable] = MappingProxyType({
+            'recip': lambda x, y: -y * y,
+            'sqrt': lambda x, y: 0.5 / y,
+            'cbrt': lambda x, y: 1 / (3 * y * y),
+            'e': lambda x, y: y,
+            'exp': lambda x, y: y,
+            'exp10': lambda x, y: y * ln10,
+            'ln': lambda x, y: 1 / x,
+            'log': lambda x, y: 1 / (x * ln10),
+            'log2': lambda x, y: 1 / (x * ln2),
+            'rad': lambda x, y: math.pi / 180,
+            'deg': lambda x, y: 180 / math.pi,
+            'sin': lambda x, y: k * cos(x),
+            'cos': lambda x, y: -k * sin(x),
+            'tan': lambda x, y: k * (1 + y * y),
+            'csc': lambda x, y: -k * y * y * cos(x),
+            'sec': lambda x, y: k * y * y * sin(x),
+            'cot': lambda x, y: -k * (1 + y * y),
+            'asin': lambda x, y: 1 / (k * sqrt(1 - x * x)),
+            'acos': lambda x, y: -1 / (k * sqrt(1 - x * x)),
+            'atan': lambda x, y: 1 / (k * (1 + x * x)),
+            'acsc': lambda x, y: -1 / (k * abs(x) * sqrt(x * x - 1)),
+            'asec': lambda x, y: 1 / (k * abs(x) * sqrt(x * x - 1)),
+            'acot': lambda x, y: -1 / (k * (1 + x * x)),
+            'sinh': lambda x, y: cosh(x),
+            'cosh': lambda x, y: sinh(x),
+            'tanh': lambda x, y: 1 - y * y,
+            'csch': lambda x, y: -y * y * cosh(x),
+            'sech': lambda x, y: -y * tanh(x),
+            'coth': lambda x, y: 1 - y * y,
+            'asinh': lambda x, y: 1 / sqrt(x * x + 1),
+            'acosh': lambda x, y: 1 / sqrt(x * x - 1),
+            'atanh': lambda x, y: 1 / (1 - x * x),
+            'acsch': lambda x, y: -1 / (abs(x) * sqrt(1 + x * x)),
+            'asech': lambda x, y: -1 / (x * sqrt(1 - x * x)),
+            'acoth': lambda x, y: 1 / (1 - x * x),
+            'abs': lambda x, y: sign(x),
+        })
+
+        one = lambda a, b, y: 1.0
+        self.binary: Mapping[str, tuple] = MappingProxyType({
+            '+': (one, one),
+            '-': (one, lambda a, b, y: -1.0),
+            '*': (lambda a, b, y: b, lambda a, b, y: a),
+            '/': (lambda a, b, y: 1 / b, lambda a, b, y: -y / b),
+            '%': (one, lambda a, b, y: -floor(a / b)),
+            '^': (self._power_base, self._power_exponent),
+            'pow': (self._power_base, self._power_exponent),
+            'logb': (lambda x, base, y: 1 / (x * ln(base)), lambda x, base, y: -y / (base * ln(base))),
+            'nrt': (lambda x, n, y: y / (n * x), lambda x, n, y: -y * ln(abs(x)) / (n * n)),
+            'atan2': (lambda a, b, y: b / (k * (a * a + b * b)), lambda a, b, y: -a / (k * (a * a + b * b))),
+            'hypot': (lambda a, b, y: a / y, lambda a, b, y: b / y),
+            # The first argument wins ties, as it does in max() and min()
+            'max': (lambda a, b, y: (a >= b) * 1.0, lambda a, b, y: (a < b) * 1.0),
+            'min': (lambda a, b, y: (a <= b) * 1.0, lambda a, b, y: (a > b) * 1.0),
+            'lcm': (lambda a, b, y: self._lcm_partial(a, y), lambda a, b, y: self._lcm_partial(b, y)),
+        })
+
+        self.variadic: Mapping[str, Callable] = MappingProxyType({
+            'sum': lambda values, y: [1.0] * len(values),
+            'mean': lambda values, y: [1.0 / len(values)] * len(values),
+            'variance': self._variance,
+            'stdev': lambda values, y: [partial / (2 * y) for partial in self._variance(values, y)],
+            'median': self._median,
+            'max': self._extreme,
+            'min': self._extreme,
+            'lcm': lambda values, y: [self._lcm_partial(x, y) for x in values],
+        })
+
+    def _power_base(self, a, b, y):
+        return 0.0 if b == 0 else b * a ** (b - 1)
+
+    def _power_exponent(self, a, b, y):
+        # a^b for a negative base is only real at integer b: no derivative in b
+        return 0.0 if a == 0 else y * self.functions['ln'](a)
+
+    def _lcm_partial(self, x, y):
+        # lcm is |product of its arguments| over a gcd of their rounded values, which is
+        # locally constant; so ∂y/∂x = y/x, and 0 where an argument (hence y) is zero
+        return 0.0 if y == 0 else y / x
+
+    def _variance(self, values: Sequence, y) -> List:
+        mean = self.variadic_functions['mean'](*values)
+        scale = 2 / (len(values) - 1)
+        return [scale * (x - mean) for x in values]
+
+    def _median(self, values: Sequence, y) -> List:
+        order = sorted(range(len(values)), key=values.__getitem__)
+        partials = [0.0] * len(values)
+        middle = len(values) // 2
+        if len(values) % 2:
+            partials[order[middle]] = 1.0
+        else:
+            partials[order[middle - 1]] = partials[order[middle]] = 0.5
+        return partials
+
+    @staticmethod
+    def _extreme(values: Sequence, y) -> List:
+        """Partials of max or min: the first argument equal to the result."""
+        partials = [0.0] * len(values)
+        partials[values.index(y)] = 1.0
+        return partials
+
+
+class VectorizedDerivatives(Derivatives):
+    """Derivatives over NumPy arrays: the rules that select an argument or branch work elementwise."""
+
+    def __init__(self, functions: Mapping[str, Callable], variadic_functions: Mapping[str, Callable],
+                 angle_unit: AngleUnit = AngleUnit.RADIANS):
+        self.np = require_numpy()
+        super().__init__(functions, variadic_functions, angle_unit)
+
+    def _power_base(self, a, b, y):
+        np = self.np
+        return np.where(np.equal(b, 0), 0.0, b * np.power(np.asarray(a, dtype=float), b - 1))
+
+    def _power_exponent(self, a, b, y):
+        np = self.np
+        return np.where(np.equal(a, 0), 0.0, y * self.functions['ln'](a))
+
+    def _lcm_partial(self, x, y):
+        np = self.np
+        zero = np.equal(y, 0)
+        return np.where(zero, 0.0, y / np.where(zero, 1.0, x))
+
+    def _median(self, values: Sequence, y) -> List:
+        np = self.np
+        stacked = np.stack(np.broadcast_arrays(*values))
+        order = np.argsort(stacked, axis=0, kind='stable')
+        index = np.arange(len(values)).reshape((-1,) + (1,) * (stacked.ndim - 1))
+        middle = len(values) // 2
+        if len(values) % 2:
+            return list((index == order[middle]) * 1.0)
+        return list(((index == order[middle - 1]) | (index == order[middle])) * 0.5)
+
+    def _extreme(self, values: Sequence, y) -> List:
+        np = self.np
+        partials = []
+        taken = np.zeros(np.shape(y), dtype=bool)
+        for x in values:
+            first = np.equal(x, y) & ~taken
+            taken |= first
+            partials.append(first * 1.0)
+        return partials
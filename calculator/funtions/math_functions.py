@@ -1,9 +1,23 @@
+import functools
 import math
 
 
 class MathFunctions:
     """Repository of mathematical functions with error handling."""
     
+    # Largest exact integer power computed, in bits (about 315,000 digits)
+    MAX_EXACT_BITS = 1 << 20
+    # Combinatorics results beyond this many bits cannot become a float
+    _FLOAT_BITS = 1100
+    
+    @staticmethod
+    def exact_power(x, y):
+        """x ** y, refusing integer powers too large to compute in reasonable time."""
+        if (type(x) is int and type(y) is int and y > 0 and
+                (x.bit_length() - 1) * y > MathFunctions.MAX_EXACT_BITS):
+            raise OverflowError(f"Integer power too large: about {(x.bit_length() - 1) * y} bits")
+        return x ** y
+    
     @staticmethod
     def safe_reciprocal(x: float) -> float:
         if x == 0:
@@ -73,6 +87,10 @@ class MathFunctions:
             raise ValueError("Permutation requires non-negative integers")
         if r > n:
             raise ValueError(f"Invalid permutation: r ({r}) cannot exceed n ({n})")
+        # Every factor is at least n - r + 1; the lgamma difference alone cancels out for huge n
+        size = max(math.lgamma(n + 1) - math.lgamma(n - r + 1), r * math.log(n - r + 1))
+        if size / math.log(2) > MathFunctions._FLOAT_BITS:
+            raise OverflowError("int too large to convert to float")  # Without computing it first
         return float(math.perm(int(n), int(r)))
     
     @staticmethod
@@ -83,6 +101,12 @@ class MathFunctions:
             raise ValueError("Combination requires non-negative integers")
         if r > n:
             raise ValueError(f"Invalid combination: r ({r}) cannot exceed n ({n})")
+        # nCk is at least (n/k)^k for k = min(r, n - r), which survives the lgamma cancellation
+        k = min(r, n - r)
+        size = max(math.lgamma(n + 1) - math.lgamma(r + 1) - math.lgamma(n - r + 1),
+                   k * math.log(n / k) if k else 0.0)
+        if size / math.log(2) > MathFunctions._FLOAT_BITS:
+            raise OverflowError("int too large to convert to float")  # Without computing it first
         return float(math.comb(int(n), int(r)))
     
     @staticmethod
@@ -98,4 +122,68 @@ class MathFunctions:
         if x == 0 or y == 0:
             return 0.0
         return abs(x * y) / math.gcd(int(round(x)), int(round(y)))
+    
+    # Variadic functions: one pass over any number of values
+    
+    @staticmethod
+    def total(*values: float) -> float:
+        """Correctly rounded sum (math.fsum)."""
+        return math.fsum(values)
+    
+    @staticmethod
+    def mean(*values: float) -> float:
+        return math.fsum(values) / len(values)
+    
+    @staticmethod
+    def _welford(values) -> tuple:
+        """(count, mean, sum of squared deviations) in one numerically stable pass."""
+        count = 0
+        mean = 0.0
+        squares = 0.0
+        for x in values:
+            count += 1
+            delta = x - mean
+            mean += delta / count
+            squares += delta * (x - mean)
+        return count, mean, squares
+    
+    @staticmethod
+    def variance(*values: float) -> float:
+        """Sample variance."""
+        count, _, squares = MathFunctions._welford(values)
+        if count < 2:
+            raise ValueError("variance requires at least two values")
+        return squares / (count - 1)
+    
+    @staticmethod
+    def stdev(*values: float) -> float:
+        """Sample standard deviation."""
+        count, _, squares = MathFunctions._welford(values)
+        if count < 2:
+            raise ValueError("stdev requires at least two values")
+        return math.sqrt(squares / (count - 1))
+    
+    @staticmethod
+    def median(*values: float) -> float:
+        ordered = sorted(values)
+        middle = len(ordered) // 2
+        if len(ordered) % 2:
+            return float(ordered[middle])
+        return (ordered[middle - 1] + ordered[middle]) / 2
+    
+    @staticmethod
+    def maximum(*values: float) -> float:
+        return max(values)
+    
+    @staticmethod
+    def minimum(*values: float) -> float:
+        return min(values)
+    
+    @staticmethod
+    def gcd_of(*values: float) -> float:
+        return functools.reduce(MathFunctions.safe_gcd, values, 0.0)
+    
+    @staticmethod
+    def lcm_of(*values: float) -> float:
+        return functools.reduce(MathFunctions.safe_lcm, values, 1.0)
 
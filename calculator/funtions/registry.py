@@ -0,0 +1,456 @@
+import copy
+import hashlib
+import importlib
+import math
+import operator
+import random
+import sys
+import threading
+from types import MappingProxyType
+from typing import Callable, Dict, FrozenSet, Iterable, Mapping, Optional, Tuple
+
+from calculator.enum.angle import AngleUnit
+from calculator.funtions.derivatives import Derivatives, VectorizedDerivatives
+from calculator.funtions.hyperbolic_functions import HyperbolicFunctions
+from calculator.funtions.math_functions import MathFunctions
+from calculator.funtions.trigo_function import TrigFunctions
+from calculator.funtions.user_function import UserFunction
+from calculator.funtions.vectorized_functions import (
+    VectorizedHyperbolicFunctions,
+    VectorizedMathFunctions,
+    VectorizedTrigFunctions,
+    require_numpy,
+)
+from calculator.util.cse import SubexpressionEliminator
+from calculator.util.dual_eval import DualEvaluator, VectorizedDualEvaluator
+from calculator.util.memoize import MemoizedFunction
+from calculator.util.parser import Parser
+from calculator.util.postfix_converter import PostfixConverter
+from calculator.util.postfix_eval import PostfixEvaluator
+from calculator.util.postfix_optimizer import PostfixOptimizer
+from calculator.util.session import Session
+from calculator.util.tokenizer import Tokenizer
+from calculator.util.vectorized_eval import VectorizedEvaluator
+
+
+class FunctionRegistry:
+    """
+    Immutable table of functions, constants and pipeline components for one angle unit.
+
+    Registries are built once per process and shared by every calculator, so
+    creating a calculator or switching its angle unit is a dictionary lookup.
+    Nothing here refers to per-user state, so they are safe to share across
+    threads. Use FunctionRegistry.for_unit() rather than the constructor.
+    """
+
+    # Constants whose value belongs to a Session and is read at run time
+    DYNAMIC_CONSTANTS: Mapping[str, Callable[[Session], float]] = MappingProxyType({
+        'ans': operator.attrgetter('ans'),
+    })
+
+    # Pure functions costly enough that caching their results pays off
+    MEMOIZE_BY_DEFAULT: FrozenSet[str] = frozenset({
+        'fact', 'nPr', 'nCr', 'logb', 'nrt',
+        'asin', 'acos', 'atan', 'acsc', 'asec', 'acot',
+    })
+
+    # Modules whose code decides what a query compiles to; part of the fingerprint
+    FINGERPRINT_MODULES = (
+        'calculator.funtions.registry',
+        'calculator.funtions.math_functions',
+        'calculator.funtions.trigo_function',
+        'calculator.funtions.hyperbolic_functions',
+        'calculator.funtions.user_function',
+        'calculator.util.angle_converter',
+        'calculator.util.name_trie',
+        'calculator.util.tokenizer',
+        'calculator.util.parser',
+        'calculator.util.postfix_eval',
+        'calculator.util.postfix_optimizer',
+        'calculator.util.cse',
+    )
+
+    _instances: Dict[AngleUnit, "FunctionRegistry"] = {}
+    _lock = threading.Lock()
+
+    @classmethod
+    def for_unit(cls, angle_unit: AngleUnit) -> "FunctionRegistry":
+        """Return the shared registry for `angle_unit`, building it on first use."""
+        registry = cls._instances.get(angle_unit)
+        if registry is None:
+            with cls._lock:
+                registry = cls._instances.get(angle_unit)
+                if registry is None:
+                    registry = cls(angle_unit)
+                    cls._instances[angle_unit] = registry
+        return registry
+
+    def __init__(self, angle_unit: AngleUnit):
+        self.angle_unit = angle_unit
+        self.math_funcs = MathFunctions()
+        self.trig_funcs = TrigFunctions(angle_unit)
+        self.hyp_funcs = HyperbolicFunctions()
+
+        self._initialize_functions()
+        self._initialize_constants()
+
+        self.constant_names: FrozenSet[str] = frozenset(self.constants) | frozenset(self.DYNAMIC_CONSTANTS)
+        self.dynamic_constants = self.DYNAMIC_CONSTANTS
+        self.user_functions: Mapping[str, UserFunction] = MappingProxyType({})
+        self.memoized_functions: Mapping[str, MemoizedFunction] = MappingProxyType({})
+        self._build_pipeline()
+        self._fingerprint: Optional[str] = None
+        self._vectorized = None
+        self._vectorized_lock = threading.Lock()
+
+    def _build_pipeline(self) -> None:
+        """(Re)build the stages that depend on the function tables."""
+        self.all_functions: FrozenSet[str] = (frozenset(self.functions) | frozenset(self.binary_functions)
+                                              | frozenset(self.variadic_functions)
+                                              | frozenset(Tokenizer.CONDITIONALS)
+                                              | frozenset(self.user_functions))
+        # The pipeline only depends on names and pure functions, so it is shared as well
+        self.tokenizer = Tokenizer(self.functions, self.binary_functions, self.constants,
+                                   self.dynamic_constants.keys(), self.user_functions,
+                                   self.variadic_functions)
+        self.postfix_converter = PostfixConverter(
+            set(self.functions.keys()) | set(self.user_functions.keys()),
+            set(self.binary_functions.keys()),
+            set(self.dynamic_constants.keys()),
+            set(self.variadic_functions.keys())
+        )
+        self.parser = Parser(self.tokenizer)
+        self.evaluator = PostfixEvaluator(self.functions, self.binary_functions, self.dynamic_constants,
+                                          self.user_functions, self.variadic_functions)
+        self.optimizer = PostfixOptimizer(self.evaluator, self.impure_functions)
+        self.dual_evaluator = DualEvaluator(self.evaluator, Derivatives(self.functions, self.variadic_functions,
+                                                                        self.angle_unit))
+        self.cse = SubexpressionEliminator(self.functions.keys(), self.binary_functions.keys(),
+                                           self.impure_functions, self.user_functions)
+
+    def memoized(self, names: Optional[Iterable[str]] = None, maxsize: int = 256) -> "FunctionRegistry":
+        """
+        Copy of this registry whose functions `names` cache their results.
+        
+        Args:
+            names: Functions to memoize (default: MEMOIZE_BY_DEFAULT). Impure
+                functions such as `rand` are rejected.
+            maxsize: LRU size of each function's cache
+            
+        Returns:
+            A new registry with its own caches; this one is left untouched
+        """
+        names = self.MEMOIZE_BY_DEFAULT if names is None else frozenset(names)
+        unknown = names - self.functions.keys() - self.binary_functions.keys()
+        if unknown:
+            raise ValueError(f"Unknown function(s): {', '.join(sorted(unknown))}")
+        impure = names & self.impure_functions
+        if impure:
+            raise ValueError(f"Cannot memoize impure function(s): {', '.join(sorted(impure))}")
+        
+        registry = copy.copy(self)
+        memoized = {}
+        for table in (self.functions, self.binary_functions):
+            for name in names & table.keys():
+                memoized[name] = MemoizedFunction(name, table[name], maxsize)
+        registry.memoized_functions = MappingProxyType(memoized)
+        registry.functions = MappingProxyType({name: memoized.get(name, function)
+                                               for name, function in self.functions.items()})
+        registry.binary_functions = MappingProxyType({name: memoized.get(name, function)
+                                                      for name, function in self.binary_functions.items()})
+        registry._build_pipeline()
+        return registry
+
+    def with_function(self, name: str, parameters: Tuple[str, ...], source: str) -> "FunctionRegistry":
+        """
+        Copy of this registry with the user-defined function `name(*parameters) = source`.
+        
+        The body may call built-in functions and functions defined earlier;
+        it is compiled now against this registry. Redefining a user function
+        replaces it in the copy.
+        
+        Raises:
+            ValueError: if `name` or a parameter clashes with a built-in
+                name, or the body does not compile
+        """
+        if (name in self.functions or name in self.binary_functions or name in self.variadic_functions
+                or name in Tokenizer.CONDITIONALS or name in self.constant_names):
+            raise ValueError(f"Cannot redefine built-in name: {name!r}")
+        for parameter in parameters:
+            if parameter in self.all_functions or parameter == name:
+                raise ValueError(f"Parameter name clashes with function: {parameter!r}")
+        function = UserFunction.compile(self, name, parameters, source)
+        
+        registry = copy.copy(self)
+        registry.user_functions = MappingProxyType({**self.user_functions, name: function})
+        registry.impure_functions = (self.impure_functions | {name} if function.impure
+                                     else self.impure_functions - {name})
+        registry._build_pipeline()
+        registry._fingerprint = None
+        registry._vectorized = None
+        registry._vectorized_lock = threading.Lock()
+        return registry
+
+    @property
+    def fingerprint(self) -> str:
+        """
+        Hex digest of everything that decides what a query compiles to.
+        
+        Covers the angle unit, function and constant names, constant values,
+        user-defined functions, the Python version and the source of
+        FINGERPRINT_MODULES, so programs
+        persisted by other code (see ProgramStore) are never reused.
+        Memoized copies share the fingerprint of the registry they wrap.
+        """
+        if self._fingerprint is None:
+            digest = hashlib.sha256()
+            digest.update(f"{sys.implementation.name}-{sys.version_info[:2]}-{self.angle_unit.value}".encode())
+            for names in (self.functions, self.binary_functions, self.variadic_functions,
+                          self.impure_functions, self.dynamic_constants):
+                digest.update(b'\0' + '\0'.join(sorted(names)).encode())
+            for name, function in self.user_functions.items():  # In definition order
+                digest.update(f"\0{name}({','.join(function.parameters)})={function.source}".encode())
+            for name, value in sorted(self.constants.items()):
+                digest.update(f"\0{name}={value!r}".encode())
+            for module_name in self.FINGERPRINT_MODULES:
+                with open(importlib.import_module(module_name).__file__, 'rb') as f:
+                    digest.update(f.read())
+            self._fingerprint = digest.hexdigest()
+        return self._fingerprint
+
+    @property
+    def vectorized_functions(self) -> Mapping[str, Callable]:
+        """NumPy counterparts of `functions` (requires numpy, built on first use)."""
+        return self._get_vectorized()[0]
+
+    @property
+    def vectorized_binary_functions(self) -> Mapping[str, Callable]:
+        """NumPy counterparts of `binary_functions` (requires numpy, built on first use)."""
+        return self._get_vectorized()[1]
+
+    @property
+    def vectorized_variadic_functions(self) -> Mapping[str, Callable]:
+        """NumPy counterparts of `variadic_functions` (requires numpy, built on first use)."""
+        return self._get_vectorized()[2]
+
+    @property
+    def vectorized_evaluator(self) -> VectorizedEvaluator:
+        """Evaluator over the vectorized tables (requires numpy, built on first use)."""
+        return self._get_vectorized()[3]
+
+    @property
+    def vectorized_dual_evaluator(self) -> VectorizedDualEvaluator:
+        """Forward-mode differentiation over the vectorized tables (requires numpy, built on first use)."""
+        return self._get_vectorized()[4]
+
+    def _get_vectorized(self) -> tuple:
+        if self._vectorized is None:
+            with self._vectorized_lock:
+                if self._vectorized is None:
+                    self._initialize_vectorized_functions()
+        return self._vectorized
+
+    def _initialize_functions(self) -> None:
+        """Initialize all supported unary functions."""
+        functions: Dict[str, Callable[[float], float]] = {
+            # Basic operations
+            'recip': self.math_funcs.safe_reciprocal,
+            'sqrt': self.math_funcs.safe_sqrt,
+            'cbrt': self.math_funcs.cbrt,
+            
+            # Exponential and logarithmic
+            'e': math.exp,  # e(x) = e^x
+            'exp': math.exp,
+            'exp10': lambda x: MathFunctions.exact_power(10, x),
+            'ln': self.math_funcs.safe_ln,
+            'log': self.math_funcs.safe_log10,
+            'log2': self.math_funcs.safe_log2,
+
+            # Angle conversion functions
+            'rad': math.radians,  # Convert degrees to radians
+            'deg': math.degrees,  # Convert radians to degrees
+
+            # Trigonometric
+            'sin': self.trig_funcs.sin,
+            'cos': self.trig_funcs.cos,
+            'tan': self.trig_funcs.tan,
+            'csc': self.trig_funcs.csc,
+            'sec': self.trig_funcs.sec,
+            'cot': self.trig_funcs.cot,
+            
+            # Inverse trigonometric
+            'asin': self.trig_funcs.asin,
+            'acos': self.trig_funcs.acos,
+            'atan': self.trig_funcs.atan,
+            'acsc': self.trig_funcs.acsc,
+            'asec': self.trig_funcs.asec,
+            'acot': self.trig_funcs.acot,
+            
+            # Hyperbolic
+            'sinh': math.sinh,
+            'cosh': math.cosh,
+            'tanh': math.tanh,
+            'csch': self.hyp_funcs.csch,
+            'sech': self.hyp_funcs.sech,
+            'coth': self.hyp_funcs.coth,
+            
+            # Inverse hyperbolic
+            'asinh': math.asinh,
+            'acosh': self.hyp_funcs.acosh,
+            'atanh': self.hyp_funcs.atanh,
+            'acsch': self.hyp_funcs.acsch,
+            'asech': self.hyp_funcs.asech,
+            'acoth': self.hyp_funcs.acoth,
+            
+            # Utility functions
+            'abs': abs,
+            'floor': math.floor,
+            'ceil': math.ceil,
+            'round': round,
+            'trunc': math.trunc,
+            'sign': self.math_funcs.sign,
+            
+            # Logic (see Tokenizer.CONDITIONALS for if, and, or)
+            'not': lambda x: 1.0 if x == 0 else 0.0,
+            
+            # Statistical
+            'fact': self.math_funcs.safe_factorial,
+            
+            # Random
+            'rand': lambda x: random.random(),
+        }
+        
+        # Binary functions
+        binary_functions: Dict[str, Callable[[float, float], float]] = {
+            'nPr': self.math_funcs.safe_permutation,
+            'nCr': self.math_funcs.safe_combination,
+            'logb': self.math_funcs.safe_log_base,
+            'nrt': self.math_funcs.safe_nth_root,
+            'pow': self.math_funcs.exact_power,
+            'atan2': self.trig_funcs.atan2,
+            'hypot': math.hypot,
+            'gcd': self.math_funcs.safe_gcd,
+            'lcm': self.math_funcs.safe_lcm,
+            'max': max,
+            'min': min,
+        }
+        
+        # Variadic functions take one or more arguments; calls of max, min, gcd
+        # and lcm with exactly two arguments use the binary versions above
+        variadic_functions: Dict[str, Callable[..., float]] = {
+            'sum': self.math_funcs.total,
+            'mean': self.math_funcs.mean,
+            'variance': self.math_funcs.variance,
+            'stdev': self.math_funcs.stdev,
+            'median': self.math_funcs.median,
+            'max': self.math_funcs.maximum,
+            'min': self.math_funcs.minimum,
+            'gcd': self.math_funcs.gcd_of,
+            'lcm': self.math_funcs.lcm_of,
+        }
+        
+        # Functions whose result is not determined by their arguments; these
+        # are never constant-folded
+        self.impure_functions: FrozenSet[str] = frozenset({'rand'})
+        self.functions = MappingProxyType(functions)
+        self.binary_functions = MappingProxyType(binary_functions)
+        self.variadic_functions = MappingProxyType(variadic_functions)
+    
+    def _initialize_vectorized_functions(self) -> None:
+        """Initialize NumPy counterparts of the function registry (requires numpy)."""
+        np = require_numpy()
+        math_funcs = VectorizedMathFunctions()
+        trig_funcs = VectorizedTrigFunctions(self.angle_unit)
+        hyp_funcs = VectorizedHyperbolicFunctions()
+        
+        functions: Dict[str, Callable] = {
+            'recip': math_funcs.safe_reciprocal,
+            'sqrt': math_funcs.safe_sqrt,
+            'cbrt': math_funcs.cbrt,
+            'e': math_funcs.safe_exp,
+            'exp': math_funcs.safe_exp,
+            'exp10': lambda x: math_funcs.safe_power(10.0, x),
+            'ln': math_funcs.safe_ln,
+            'log': math_funcs.safe_log10,
+            'log2': math_funcs.safe_log2,
+            'rad': np.radians,
+            'deg': np.degrees,
+            'sin': trig_funcs.sin,
+            'cos': trig_funcs.cos,
+            'tan': trig_funcs.tan,
+            'csc': trig_funcs.csc,
+            'sec': trig_funcs.sec,
+            'cot': trig_funcs.cot,
+            'asin': trig_funcs.asin,
+            'acos': trig_funcs.acos,
+            'atan': trig_funcs.atan,
+            'acsc': trig_funcs.acsc,
+            'asec': trig_funcs.asec,
+            'acot': trig_funcs.acot,
+            'sinh': hyp_funcs.sinh,
+            'cosh': hyp_funcs.cosh,
+            'tanh': np.tanh,
+            'csch': hyp_funcs.csch,
+            'sech': hyp_funcs.sech,
+            'coth': hyp_funcs.coth,
+            'asinh': np.arcsinh,
+            'acosh': hyp_funcs.acosh,
+            'atanh': hyp_funcs.atanh,
+            'acsch': hyp_funcs.acsch,
+            'asech': hyp_funcs.asech,
+            'acoth': hyp_funcs.acoth,
+            'abs': np.abs,
+            'floor': np.floor,
+            'ceil': np.ceil,
+            'round': np.round,
+            'trunc': np.trunc,
+            'sign': math_funcs.sign,
+            'not': lambda x: np.where(np.equal(x, 0), 1.0, 0.0),
+            'fact': math_funcs.safe_factorial,
+            'rand': lambda x: np.random.random(np.shape(x)),
+        }
+        
+        binary_functions: Dict[str, Callable] = {
+            'nPr': math_funcs.safe_permutation,
+            'nCr': math_funcs.safe_combination,
+            'logb': math_funcs.safe_log_base,
+            'nrt': math_funcs.safe_nth_root,
+            'pow': math_funcs.safe_power,
+            'atan2': trig_funcs.atan2,
+            'hypot': np.hypot,
+            'gcd': math_funcs.safe_gcd,
+            'lcm': math_funcs.safe_lcm,
+            'max': np.maximum,
+            'min': np.minimum,
+        }
+        
+        variadic_functions: Dict[str, Callable] = {
+            'sum': math_funcs.total,
+            'mean': math_funcs.mean,
+            'variance': math_funcs.variance,
+            'stdev': math_funcs.stdev,
+            'median': math_funcs.median,
+            'max': math_funcs.maximum,
+            'min': math_funcs.minimum,
+            'gcd': math_funcs.gcd_of,
+            'lcm': math_funcs.lcm_of,
+        }
+        
+        functions = MappingProxyType(functions)
+        binary_functions = MappingProxyType(binary_functions)
+        variadic_functions = MappingProxyType(variadic_functions)
+        evaluator = VectorizedEvaluator(functions, binary_functions, self.dynamic_constants,
+                                        self.user_functions, variadic_functions)
+        derivatives = VectorizedDerivatives(functions, variadic_functions, self.angle_unit)
+        self._vectorized = (functions, binary_functions, variadic_functions, evaluator,
+                            VectorizedDualEvaluator(evaluator, derivatives))
+    
+    def _initialize_constants(self) -> None:
+        """Initialize mathematical constants."""
+        self.constants: Mapping[str, float] = MappingProxyType({
+            'π': math.pi,
+            'pi': math.pi,
+            'e': math.e,
+            'tau': math.tau,
+            'phi': (1 + math.sqrt(5)) / 2,
+        })
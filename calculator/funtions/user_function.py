@@ -0,0 +1,104 @@
+import re
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from calculator.util.cse import walk
+from calculator.util.parser import Node, to_postfix
+from calculator.util.postfix_compiler import PostfixCompiler
+
+_IDENTIFIER = r'[^\W\d]\w*'
+SIGNATURE = re.compile(rf'\s*({_IDENTIFIER})\s*\(\s*({_IDENTIFIER}(?:\s*,\s*{_IDENTIFIER})*)\s*\)\s*')
+
+
+def parse_signature(signature: str) -> Tuple[str, Tuple[str, ...]]:
+    """Split "name(a, b)" into ("name", ("a", "b"))."""
+    match = SIGNATURE.fullmatch(signature)
+    if match is None:
+        raise ValueError(f"Invalid function signature: {signature!r} (expected e.g. 'f(x, y)')")
+    name, parameters = match.group(1), tuple(p.strip() for p in match.group(2).split(','))
+    if len(set(parameters)) != len(parameters):
+        raise ValueError(f"Duplicate parameter in {signature!r}")
+    return name, parameters
+
+
+class UserFunction:
+    """
+    A function defined at run time from an expression, e.g. ke(m, v) = 0.5*m*v^2.
+
+    The body is parsed, folded and translated to a native function once,
+    when it is defined. Bodies of at most INLINE_MAX_NODES nodes also keep
+    their AST, which the Parser substitutes into callers, so such a call
+    compiles to the same program as writing the body out by hand.
+    """
+
+    INLINE_MAX_NODES = 48
+
+    __slots__ = ('name', 'parameters', 'source', 'body', 'postfix', 'impure', '_uses', '_run')
+
+    def __init__(self, name: str, parameters: Tuple[str, ...], source: str, body: Optional[Node],
+                 postfix: List, uses: Dict[str, int], run: Callable, impure: bool = False):
+        self.name = name
+        self.parameters = parameters
+        self.source = source
+        self.body = body  # None when the function is too large to inline
+        self.postfix = postfix
+        self.impure = impure
+        self._uses = uses
+        self._run = run
+
+    @classmethod
+    def compile(cls, registry, name: str, parameters: Tuple[str, ...], source: str) -> "UserFunction":
+        """
+        Compile `source` with the functions of `registry` (including earlier definitions).
+
+        Raises:
+            ValueError: if the body does not parse or reads a session value such as `ans`
+        """
+        try:
+            body = registry.parser.parse(source, parameters)
+        except ValueError as error:
+            raise ValueError(f"In function '{name}': {error}") from None
+        postfix = to_postfix(body)
+        names = [token for token in walk(postfix) if type(token) is str]
+        dynamic = sorted(set(names) & registry.dynamic_constants.keys())
+        if dynamic:
+            raise ValueError(f"Function '{name}' cannot use {', '.join(dynamic)}: "
+                             f"pass it as an argument instead")
+        uses = {parameter: names.count(parameter) for parameter in parameters}
+        impure = not registry.impure_functions.isdisjoint(names)
+        compiled = registry.cse.eliminate(registry.optimizer.optimize(postfix))
+        run = PostfixCompiler(registry.evaluator).compile(compiled, parameters)
+        inline = body if len(postfix) <= cls.INLINE_MAX_NODES else None
+        return cls(name, parameters, source, inline, compiled, uses, run, impure)
+
+    @property
+    def arity(self) -> int:
+        return len(self.parameters)
+
+    def __call__(self, *arguments: float) -> float:
+        return self._run(dict(zip(self.parameters, arguments)))
+
+    def inline(self, arguments: Sequence[Node]) -> Optional[Node]:
+        """
+        The body with `arguments` substituted for the parameters, or None if
+        the call has to stay a call: the body is too large, or an argument
+        that is not a plain number or name would be evaluated other than
+        exactly once.
+        """
+        if self.body is None:
+            return None
+        for parameter, argument in zip(self.parameters, arguments):
+            if self._uses[parameter] != 1 and type(argument) is tuple:
+                return None
+        return _substitute(self.body, dict(zip(self.parameters, arguments)))
+
+    def __repr__(self) -> str:
+        return f"UserFunction({self.name}({', '.join(self.parameters)}) = {self.source})"
+
+
+def _substitute(node: Node, bindings: Dict[str, Node]) -> Node:
+    # Bodies are at most INLINE_MAX_NODES nodes, so recursion depth is bounded
+    if type(node) is tuple:
+        return (node[0], *[_substitute(operand, bindings) for operand in node[1:]])
+    if type(node) is str:
+        return bindings.get(node, node)
+    return node
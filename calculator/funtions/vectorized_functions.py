@@ -0,0 +1,348 @@
+import functools
+import math
+
+from calculator.enum.angle import AngleUnit
+from calculator.funtions.math_functions import MathFunctions
+
+try:
+    import numpy as np
+except ImportError:  # numpy is an optional dependency
+    np = None
+
+
+def require_numpy():
+    """Return the numpy module or raise a helpful error if it is not installed."""
+    if np is None:
+        raise ImportError("Vectorized evaluation requires numpy (pip install 'calc[vectorized]')")
+    return np
+
+
+def _invalid(values, mask):
+    """Replace masked elements with NaN (domain errors are reported per element)."""
+    return np.where(mask, np.nan, values)
+
+
+def _overflowed(result, *operands):
+    """Infinite results of finite operands, where the scalar functions raise OverflowError."""
+    mask = np.isinf(result)
+    for operand in operands:
+        mask = mask & np.isfinite(operand)
+    return mask
+
+
+def _scalar_or_nan(function, *arguments):
+    """The scalar function's result for one element, or NaN where it raises."""
+    try:
+        return function(*arguments)
+    except (ArithmeticError, ValueError):
+        return math.nan
+
+
+class VectorizedMathFunctions:
+    """Array counterparts of MathFunctions; domain errors become NaN instead of raising."""
+
+    _FACTORIALS = None
+
+    @staticmethod
+    def safe_reciprocal(x):
+        bad = x == 0
+        return _invalid(1 / np.where(bad, 1.0, x), bad)
+
+    @staticmethod
+    def safe_sqrt(x):
+        bad = x < 0
+        return _invalid(np.sqrt(np.where(bad, 0.0, x)), bad)
+
+    @staticmethod
+    def cbrt(x):
+        return np.cbrt(x)
+
+    @staticmethod
+    def safe_exp(x):
+        result = np.exp(x)
+        return _invalid(result, _overflowed(result, x))
+
+    @staticmethod
+    def safe_ln(x):
+        bad = x <= 0
+        return _invalid(np.log(np.where(bad, 1.0, x)), bad)
+
+    @staticmethod
+    def safe_log10(x):
+        bad = x <= 0
+        return _invalid(np.log10(np.where(bad, 1.0, x)), bad)
+
+    @staticmethod
+    def safe_log2(x):
+        bad = x <= 0
+        return _invalid(np.log2(np.where(bad, 1.0, x)), bad)
+
+    @staticmethod
+    def safe_log_base(x, base):
+        bad = (x <= 0) | (base <= 0) | (base == 1)
+        safe_x = np.where(bad, 1.0, x)
+        safe_base = np.where(bad, 2.0, base)
+        return _invalid(np.log(safe_x) / np.log(safe_base), bad)
+
+    @classmethod
+    def safe_nth_root(cls, x, n):
+        is_int = np.trunc(n) == n
+        even = is_int & (np.fmod(n, 2) == 0)
+        bad = (n == 0) | ((x < 0) & even)
+        safe_n = np.where(bad, 1.0, n)
+        root = cls.safe_power(np.abs(x), 1 / safe_n)  # 0 to a negative power, overflow
+        return _invalid(np.where(x < 0, np.copysign(root, x), root), bad)
+
+    @staticmethod
+    def safe_power(x, y):
+        """x^y; zero to a negative power and overflow to infinity are errors, as in MathFunctions."""
+        x = np.asarray(x, dtype=float)
+        result = np.power(x, y)
+        return _invalid(result, ((x == 0) & (y < 0)) | _overflowed(result, x, y))
+
+    @classmethod
+    def _factorial_table(cls):
+        if cls._FACTORIALS is None:
+            cls._FACTORIALS = np.array([float(math.factorial(k)) for k in range(171)])
+        return cls._FACTORIALS
+
+    @classmethod
+    def safe_factorial(cls, x):
+        bad = (x < 0) | (x != np.trunc(x)) | (x > 170) | np.isnan(x)
+        index = np.where(bad, 0, x).astype(np.int64)
+        return _invalid(cls._factorial_table()[index], bad)
+
+    @staticmethod
+    def _integer_pairs(n, r):
+        bad = (n != np.trunc(n)) | (r != np.trunc(r)) | (n < 0) | (r < 0) | (r > n)
+        bad |= np.isnan(n) | np.isnan(r)
+        return np.broadcast_arrays(np.asarray(n, dtype=float), np.asarray(r, dtype=float), bad)
+
+    @classmethod
+    def safe_permutation(cls, n, r):
+        return cls._exact_or_lookup(MathFunctions.safe_permutation, *cls._integer_pairs(n, r))
+
+    @classmethod
+    def safe_combination(cls, n, r):
+        return cls._exact_or_lookup(MathFunctions.safe_combination, *cls._integer_pairs(n, r))
+
+    @classmethod
+    def _exact_or_lookup(cls, scalar, n, r, bad):
+        """
+        nPr/nCr from the factorial table when n ≤ 170, by the scalar function otherwise.
+
+        The scalar function refuses results too large for a float before
+        computing them; those elements become NaN.
+        """
+        table = cls._factorial_table()
+        small = (n <= 170) & ~bad
+        n_small = np.where(small, n, 0).astype(np.int64)
+        r_small = np.where(small, r, 0).astype(np.int64)
+        denominator = table[n_small - r_small]
+        if scalar is MathFunctions.safe_combination:
+            denominator = denominator * table[r_small]
+        result = np.array(np.round(table[n_small] / denominator))
+        large = ~small & ~bad
+        if large.any():
+            result[large] = [_scalar_or_nan(scalar, float(a), float(b))
+                             for a, b in zip(n[large], r[large])]
+        return _invalid(result, bad)
+
+    @staticmethod
+    def sign(x):
+        return np.sign(x)
+
+    @staticmethod
+    def safe_gcd(x, y):
+        """gcd of the rounded arguments; elements outside int64 go through MathFunctions."""
+        x, y = np.broadcast_arrays(np.round(x), np.round(y))
+        large = ~((np.abs(x) < 2.0 ** 63) & (np.abs(y) < 2.0 ** 63))
+        result = np.array(np.gcd(np.where(large, 0, x).astype(np.int64),
+                                 np.where(large, 0, y).astype(np.int64)), dtype=float)
+        if large.any():
+            result[large] = [_scalar_or_nan(MathFunctions.safe_gcd, float(a), float(b))
+                             for a, b in zip(x[large], y[large])]
+        return result
+
+    @classmethod
+    def safe_lcm(cls, x, y):
+        zero = (x == 0) | (y == 0)
+        divisor = cls.safe_gcd(x, y)
+        bad = ~zero & (divisor == 0)  # Both round to zero, e.g. lcm(0.5, 0.5)
+        return _invalid(np.where(zero, 0.0, np.abs(x * y) / np.where(zero | bad, 1, divisor)), bad)
+
+    # Variadic functions: each argument is an array, combined elementwise
+
+    @staticmethod
+    def total(*values):
+        return functools.reduce(np.add, values)
+
+    @staticmethod
+    def mean(*values):
+        return functools.reduce(np.add, values) / len(values)
+
+    @staticmethod
+    def variance(*values):
+        """Sample variance by Welford's method, one array operation per argument."""
+        mean = np.zeros(np.broadcast_shapes(*map(np.shape, values)))
+        squares = np.zeros_like(mean)
+        for count, x in enumerate(values, 1):
+            delta = x - mean
+            mean = mean + delta / count
+            squares = squares + delta * (x - mean)
+        if len(values) < 2:
+            return np.full_like(mean, np.nan)
+        return squares / (len(values) - 1)
+
+    @classmethod
+    def stdev(cls, *values):
+        return np.sqrt(cls.variance(*values))
+
+    @staticmethod
+    def median(*values):
+        return np.median(np.broadcast_arrays(*values), axis=0)
+
+    @staticmethod
+    def maximum(*values):
+        return functools.reduce(np.maximum, values)
+
+    @staticmethod
+    def minimum(*values):
+        return functools.reduce(np.minimum, values)
+
+    @classmethod
+    def gcd_of(cls, *values):
+        return functools.reduce(cls.safe_gcd, values, 0.0)
+
+    @classmethod
+    def lcm_of(cls, *values):
+        return functools.reduce(cls.safe_lcm, values, 1.0)
+
+
+class VectorizedTrigFunctions:
+    """Array counterparts of TrigFunctions with angle unit support."""
+
+    def __init__(self, angle_unit: AngleUnit = AngleUnit.RADIANS):
+        self.angle_unit = angle_unit
+
+    def _to_radians(self, angle):
+        if self.angle_unit == AngleUnit.DEGREES:
+            return np.radians(angle)
+        elif self.angle_unit == AngleUnit.GRADIANS:
+            return angle * math.pi / 200
+        elif self.angle_unit == AngleUnit.TURNS:
+            return angle * 2 * math.pi
+        return angle
+
+    def _from_radians(self, angle):
+        if self.angle_unit == AngleUnit.DEGREES:
+            return np.degrees(angle)
+        elif self.angle_unit == AngleUnit.GRADIANS:
+            return angle * 200 / math.pi
+        elif self.angle_unit == AngleUnit.TURNS:
+            return angle / (2 * math.pi)
+        return angle
+
+    def sin(self, x):
+        return np.sin(self._to_radians(x))
+
+    def cos(self, x):
+        return np.cos(self._to_radians(x))
+
+    def tan(self, x):
+        return np.tan(self._to_radians(x))
+
+    @staticmethod
+    def _guarded_reciprocal(values):
+        bad = np.abs(values) < 1e-10
+        return _invalid(1 / np.where(bad, 1.0, values), bad)
+
+    def csc(self, x):
+        return self._guarded_reciprocal(self.sin(x))
+
+    def sec(self, x):
+        return self._guarded_reciprocal(self.cos(x))
+
+    def cot(self, x):
+        return self._guarded_reciprocal(self.tan(x))
+
+    def asin(self, x):
+        bad = np.abs(x) > 1
+        return _invalid(self._from_radians(np.arcsin(np.where(bad, 0.0, x))), bad)
+
+    def acos(self, x):
+        bad = np.abs(x) > 1
+        return _invalid(self._from_radians(np.arccos(np.where(bad, 0.0, x))), bad)
+
+    def atan(self, x):
+        return self._from_radians(np.arctan(x))
+
+    def acsc(self, x):
+        bad = np.abs(x) < 1
+        return _invalid(self._from_radians(np.arcsin(1 / np.where(bad, 1.0, x))), bad)
+
+    def asec(self, x):
+        bad = np.abs(x) < 1
+        return _invalid(self._from_radians(np.arccos(1 / np.where(bad, 1.0, x))), bad)
+
+    def acot(self, x):
+        zero = x == 0
+        return self._from_radians(np.where(zero, math.pi / 2, np.arctan(1 / np.where(zero, 1.0, x))))
+
+    def atan2(self, y, x):
+        return self._from_radians(np.arctan2(y, x))
+
+
+class VectorizedHyperbolicFunctions:
+    """Array counterparts of HyperbolicFunctions."""
+
+    @staticmethod
+    def sinh(x):
+        result = np.sinh(x)
+        return _invalid(result, _overflowed(result, x))
+
+    @staticmethod
+    def cosh(x):
+        result = np.cosh(x)
+        return _invalid(result, _overflowed(result, x))
+
+    @staticmethod
+    def csch(x):
+        bad = x == 0
+        sinh = np.sinh(np.where(bad, 1.0, x))
+        return _invalid(1 / sinh, bad | _overflowed(sinh, x))
+
+    @staticmethod
+    def sech(x):
+        cosh = np.cosh(x)
+        return _invalid(1 / cosh, _overflowed(cosh, x))
+
+    @staticmethod
+    def coth(x):
+        bad = x == 0
+        return _invalid(1 / np.tanh(np.where(bad, 1.0, x)), bad)
+
+    @staticmethod
+    def acosh(x):
+        bad = x < 1
+        return _invalid(np.arccosh(np.where(bad, 1.0, x)), bad)
+
+    @staticmethod
+    def atanh(x):
+        bad = np.abs(x) >= 1
+        return _invalid(np.arctanh(np.where(bad, 0.0, x)), bad)
+
+    @staticmethod
+    def asech(x):
+        bad = (x <= 0) | (x > 1)
+        return _invalid(np.arccosh(1 / np.where(bad, 1.0, x)), bad)
+
+    @staticmethod
+    def acoth(x):
+        bad = np.abs(x) <= 1
+        return _invalid(np.arctanh(1 / np.where(bad, 2.0, x)), bad)
+
+    @staticmethod
+    def acsch(x):
+        bad = x == 0
+        return _invalid(np.arcsinh(1 / np.where(bad, 1.0, x)), bad)
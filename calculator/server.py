@@ -0,0 +1,263 @@
+import asyncio
+import json
+import math
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional, Tuple
+
+from calculator.angle_calculator import ANGLE_UNITS
+from calculator.enum.angle import AngleUnit
+from calculator.stack_queue_calc import StackQueueCalculator
+from calculator.util.budget import Budget
+from calculator.util.program_store import ProgramStore
+from calculator.util.session import Session
+
+# (shareable, result, error) as produced by _evaluate_in_session
+Outcome = Tuple[bool, Optional[float], Optional[BaseException]]
+
+
+def _evaluate_in_session(calc: StackQueueCalculator, session: Session, query: str) -> Outcome:
+    """
+    Executor job: evaluate `query` for one connection's session.
+
+    Never raises. `shareable` is False when the result depends on the
+    session (`ans`) or is not deterministic (`rand`), so it must not be
+    handed to other connections that asked for the same text.
+    """
+    try:
+        if session.budget is not None:
+            session.budget.admit_text(query)
+        program = calc.program(query)
+    except Exception as e:
+        return True, None, e  # Parse errors only depend on the text and angle unit
+    shareable = not program.references(calc.dynamic_constants.keys() | calc.impure_functions)
+    try:
+        result = program.evaluate(session=session)
+    except Exception as e:
+        return shareable, None, e
+    session.ans = result
+    return shareable, result, None
+
+
+def _reject_constant(name: str):
+    """json.loads hook: NaN and Infinity are not JSON, so requests may not use them."""
+    raise ValueError(f"Invalid JSON constant: {name}")
+
+
+class Connection:
+    """Per-connection state: its Session (with the server's Budget) and current angle unit."""
+
+    __slots__ = ('session', 'angle_unit')
+
+    def __init__(self, angle_unit: AngleUnit, budget: Optional[Budget] = None):
+        self.session = Session(budget=budget)
+        self.angle_unit = angle_unit
+
+
+class CalculatorServer:
+    """
+    asyncio server speaking a JSON-lines protocol, one request per line.
+
+    Requests:
+        {"id": 1, "expr": "2 * sin(ans)"}
+        {"id": 2, "op": "angle", "unit": "degrees"}
+        {"id": 3, "op": "memory_add"}            (value defaults to ans)
+        {"id": 4, "op": "memory_recall"}         (also memory_subtract, memory_clear)
+
+    Responses echo the id with either "result" or
+    "error": {"type": ..., "message": ...} (plus "position" for syntax errors).
+
+    Each connection has its own Session (`ans`, memory) and angle unit, while
+    compiled programs are shared through one calculator per angle unit;
+    requests on one connection are answered in order.
+
+    Evaluation runs on a bounded thread pool. When `max_pending` jobs are
+    queued, connections stop reading until a slot frees up, pushing back
+    on clients through their socket buffers. Identical in-flight
+    expressions (same text and angle unit) from different connections are
+    evaluated once unless they depend on session state. With a
+    `program_store`, a restarted server loads the programs its predecessor
+    compiled instead of parsing them again; close() saves new ones. With a
+    `budget`, expressions exceeding it are answered with a BudgetExceeded
+    error before they reach a worker's CPU time.
+    """
+
+    def __init__(self, angle_unit: AngleUnit = AngleUnit.RADIANS, workers: int = 4,
+                 max_pending: int = 256, cache_size: int = 1024, max_line: int = 1 << 20,
+                 program_store: Optional[ProgramStore] = None, budget: Optional[Budget] = None):
+        if workers < 1:
+            raise ValueError(f"workers must be at least 1: {workers}")
+        if max_pending < 1:
+            raise ValueError(f"max_pending must be at least 1: {max_pending}")
+        self.angle_unit = angle_unit
+        self.cache_size = cache_size
+        self.program_store = program_store
+        self.budget = budget
+        self._calculators: Dict[AngleUnit, StackQueueCalculator] = {}
+        self.max_line = max_line
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="calculator")
+        self._max_pending = max_pending
+        self._slots: Optional[asyncio.Semaphore] = None  # Bound to the running loop in start_*
+        self._in_flight: Dict[Tuple[AngleUnit, str], asyncio.Future] = {}
+        self.connections = 0
+        self.requests = 0
+        self.evaluations = 0
+        self.coalesced = 0
+
+    # ==================== Lifecycle ====================
+
+    async def start_tcp(self, host: str = "127.0.0.1", port: int = 8765) -> asyncio.AbstractServer:
+        self._slots = asyncio.Semaphore(self._max_pending)
+        return await asyncio.start_server(self.handle_connection, host, port, limit=self.max_line)
+
+    async def start_unix(self, path: str) -> asyncio.AbstractServer:
+        self._slots = asyncio.Semaphore(self._max_pending)
+        return await asyncio.start_unix_server(self.handle_connection, path, limit=self.max_line)
+
+    def close(self) -> None:
+        """Stop the worker threads once queued evaluations finish, then save new programs."""
+        self._executor.shutdown(wait=True)
+        if self.program_store is not None:
+            self.program_store.flush()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "connections": self.connections,
+            "requests": self.requests,
+            "evaluations": self.evaluations,
+            "coalesced": self.coalesced,
+        }
+
+    def calculator(self, angle_unit: AngleUnit) -> StackQueueCalculator:
+        """The calculator shared by every connection using `angle_unit`."""
+        calc = self._calculators.get(angle_unit)
+        if calc is None:
+            calc = StackQueueCalculator(angle_unit, self.cache_size, self.program_store)
+            self._calculators[angle_unit] = calc
+        return calc
+
+    # ==================== Connections ====================
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self.connections += 1
+        connection = Connection(self.angle_unit, self.budget)
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except ValueError:  # Line longer than max_line; the stream cannot be resynchronised
+                    error = ValueError(f"Request exceeds {self.max_line} bytes")
+                    writer.write(self._encode(None, error=error))
+                    break
+                if not line:
+                    break
+                if not line.strip():
+                    continue
+                writer.write(await self._handle_line(connection, line))
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def _handle_line(self, connection: Connection, line: bytes) -> bytes:
+        self.requests += 1
+        request_id = None
+        try:
+            request = json.loads(line, parse_constant=_reject_constant)
+            if not isinstance(request, dict):
+                raise ValueError("Request must be a JSON object")
+            request_id = request.get("id")
+            result = await self._dispatch(connection, request)
+            return self._encode(request_id, result)
+        except Exception as e:
+            return self._encode(request_id, error=e)
+
+    async def _dispatch(self, connection: Connection, request: Dict) -> Optional[float]:
+        session = connection.session
+        op = request.get("op", "evaluate")
+        if op == "evaluate":
+            query = request.get("expr")
+            if not isinstance(query, str):
+                raise ValueError("'expr' must be a string")
+            return await self.evaluate(connection, query)
+        if op == "angle":
+            unit = ANGLE_UNITS.get(str(request.get("unit", "")).lower())
+            if unit is None:
+                raise ValueError(f"Unknown angle unit: {request.get('unit')!r}")
+            connection.angle_unit = unit
+            return None
+        if op in ("memory_add", "memory_subtract"):
+            value = float(request.get("value", session.ans))
+            session.memory += value if op == "memory_add" else -value
+            return session.memory
+        if op == "memory_recall":
+            return session.memory
+        if op == "memory_clear":
+            session.memory = 0.0
+            return None
+        raise ValueError(f"Unknown op: {op!r}")
+
+    # ==================== Evaluation ====================
+
+    async def evaluate(self, connection: Connection, query: str) -> float:
+        """Evaluate `query` for `connection`, sharing the work with identical in-flight requests."""
+        key = (connection.angle_unit, query)
+        pending = self._in_flight.get(key)
+        if pending is not None:
+            # Shield so a disconnecting waiter cannot cancel another client's job
+            shareable, result, error = await asyncio.shield(pending)
+            if shareable:
+                self.coalesced += 1
+                if error is not None:
+                    raise error
+                connection.session.ans = result
+                return result
+
+        async with self._slots:
+            loop = asyncio.get_running_loop()
+            calc = self.calculator(connection.angle_unit)
+            future = loop.run_in_executor(self._executor, _evaluate_in_session,
+                                          calc, connection.session, query)
+            if key not in self._in_flight:
+                self._in_flight[key] = future
+                future.add_done_callback(lambda _: self._in_flight.pop(key, None))
+            self.evaluations += 1
+            _, result, error = await asyncio.shield(future)
+        # The executor job already recorded `ans` in the session
+        if error is not None:
+            raise error
+        return result
+
+    @staticmethod
+    def _encode(request_id, result=None, error: Optional[BaseException] = None) -> bytes:
+        """
+        One response line.
+
+        Raises:
+            ValueError: if `result` is complex, infinite or NaN, which JSON cannot represent
+        """
+        if error is not None:
+            response = {"id": request_id, "error": {"type": type(error).__name__, "message": str(error)}}
+            if hasattr(error, "position"):
+                response["error"]["position"] = error.position
+        else:
+            if isinstance(result, complex):
+                raise ValueError(f"Result is not a real number: {result}")
+            if isinstance(result, float) and not math.isfinite(result):
+                raise ValueError(f"Result is not finite: {result}")
+            response = {"id": request_id, "result": result}
+        return json.dumps(response, allow_nan=False).encode() + b"\n"
+
+
+async def serve(server: CalculatorServer, host: str = "127.0.0.1", port: int = 8765,
+                unix_path: Optional[str] = None) -> None:
+    """Run `server` until cancelled."""
+    if unix_path:
+        listener = await server.start_unix(unix_path)
+    else:
+        listener = await server.start_tcp(host, port)
+    try:
+        async with listener:
+            await listener.serve_forever()
+    finally:
+        server.close()
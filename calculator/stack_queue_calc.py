@@ -1,13 +1,26 @@
-import math
-import random
-from typing import Callable, Dict, List, Union
+import logging
+import time
+from typing import Callable, Dict, FrozenSet, Iterable, List, Mapping, Optional, Tuple, Union
 from calculator.base import CalculatorBase
 from calculator.enum.angle import AngleUnit
 from calculator.funtions.hyperbolic_functions import HyperbolicFunctions
 from calculator.funtions.math_functions import MathFunctions
+from calculator.funtions.registry import FunctionRegistry
 from calculator.funtions.trigo_function import TrigFunctions
+from calculator.funtions.user_function import UserFunction, parse_signature
+from calculator.util.batch import BatchArrays, BatchResult, batch_arrays, iter_batch
+from calculator.util.cse import SubexpressionEliminator
+from calculator.util.instrumentation import Instrumentation
+from calculator.util.lru_cache import CacheStats, LRUCache
 from calculator.util.postfix_converter import PostfixConverter
 from calculator.util.postfix_eval import PostfixEvaluator
+from calculator.util.parser import Parser, Text, as_text, to_postfix
+from calculator.util.postfix_optimizer import PostfixOptimizer
+from calculator.util.program import CompiledProgram
+from calculator.util.program_store import ProgramStore
+from calculator.util.session import Session
+from calculator.util.solver import (RTOL, CountedFunction, SolveResult, brent_minimum, brent_root,
+                                    safeguarded_root, secant_minimum, vectorized_safeguarded_root)
 from calculator.util.tokenizer import Tokenizer
 
 
@@ -24,187 +37,467 @@ class StackQueueCalculator(CalculatorBase):
     - Mathematical constants
     - Memory operations
     - Implicit multiplication
+    - LRU cache of compiled programs, optionally persisted on disk
+    - Free variables and NumPy-vectorized evaluation
+    - User-defined functions
+    - Gradients by forward-mode automatic differentiation
+    - Root-finding and minimization on compiled expressions
     """
     
-    def __init__(self, angle_unit: AngleUnit = AngleUnit.RADIANS):
+    def __init__(self, angle_unit: AngleUnit = AngleUnit.RADIANS, cache_size: int = 1024,
+                 program_store: Optional[ProgramStore] = None):
         super().__init__()
-        self.angle_unit = angle_unit
-        self._last_answer = 0.0
-        self._memory = 0.0
-        
-        # Initialize modular components
-        self.math_funcs = MathFunctions()
-        self.trig_funcs = TrigFunctions(angle_unit)
-        self.hyp_funcs = HyperbolicFunctions()
-        
-        self._initialize_functions()
-        self._initialize_constants()
-        
-        # Initialize processing components
-        self.tokenizer = Tokenizer(self.functions, self.binary_functions, self.constants)
-        self.postfix_converter = PostfixConverter(
-            set(self.functions.keys()), 
-            set(self.binary_functions.keys())
-        )
-        self.evaluator = PostfixEvaluator(self.functions, self.binary_functions)
+        # `ans` and memory used when no session is passed explicitly
+        self.session = Session()
+        self._program_cache = LRUCache(cache_size)
+        # Texts that failed to compile, for no-raise batches (see evaluate_batch_arrays)
+        self._failure_cache = LRUCache(cache_size)
+        self.program_store = program_store
+        self.instrumentation: Optional[Instrumentation] = None
+        self._memoization: Optional[Tuple[Optional[FrozenSet[str]], int]] = None
+        # Functions added with define(), in definition order: name -> (parameters, body)
+        self._definitions: Dict[str, Tuple[Tuple[str, ...], str]] = {}
+        self._derived_registries: Dict[AngleUnit, FunctionRegistry] = {}
+        self.set_angle_unit(angle_unit)
     
     def set_angle_unit(self, unit: AngleUnit) -> None:
-        """Change the angle unit for trigonometric functions."""
-        self.angle_unit = unit
-        self.trig_funcs = TrigFunctions(unit)
-        self._initialize_functions()  # Rebuild function registry
-    
-    def _initialize_functions(self) -> None:
-        """Initialize all supported unary functions."""
-        self.functions: Dict[str, Callable[[float], float]] = {
-            # Basic operations
-            'recip': self.math_funcs.safe_reciprocal,
-            'sqrt': self.math_funcs.safe_sqrt,
-            'cbrt': self.math_funcs.cbrt,
-            
-            # Exponential and logarithmic
-            'e': math.exp,  # e(x) = e^x
-            'exp': math.exp,
-            'exp10': lambda x: 10 ** x,
-            'ln': self.math_funcs.safe_ln,
-            'log': self.math_funcs.safe_log10,
-            'log2': self.math_funcs.safe_log2,
-
-            # Angle conversion functions
-            'rad': math.radians,  # Convert degrees to radians
-            'deg': math.degrees,  # Convert radians to degrees
-
-            # Trigonometric
-            'sin': self.trig_funcs.sin,
-            'cos': self.trig_funcs.cos,
-            'tan': self.trig_funcs.tan,
-            'csc': self.trig_funcs.csc,
-            'sec': self.trig_funcs.sec,
-            'cot': self.trig_funcs.cot,
-            
-            # Inverse trigonometric
-            'asin': self.trig_funcs.asin,
-            'acos': self.trig_funcs.acos,
-            'atan': self.trig_funcs.atan,
-            'acsc': self.trig_funcs.acsc,
-            'asec': self.trig_funcs.asec,
-            'acot': self.trig_funcs.acot,
-            
-            # Hyperbolic
-            'sinh': math.sinh,
-            'cosh': math.cosh,
-            'tanh': math.tanh,
-            'csch': self.hyp_funcs.csch,
-            'sech': self.hyp_funcs.sech,
-            'coth': self.hyp_funcs.coth,
-            
-            # Inverse hyperbolic
-            'asinh': math.asinh,
-            'acosh': self.hyp_funcs.acosh,
-            'atanh': self.hyp_funcs.atanh,
-            'acsch': self.hyp_funcs.acsch,
-            'asech': self.hyp_funcs.asech,
-            'acoth': self.hyp_funcs.acoth,
-            
-            # Utility functions
-            'abs': abs,
-            'floor': math.floor,
-            'ceil': math.ceil,
-            'round': round,
-            'trunc': math.trunc,
-            'sign': self.math_funcs.sign,
-            
-            # Statistical
-            'fact': self.math_funcs.safe_factorial,
-            
-            # Random
-            'rand': lambda x: random.random(),
-        }
+        """
+        Change the angle unit for trigonometric functions.
         
-        # Binary functions
-        self.binary_functions: Dict[str, Callable[[float, float], float]] = {
-            'nPr': self.math_funcs.safe_permutation,
-            'nCr': self.math_funcs.safe_combination,
-            'logb': self.math_funcs.safe_log_base,
-            'nrt': self.math_funcs.safe_nth_root,
-            'pow': lambda x, y: x ** y,
-            'atan2': self.trig_funcs.atan2,
-            'hypot': math.hypot,
-            'gcd': self.math_funcs.safe_gcd,
-            'lcm': self.math_funcs.safe_lcm,
-            'max': max,
-            'min': min,
-        }
+        Swaps in the shared registry for `unit`; every pipeline stage reads
+        the new functions from then on. Cached programs are keyed by unit,
+        so programs compiled for the previous unit stay valid for it.
+        """
+        self.angle_unit = unit
+        self._registry = self._registry_for(unit)
     
-    def _initialize_constants(self) -> None:
-        """Initialize mathematical constants."""
-        self.constants: Dict[str, Union[float, Callable]] = {
-            'π': math.pi,
-            'pi': math.pi,
-            'e': math.e,
-            'tau': math.tau,
-            'phi': (1 + math.sqrt(5)) / 2,
-            'ans': lambda: self._last_answer,
-        }
+    def _registry_for(self, unit: AngleUnit) -> FunctionRegistry:
+        """
+        The shared registry for `unit`, or this calculator's copy of it with
+        its user-defined functions and memoization.
+        """
+        registry = FunctionRegistry.for_unit(unit)
+        if self._memoization is None and not self._definitions:
+            return registry
+        derived = self._derived_registries.get(unit)
+        if derived is None:
+            derived = registry
+            for name, (parameters, body) in self._definitions.items():
+                derived = derived.with_function(name, parameters, body)
+            if self._memoization is not None:
+                derived = derived.memoized(*self._memoization)
+            self._derived_registries[unit] = derived
+        return derived
+    
+    # ==================== Registry Views ====================
+    
+    @property
+    def registry(self) -> FunctionRegistry:
+        """The shared, immutable function registry for the current angle unit."""
+        return self._registry
+    
+    @property
+    def functions(self) -> Mapping[str, Callable[[float], float]]:
+        return self._registry.functions
+    
+    @property
+    def binary_functions(self) -> Mapping[str, Callable[[float, float], float]]:
+        return self._registry.binary_functions
+    
+    @property
+    def impure_functions(self) -> FrozenSet[str]:
+        return self._registry.impure_functions
+    
+    @property
+    def dynamic_constants(self) -> Mapping[str, Callable[[Session], float]]:
+        return self._registry.dynamic_constants
+    
+    @property
+    def constants(self) -> Dict[str, Union[float, Callable[[Session], float]]]:
+        return {**self._registry.constants, **self._registry.dynamic_constants}
+    
+    @property
+    def tokenizer(self) -> Tokenizer:
+        return self._registry.tokenizer
+    
+    @property
+    def postfix_converter(self) -> PostfixConverter:
+        return self._registry.postfix_converter
+    
+    @property
+    def parser(self) -> Parser:
+        return self._registry.parser
+    
+    @property
+    def math_funcs(self) -> MathFunctions:
+        return self._registry.math_funcs
+    
+    @property
+    def trig_funcs(self) -> TrigFunctions:
+        return self._registry.trig_funcs
+    
+    @property
+    def hyp_funcs(self) -> HyperbolicFunctions:
+        return self._registry.hyp_funcs
+    
+    @property
+    def evaluator(self) -> PostfixEvaluator:
+        return self._registry.evaluator
+    
+    @property
+    def optimizer(self) -> PostfixOptimizer:
+        return self._registry.optimizer
+    
+    @property
+    def cse(self) -> SubexpressionEliminator:
+        return self._registry.cse
     
     # ==================== Memory Operations ====================
     
-    def memory_add(self, value: float) -> None:
+    def memory_add(self, value: float, session: Optional[Session] = None) -> None:
         """Add value to memory (M+)."""
-        self._memory += value
+        (session or self.session).memory += value
     
-    def memory_subtract(self, value: float) -> None:
+    def memory_subtract(self, value: float, session: Optional[Session] = None) -> None:
         """Subtract value from memory (M-)."""
-        self._memory -= value
+        (session or self.session).memory -= value
     
-    def memory_recall(self) -> float:
+    def memory_recall(self, session: Optional[Session] = None) -> float:
         """Recall memory value (MR)."""
-        return self._memory
+        return (session or self.session).memory
     
-    def memory_clear(self) -> None:
+    def memory_clear(self, session: Optional[Session] = None) -> None:
         """Clear memory (MC)."""
-        self._memory = 0.0
+        (session or self.session).memory = 0.0
     
-    def get_last_answer(self) -> float:
+    def get_last_answer(self, session: Optional[Session] = None) -> float:
         """Get the last calculated answer."""
-        return self._last_answer
+        return (session or self.session).ans
     
     # ==================== Implicit Multiplication ====================
     
-    def add_implicit_multiplication(self, tokens: List) -> List:
-        """Add implicit multiplication operators."""
+    def add_implicit_multiplication(self, tokens: List, variables: Iterable[str] = frozenset()) -> List:
+        """Add implicit multiplication operators (token pipeline; compile() uses the Parser)."""
         result = []
-        all_funcs = set(self.functions.keys()) | set(self.binary_functions.keys())
+        all_funcs = self._registry.all_functions
         
         for i, token in enumerate(tokens):
             result.append(token)
             if i + 1 < len(tokens):
                 next_token = tokens[i + 1]
-                if self._should_add_multiplication(token, next_token, all_funcs):
+                if self._should_add_multiplication(token, next_token, all_funcs, variables):
                     result.append('*')
         
         return result
     
-    def _should_add_multiplication(self, token, next_token, all_funcs: set) -> bool:
+    def _should_add_multiplication(self, token, next_token, all_funcs: set,
+                                   variables: Iterable[str] = frozenset()) -> bool:
         """Determine if implicit multiplication should be added."""
         return (
-            (isinstance(token, (int, float)) and next_token == '(') or
+            (self._is_operand(token, variables) and next_token == '(') or
             (token == ')' and next_token == '(') or
-            (token == ')' and isinstance(next_token, (int, float))) or
-            (isinstance(token, (int, float)) and next_token == '~') or
-            (isinstance(token, (int, float)) and next_token in all_funcs) or
-            (isinstance(token, (int, float)) and next_token in self.constants.keys()) or
+            (token == ')' and self._is_operand(next_token, variables)) or
+            (self._is_operand(token, variables) and next_token == '~') or
+            (self._is_operand(token, variables) and next_token in all_funcs) or
+            (self._is_operand(token, variables) and
+             (next_token in self._registry.constant_names or next_token in variables)) or
             (token == ')' and next_token in all_funcs)
         )
     
+    def _is_operand(self, token, variables: Iterable[str] = frozenset()) -> bool:
+        """Numbers, dynamic constant names and variables all stand for a value."""
+        return (isinstance(token, (int, float)) or token in self.dynamic_constants
+                or token in variables)
+    
+    # ==================== Compilation ====================
+    
+    def compile(self, query: Text, variables: Iterable[str] = ()) -> CompiledProgram:
+        """
+        Parse an expression once into a reusable program.
+        
+        With a program store attached, a program saved by an earlier run is
+        loaded instead, and newly compiled programs are added to the store.
+        
+        Args:
+            query: Mathematical expression as string, or as UTF-8 bytes
+            variables: Names of free variables used in the expression
+            
+        Returns:
+            CompiledProgram that can be evaluated many times. Variables are
+            bound and dynamic constants such as `ans` are read each time it runs.
+        """
+        query = as_text(query)
+        variables = tuple(variables)
+        self._validate_variables(variables)
+        store = self.program_store
+        if store is not None:
+            postfix = store.get(self._registry, query, variables)
+            if postfix is not None:
+                return CompiledProgram(query, postfix, self.evaluator, variables, self.session,
+                                       self._registry.dual_evaluator)
+        
+        if self.instrumentation is not None:
+            postfix = self._compile_instrumented(query, variables)
+        else:
+            postfix = self.parser.parse_postfix(query, variables)
+            postfix = self.cse.eliminate(self.optimizer.optimize(postfix))
+        if store is not None:
+            store.put(self._registry, query, variables, postfix)
+        return CompiledProgram(query, postfix, self.evaluator, variables, self.session,
+                               self._registry.dual_evaluator)
+    
+    def _compile_instrumented(self, query: str, variables: tuple) -> List:
+        """The compile() pipeline with every stage timed into self.instrumentation."""
+        record = self.instrumentation.record_stage
+        clock = time.perf_counter
+        
+        start = clock()
+        postfix = self.parser.parse_postfix(query, variables)
+        after_parse = clock()
+        record('parse', after_parse - start)
+        token_count = len(postfix)
+        postfix = self.optimizer.optimize(postfix)
+        after_optimize = clock()
+        record('optimize', after_optimize - after_parse)
+        postfix = self.cse.eliminate(postfix)
+        record('cse', clock() - after_optimize)
+        
+        self.instrumentation.record_compile(token_count, postfix)
+        return postfix
+    
+    def _validate_variables(self, variables: tuple) -> None:
+        """Variable names must be identifiers that do not hide a function."""
+        for name in variables:
+            if not name.isidentifier():
+                raise ValueError(f"Invalid variable name: {name!r}")
+            if name in self._registry.all_functions:
+                raise ValueError(f"Variable name clashes with function: {name!r}")
+    
+    def program(self, query: Text, variables: Iterable[str] = ()) -> CompiledProgram:
+        """The compiled program for `query` from the program cache, compiling it on a miss."""
+        return self._get_program(query, variables)
+    
+    def cache_key(self, query: str, variables: Iterable[str] = ()) -> Tuple:
+        """Key of `query` in program_cache and failure_cache."""
+        # Programs bind their unit's functions, so the unit is part of the key
+        return (self.angle_unit, query, tuple(sorted(variables))) if variables else (self.angle_unit, query)
+    
+    @property
+    def program_cache(self) -> LRUCache:
+        """Compiled programs by cache_key()."""
+        return self._program_cache
+    
+    @property
+    def failure_cache(self) -> LRUCache:
+        """Texts that failed to compile by cache_key(), for no-raise batches (see evaluate_batch_arrays)."""
+        return self._failure_cache
+    
+    def _get_program(self, query: Text, variables: Iterable[str] = ()) -> CompiledProgram:
+        """Fetch a compiled program from the LRU cache, compiling on a miss."""
+        query = as_text(query)
+        key = self.cache_key(query, variables)
+        program = self._program_cache.get(key)
+        if program is None:
+            program = self.compile(query, variables)
+            self._program_cache.put(key, program)
+        return program
+    
+    # ==================== Instrumentation ====================
+    
+    def enable_instrumentation(self, slow_threshold: Optional[float] = None,
+                               logger: Optional[logging.Logger] = None) -> Instrumentation:
+        """
+        Start recording stage timings, sizes, function calls and exceptions.
+        
+        Args:
+            slow_threshold: Seconds above which an expression is logged as slow
+            logger: Where slow expressions are reported (default "calculator.slow")
+            
+        Returns:
+            The Instrumentation object collecting the counters
+        """
+        self.instrumentation = Instrumentation(slow_threshold, logger)
+        return self.instrumentation
+    
+    def disable_instrumentation(self) -> None:
+        """Stop recording; evaluate() goes back to its uninstrumented fast path."""
+        self.instrumentation = None
+    
+    # ==================== Memoization ====================
+    
+    def enable_memoization(self, functions: Optional[Iterable[str]] = None,
+                           maxsize: int = 256) -> None:
+        """
+        Cache results (and errors) of pure functions, per function, in bounded LRUs.
+        
+        Args:
+            functions: Names to memoize (default: factorial, nPr/nCr, logb, nrt
+                and the inverse trig functions). Impure functions are rejected.
+            maxsize: Entries kept per function
+        """
+        functions = None if functions is None else frozenset(functions)
+        FunctionRegistry.for_unit(self.angle_unit).memoized(functions, 0)  # Validate names now
+        self._memoization = (functions, maxsize)
+        self._derived_registries = {}
+        self._program_cache.clear()  # Cached programs are bound to the old function tables
+        self.set_angle_unit(self.angle_unit)
+    
+    def disable_memoization(self) -> None:
+        """Drop all memoized results and call the functions directly again."""
+        self._memoization = None
+        self._derived_registries = {}
+        self._program_cache.clear()
+        self.set_angle_unit(self.angle_unit)
+    
+    def memoization_stats(self) -> Dict[str, CacheStats]:
+        """Hit/miss counters of each memoized function for the current angle unit."""
+        return {name: function.stats() for name, function in self._registry.memoized_functions.items()}
+    
+    def cache_stats(self) -> CacheStats:
+        """Hit/miss/eviction counters for the compiled-program cache."""
+        return self._program_cache.stats()
+    
+    def set_cache_size(self, cache_size: int) -> None:
+        """Resize the compiled-program cache (0 disables caching)."""
+        self._program_cache.resize(cache_size)
+        self._failure_cache.resize(cache_size)
+    
+    def clear_cache(self) -> None:
+        """Drop all cached programs and reset the statistics."""
+        self._program_cache.clear()
+        self._failure_cache.clear()
+    
+    # ==================== User-Defined Functions ====================
+    
+    def define(self, signature: str, body: str) -> UserFunction:
+        """
+        Define (or redefine) a function usable in every later expression.
+        
+        The body may use the parameters, constants, built-in functions and
+        functions defined earlier, but not `ans` or memory. It is compiled
+        once, here; calls to small bodies are inlined into the calling
+        program, so `ke(m, v)` below costs the same as `0.5*m*v^2`.
+        
+        Args:
+            signature: Name and parameters, e.g. "ke(m, v)"
+            body: Expression in the parameters, e.g. "0.5*m*v^2"
+            
+        Returns:
+            The compiled UserFunction, also callable from Python
+            
+        Raises:
+            ValueError: if the signature or body is invalid, or the name
+                clashes with a built-in function or constant
+        """
+        name, parameters = parse_signature(signature)
+        previous = dict(self._definitions)
+        self._definitions[name] = (parameters, body)
+        self._rebuild_definitions(previous)
+        return self._registry.user_functions[name]
+    
+    def undefine(self, name: str) -> None:
+        """
+        Remove a user-defined function.
+        
+        Raises:
+            ValueError: if `name` is not defined, or a later definition uses it
+        """
+        if name not in self._definitions:
+            raise ValueError(f"Unknown user function: {name!r}")
+        previous = dict(self._definitions)
+        del self._definitions[name]
+        self._rebuild_definitions(previous)
+    
+    def _rebuild_definitions(self, previous: Dict[str, Tuple[Tuple[str, ...], str]]) -> None:
+        """Recompile every definition in order, restoring `previous` if one fails."""
+        self._derived_registries = {}
+        try:
+            self.set_angle_unit(self.angle_unit)
+        except ValueError:
+            self._definitions = previous
+            self._derived_registries = {}
+            self.set_angle_unit(self.angle_unit)
+            raise
+        # Cached programs and failures are bound to the old definitions
+        self._program_cache.clear()
+        self._failure_cache.clear()
+    
+    @property
+    def user_functions(self) -> Mapping[str, UserFunction]:
+        return self._registry.user_functions
+    
+    # ==================== Persistent Programs ====================
+    
+    def attach_program_store(self, store: Union[ProgramStore, str, None]) -> Optional[ProgramStore]:
+        """
+        Load compiled programs from, and save new ones to, an on-disk store.
+        
+        Args:
+            store: A ProgramStore (possibly shared with other calculators), a
+                directory to open one in, or None to detach
+            
+        Returns:
+            The attached store; call its flush() to persist new programs
+        """
+        if isinstance(store, str):
+            store = ProgramStore(store)
+        self.program_store = store
+        return store
+    
+    # ==================== Worker Processes ====================
+    
+    def worker_state(self) -> Dict:
+        """
+        A picklable snapshot of the settings evaluation depends on.
+        
+        from_worker_state() rebuilds an equivalent calculator from it in
+        another process, as evaluate_batch() does for each worker: the angle
+        unit, cache size, the session's `ans`, memory and budget,
+        user-defined functions, memoization and the program store, which
+        workers open read-only. Cached programs and instrumentation stay in
+        this process.
+        """
+        store = self.program_store
+        return {
+            'angle_unit': self.angle_unit,
+            'cache_size': self._program_cache.maxsize,
+            'ans': self.session.ans,
+            'memory': self.session.memory,
+            'budget': self.session.budget,
+            'definitions': dict(self._definitions),
+            'memoization': self._memoization,
+            'program_store': None if store is None else store.directory,
+        }
+    
+    @classmethod
+    def from_worker_state(cls, state: Dict) -> "StackQueueCalculator":
+        """A calculator with the settings captured by worker_state()."""
+        store = state['program_store']
+        calculator = cls(state['angle_unit'], cache_size=state['cache_size'],
+                         program_store=None if store is None else ProgramStore(store, read_only=True))
+        calculator.session.ans = state['ans']
+        calculator.session.memory = state['memory']
+        calculator.session.budget = state['budget']
+        if state['definitions']:
+            calculator._definitions = dict(state['definitions'])
+            calculator._rebuild_definitions({})
+        if state['memoization'] is not None:
+            calculator.enable_memoization(*state['memoization'])
+        return calculator
+    
     # ==================== Main Evaluation ====================
     
-    def evaluate(self, query: str) -> float:
+    def evaluate(self, query: Text, variables: Optional[Dict[str, float]] = None,
+                 session: Optional[Session] = None) -> float:
         """
         Main method to evaluate mathematical expression.
         
         Args:
-            query: Mathematical expression as string
+            query: Mathematical expression as string, or as UTF-8 bytes
+                (bytes, bytearray or memoryview, decoded once)
+            variables: Values for free variables, e.g. {"x": 2.0}
+            session: Whose `ans` to read and update (default: self.session).
+                Give each thread its own Session to share one calculator.
             
         Returns:
             Result of evaluation
@@ -220,30 +513,462 @@ class StackQueueCalculator(CalculatorBase):
             >>> calc.evaluate("90grad")  # 90 gradians = 81 degrees
             1.5707963267948966  # in radians
         """
-        tokens = self.tokenizer.tokenize(query)
-        tokens = self.add_implicit_multiplication(tokens)
-        postfix = self.postfix_converter.convert(tokens)
-        result = self.evaluator.evaluate(postfix)
-        self._last_answer = result
+        if session is None:
+            session = self.session
+        if session.budget is not None:
+            session.budget.admit_text(query)
+        if self.instrumentation is not None:
+            return self._evaluate_instrumented(as_text(query), variables, session)
+        program = self._get_program(query, variables.keys() if variables else ())
+        result = program.evaluate(variables, session)
+        session.ans = result
+        return result
+    
+    def _evaluate_instrumented(self, query: str, variables: Optional[Dict[str, float]],
+                               session: Session) -> float:
+        """evaluate() with timing, call counts and exceptions recorded."""
+        instrumentation = self.instrumentation
+        all_funcs = self._registry.all_functions
+        program = None
+        start = time.perf_counter()
+        try:
+            program = self._get_program(query, variables.keys() if variables else ())
+            evaluate_start = time.perf_counter()
+            result = program.evaluate(variables, session)
+            instrumentation.record_stage('evaluate', time.perf_counter() - evaluate_start)
+        except Exception as e:
+            instrumentation.record_evaluation(query, program and program.postfix, all_funcs,
+                                              time.perf_counter() - start, e)
+            raise
+        instrumentation.record_evaluation(query, program.postfix, all_funcs, time.perf_counter() - start)
+        session.ans = result
         return result
     
-    def evaluate_with_steps(self, query: str) -> Dict[str, any]:
+    def evaluate_vectorized(self, query: str, return_mask: bool = False, **variables):
+        """
+        Evaluate an expression once over whole NumPy arrays (requires numpy).
+        
+        Args:
+            query: Mathematical expression as string, e.g. "2*sin(x)+y^2"
+            return_mask: Also return a boolean array flagging domain errors
+            **variables: Arrays (or scalars) bound to the free variables
+            
+        Returns:
+            Array of results with NaN where a domain error occurred, or
+            (results, error_mask) if return_mask is True
+            
+        Examples:
+            >>> calc.evaluate_vectorized("sqrt(x)", x=np.array([4.0, -1.0]))
+            array([ 2., nan])
+        """
+        program = self._get_program(query, variables.keys())
+        program.check_bound(variables)
+        result, errors = self._registry.vectorized_evaluator.evaluate(program.postfix, variables, self.session)
+        return (result, errors) if return_mask else result
+    
+    def evaluate_batch(self, queries: Iterable[str], workers: int = 1,
+                       chunksize: Optional[int] = None) -> List[BatchResult]:
+        """
+        Evaluate many independent expressions, optionally across processes.
+        
+        Args:
+            queries: Expressions to evaluate
+            workers: Number of worker processes (1 evaluates in this process)
+            chunksize: Expressions sent to a worker per task
+            
+        Returns:
+            Results in input order; a failed expression yields a BatchError
+            in its slot instead of aborting the batch. Every expression sees
+            the current `ans`, and the batch does not update it. Worker
+            processes start from this calculator's worker_state().
+        """
+        return list(iter_batch(self, queries, workers, chunksize or self._batch_chunksize(queries, workers)))
+    
+    def evaluate_batch_arrays(self, queries: Iterable[str], workers: int = 1,
+                              chunksize: Optional[int] = None) -> BatchArrays:
+        """
+        evaluate_batch() in no-raise form: results and error codes as parallel arrays.
+        
+        Args:
+            queries: Expressions to evaluate
+            workers: Number of worker processes (1 evaluates in this process)
+            chunksize: Expressions sent to a worker per task
+            
+        Returns:
+            BatchArrays with `values` (NaN where a row failed), `codes`
+            (ErrorCode per row), `positions` (offset of a syntax error, else
+            -1) and `errors` (row -> BatchError, as evaluate_batch reports).
+            Results that do not fit a float fail with OVERFLOW or TYPE.
+        """
+        return batch_arrays(self, queries, workers, chunksize or self._batch_chunksize(queries, workers))
+    
+    @staticmethod
+    def _batch_chunksize(queries: Iterable[str], workers: int) -> int:
+        """About four chunks per worker, within [1, 4096]; 256 for unsized iterables."""
+        size = len(queries) if hasattr(queries, '__len__') else 0
+        return max(1, min(4096, size // (workers * 4))) if size else 256
+    
+    def evaluate_with_steps(self, query: Text) -> Dict[str, any]:
         """
         Evaluate expression and return intermediate steps for debugging.
         
         Returns:
-            Dictionary containing tokens, postfix, and result
+            Dictionary containing the AST, postfix, result and per-stage
+            timings in seconds
         """
-        tokens = self.tokenizer.tokenize(query)
-        tokens_with_mult = self.add_implicit_multiplication(tokens)
-        postfix = self.postfix_converter.convert(tokens_with_mult)
-        result = self.evaluator.evaluate(postfix)
-        self._last_answer = result
+        query = as_text(query)
+        clock = time.perf_counter
+        start = clock()
+        ast = self.parser.parse(query)
+        after_parse = clock()
+        postfix = to_postfix(ast)
+        after_flatten = clock()
+        result = self.evaluator.evaluate(postfix, session=self.session)
+        end = clock()
+        self.session.ans = result
         
         return {
             'original': query,
-            'tokens': tokens,
-            'tokens_with_implicit_mult': tokens_with_mult,
+            'ast': ast,
             'postfix': postfix,
-            'result': result
-        }
\ No newline at end of file
+            'result': result,
+            'timings': {
+                'parse': after_parse - start,
+                'flatten': after_flatten - after_parse,
+                'evaluate': end - after_flatten,
+            },
+        }
+    
+    # ==================== Differentiation ====================
+    
+    def gradient(self, query: Text, at: Dict[str, float],
+                 session: Optional[Session] = None) -> Tuple[float, Dict[str, float]]:
+        """
+        Value of an expression and its partial derivatives, in one pass.
+        
+        Uses forward-mode automatic differentiation (dual numbers), so the
+        partials are exact up to rounding rather than finite-difference
+        estimates, and cost one run instead of two per variable.
+        
+        Args:
+            query: Mathematical expression as string, or as UTF-8 bytes
+            at: A value for every variable; there is one partial per name
+            session: Whose `ans` to read (default: self.session); `ans` is
+                a constant here and is not updated
+            
+        Returns:
+            (value, {name: partial derivative})
+            
+        Raises:
+            ValueError: if the expression is not differentiable at the
+                point, e.g. sqrt(x) at x = 0
+            
+        Examples:
+            >>> calc.gradient("x^2*y", at={"x": 3.0, "y": 2.0})
+            (18.0, {'x': 12.0, 'y': 9.0})
+        """
+        if session is None:
+            session = self.session
+        if session.budget is not None:
+            session.budget.admit_text(query)
+        return self._get_program(query, at.keys()).gradient(at, session)
+    
+    def gradient_vectorized(self, query: str, at: Dict, return_mask: bool = False):
+        """
+        gradient() at many points at once, over NumPy arrays (requires numpy).
+        
+        Args:
+            query: Mathematical expression as string
+            at: Arrays (or scalars) of coordinates for every variable
+            return_mask: Also return a boolean array flagging points where
+                the value or a derivative is undefined
+            
+        Returns:
+            (values, {name: array of partials}), with NaN partials where
+            undefined, or (values, partials, error_mask) if return_mask is True
+        """
+        program = self._get_program(query, at.keys())
+        program.check_bound(at)
+        values, partials, errors = self._registry.vectorized_dual_evaluator.evaluate(
+            program.postfix, at, self.session)
+        return (values, partials, errors) if return_mask else (values, partials)
+    
+    # ==================== Solving & Optimization ====================
+    
+    SOLVE_METHODS = ('brent', 'newton')
+    MINIMIZE_METHODS = ('brent', 'secant')
+    
+    def solve(self, query: Text, var: str, bracket: Optional[Tuple[float, float]] = None,
+              x0: Optional[float] = None, variables: Optional[Dict[str, float]] = None,
+              method: Optional[str] = None, xtol: float = 2e-12, max_iterations: int = 100,
+              session: Optional[Session] = None) -> SolveResult:
+        """
+        Find where an expression is zero, as a function of one variable.
+        
+        The expression is compiled once and the iteration runs the program
+        directly (natively after a few runs), with no parsing or cache
+        lookups per step. 'newton' uses the exact derivative from gradient()
+        and, given a bracket, falls back to bisection whenever a step leaves
+        it, so it converges like 'brent' but in fewer evaluations on smooth
+        expressions. Without a bracket it is plain Newton from `x0` and may
+        not converge (see SolveResult.converged).
+        
+        Args:
+            query: Mathematical expression as string, or as UTF-8 bytes
+            var: The variable to solve for
+            bracket: (a, b) where the expression has opposite signs
+            x0: Starting point (default: the middle of the bracket)
+            variables: Values of the expression's other variables
+            method: 'brent' (derivative-free) or 'newton' (default)
+            xtol: Absolute tolerance on the root
+            max_iterations: Give up (converged=False) after this many steps
+            session: Whose `ans` and budget to use (default: self.session)
+            
+        Returns:
+            SolveResult with the root, iteration and evaluation counts
+            
+        Raises:
+            ValueError: if the bracket has no sign change, or the expression
+                is undefined at a point the solver must evaluate
+            
+        Examples:
+            >>> calc.solve("x^2-2", "x", bracket=(0, 2)).x
+            1.4142135623730951
+        """
+        method = self._solver_method(method or 'newton', self.SOLVE_METHODS)
+        if bracket is None and (x0 is None or method == 'brent'):
+            raise ValueError("solve() needs a bracket, or x0 with method='newton'")
+        start = time.perf_counter()
+        value, value_and_slope = self._objective(query, var, variables, session)
+        value = CountedFunction(value)
+        if method == 'brent':
+            x, y, iterations, converged = brent_root(value, *bracket, xtol, max_iterations)
+        else:
+            value_and_slope = CountedFunction(value_and_slope)
+            x, y, iterations, converged = safeguarded_root(value_and_slope, value, x0, bracket, xtol,
+                                                           max_iterations)
+            y = value(x)  # The iteration's last value belongs to the previous point
+            value.calls += value_and_slope.calls
+        return self._solve_result(x, y, converged, iterations, value.calls, start, method, 'solve')
+    
+    def minimize(self, query: Text, var: str, bracket: Tuple[float, float],
+                 variables: Optional[Dict[str, float]] = None, method: Optional[str] = None,
+                 xtol: float = 1e-10, max_iterations: int = 100,
+                 session: Optional[Session] = None) -> SolveResult:
+        """
+        Find a local minimum of an expression over an interval of one variable.
+        
+        'secant' finds where the exact derivative (from gradient()) crosses
+        zero from below, by secant steps safeguarded with bisection, and so
+        locates the minimum to `xtol`, passing over maxima and inflections
+        it lands on; an endpoint where the expression rises into the
+        interval is itself a minimum. 'brent' (golden-section search with
+        parabolic steps) uses values only and locates it to about the square
+        root of machine precision. By default 'secant' is used, and 'brent'
+        where the expression is not differentiable.
+        
+        Args:
+            query: Mathematical expression as string, or as UTF-8 bytes
+            var: The variable to minimize over
+            bracket: (a, b), the interval to search
+            variables: Values of the expression's other variables
+            method: 'secant' or 'brent'
+            xtol: Absolute tolerance on the minimizer
+            max_iterations: Give up (converged=False) after this many steps
+            session: Whose `ans` and budget to use (default: self.session)
+            
+        Returns:
+            SolveResult with the minimizer and the minimum as `value`
+            
+        Examples:
+            >>> calc.minimize("(x-1)^2+3", "x", bracket=(-5, 5)).x
+            1.0
+        """
+        chosen = self._solver_method(method or 'secant', self.MINIMIZE_METHODS)
+        start = time.perf_counter()
+        value, value_and_slope = self._objective(query, var, variables, session)
+        value, value_and_slope = CountedFunction(value), CountedFunction(value_and_slope)
+        low, high = min(bracket), max(bracket)
+        if chosen == 'secant':
+            try:
+                (y_low, slope_low), (y_high, slope_high) = value_and_slope(low), value_and_slope(high)
+                if slope_low > 0 or slope_high < 0:
+                    # Rising into the interval at an end: that end is a minimum
+                    x, y = min(((low, y_low), (high, y_high)) if slope_low > 0 and slope_high < 0
+                               else ((low, y_low),) if slope_low > 0 else ((high, y_high),),
+                               key=lambda point: point[1])
+                    iterations, converged = 0, True
+                else:
+                    x, _, iterations, converged = secant_minimum(
+                        lambda x: value_and_slope(x)[1], low, high, slope_low, slope_high, xtol,
+                        max_iterations)
+                    y = value(x)
+            except ValueError:
+                if method is not None:
+                    raise
+                chosen = 'brent'  # Not differentiable somewhere it looked: use values only
+        if chosen == 'brent':
+            x, y, iterations, converged = brent_minimum(value, low, high, xtol, max_iterations)
+        return self._solve_result(x, y, converged, iterations, value.calls + value_and_slope.calls,
+                                  start, chosen, 'minimize')
+    
+    def solve_vectorized(self, query: str, var: str, bracket: Tuple, variables: Optional[Dict] = None,
+                         xtol: float = 2e-12, max_iterations: int = 100) -> SolveResult:
+        """
+        solve() for a batch of independent problems at once, over NumPy arrays.
+        
+        The bracket ends and the other variables are arrays (or scalars)
+        broadcast to one shape, one problem per element. Every step runs
+        the program and its derivative once over all unconverged problems,
+        taking safeguarded Newton steps as solve(method='newton') does;
+        where the derivative is undefined an element is bisected. Problems
+        whose bracket has no sign change, or whose expression is undefined
+        at an end, do not stop the others: they end unconverged, with NaN.
+        
+        Returns:
+            SolveResult whose x, value, iterations and converged are arrays
+            of that shape, and whose evaluations counts passes over the batch
+            
+        Examples:
+            >>> calc.solve_vectorized("x^2-c", "x", bracket=(0, 10), variables={"c": [2.0, 9.0]}).x
+            array([1.41421356, 3.        ])
+        """
+        return self._solve_batch(query, var, bracket, variables, xtol, max_iterations, minimize=False)
+    
+    def minimize_vectorized(self, query: str, var: str, bracket: Tuple, variables: Optional[Dict] = None,
+                            xtol: float = 1e-10, max_iterations: int = 100) -> SolveResult:
+        """
+        minimize(method='secant') for a batch of independent problems at once.
+        
+        Arguments and result as in solve_vectorized(); problems where the
+        derivative is undefined at a step end unconverged, with NaN.
+        """
+        return self._solve_batch(query, var, bracket, variables, xtol, max_iterations, minimize=True)
+    
+    def _objective(self, query: Text, var: str, variables: Optional[Dict[str, float]],
+                   session: Optional[Session]) -> Tuple[Callable, Callable]:
+        """The expression compiled once, as functions of `var` alone: f(x) and f(x) -> (y, dy/dx)."""
+        if session is None:
+            session = self.session
+        if session.budget is not None:
+            session.budget.admit_text(query)
+        point = dict(variables or {})
+        point[var] = 0.0
+        program = self._get_program(query, point.keys())
+        program.check_bound(point)
+        evaluate, gradient = program.evaluate, program.gradient
+        
+        def value(x):
+            point[var] = x
+            return evaluate(point, session)
+        
+        def value_and_slope(x):
+            point[var] = x
+            y, partials = gradient(point, session)
+            return y, partials[var]
+        
+        return value, value_and_slope
+    
+    def _solve_batch(self, query: str, var: str, bracket: Tuple, variables: Optional[Dict],
+                     xtol: float, max_iterations: int, minimize: bool) -> SolveResult:
+        np = self._registry.vectorized_evaluator.np
+        start = time.perf_counter()
+        names = dict(variables or {})
+        names[var] = 0.0
+        program = self._get_program(query, names.keys())
+        program.check_bound(names)
+        arrays = np.broadcast_arrays(*(np.asarray(end, dtype=float) for end in bracket),
+                                     *(np.asarray(value, dtype=float) for value in (variables or {}).values()))
+        shape = arrays[0].shape
+        low, high = np.minimum(arrays[0], arrays[1]).ravel(), np.maximum(arrays[0], arrays[1]).ravel()
+        parameters = {name: array.ravel() for name, array in zip(variables or {}, arrays[2:])}
+        postfix, evaluator = program.postfix, self._registry.vectorized_dual_evaluator
+        
+        def run(x, index):
+            at = {name: values[index] for name, values in parameters.items()}
+            at[var] = x
+            y, partials, _ = evaluator.evaluate(postfix, at, self.session)
+            y[~np.isfinite(y)] = np.nan
+            return (partials[var], None) if minimize else (y, partials[var])
+        
+        everything = np.arange(low.size)
+        g_low, _ = run(low, everything)
+        g_high, _ = run(high, everything)
+        x = np.full(low.size, np.nan)
+        iterations = np.zeros(low.size, dtype=np.int64)
+        converged = np.zeros(low.size, dtype=bool)
+        if minimize:
+            # As in minimize(): an end the expression rises into the interval from is a minimum
+            rising_low, rising_high = g_low > 0, g_high < 0
+            x[rising_high] = high[rising_high]
+            x[rising_low] = low[rising_low]
+            converged = rising_low | rising_high
+            search = np.flatnonzero(~converged & ~np.isnan(g_low) & ~np.isnan(g_high))
+        else:
+            # Brackets without a sign change (or undefined at an end) are left unconverged
+            signs = ((g_low <= 0) & (g_high >= 0)) | ((g_low >= 0) & (g_high <= 0))
+            search = np.flatnonzero(signs)
+        
+        passes = 2
+        if search.size:
+            subset = lambda x, index: run(x, search[index])
+            found, steps, done, more = vectorized_safeguarded_root(
+                subset, low[search], high[search], g_low[search], g_high[search], xtol, max_iterations,
+                newton=not minimize)
+            x[search], iterations[search], converged[search] = found, steps, done
+            passes += more
+        if minimize:
+            # As in secant_minimum(): a root of f' that is not a minimum narrows the bracket
+            retry = search[converged[search]]
+            while retry.size:
+                delta = 2 * (xtol + RTOL * np.abs(x[retry]))
+                left, right = x[retry] - delta, x[retry] + delta
+                slope_left, _ = run(left, retry)
+                slope_right, _ = run(right, retry)
+                passes += 2
+                go_left = (left > low[retry]) & (slope_left >= 0)
+                go_right = ~go_left & (right < high[retry]) & (slope_right <= 0)
+                high[retry] = np.where(go_left, left, high[retry])
+                g_high[retry] = np.where(go_left, slope_left, g_high[retry])
+                low[retry] = np.where(go_right, right, low[retry])
+                g_low[retry] = np.where(go_right, slope_right, g_low[retry])
+                retry = retry[go_left | go_right]
+                iterations[retry] += 1
+                converged[retry[iterations[retry] >= max_iterations]] = False
+                retry = retry[iterations[retry] < max_iterations]
+                if retry.size:
+                    subset = lambda x, index, retry=retry: run(x, retry[index])
+                    found, steps, done, more = vectorized_safeguarded_root(
+                        subset, low[retry], high[retry], g_low[retry], g_high[retry], xtol,
+                        max_iterations - int(iterations[retry].min()), newton=False)
+                    x[retry], iterations[retry], converged[retry] = found, iterations[retry] + steps, done
+                    converged[retry[iterations[retry] > max_iterations]] = False
+                    passes += more
+                    retry = retry[converged[retry]]
+        at = dict(parameters)
+        at[var] = x
+        y, _ = self._registry.vectorized_evaluator.evaluate(postfix, at, self.session)
+        both = rising_low & rising_high if minimize else None
+        if minimize and both.any():
+            # Rising into the interval at both ends: the lower end
+            at[var] = high
+            y_high, _ = self._registry.vectorized_evaluator.evaluate(postfix, at, self.session)
+            lower = both & (y_high < y)
+            x[lower], y[lower] = high[lower], y_high[lower]
+            passes += 1
+        return self._solve_result(x.reshape(shape), np.asarray(y).reshape(shape), converged.reshape(shape),
+                                  iterations.reshape(shape), passes + 1, start,
+                                  'secant' if minimize else 'newton', 'minimize' if minimize else 'solve')
+    
+    @staticmethod
+    def _solver_method(method: str, methods: Tuple[str, ...]) -> str:
+        if method not in methods:
+            raise ValueError(f"Unknown method {method!r}; expected one of {', '.join(methods)}")
+        return method
+    
+    def _solve_result(self, x, value, converged, iterations, evaluations: int, start: float,
+                      method: str, stage: str) -> SolveResult:
+        seconds = time.perf_counter() - start
+        if self.instrumentation is not None:
+            self.instrumentation.record_stage(stage, seconds)
+        return SolveResult(x, value, converged, iterations, evaluations, seconds, method)
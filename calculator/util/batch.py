@@ -0,0 +1,227 @@
+import itertools
+import math
+from array import array
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Union
+
+from calculator.enum.error_code import ErrorCode
+from calculator.util.parser import as_text
+
+
+class BatchError:
+    """Placeholder result for an expression that failed inside a batch."""
+
+    __slots__ = ('query', 'error_type', 'message')
+
+    def __init__(self, query: str, error_type: str, message: str):
+        self.query = query
+        self.error_type = error_type
+        self.message = message
+
+    def __eq__(self, other) -> bool:
+        return (isinstance(other, BatchError) and
+                (self.query, self.error_type, self.message) ==
+                (other.query, other.error_type, other.message))
+
+    def __repr__(self) -> str:
+        return f"BatchError({self.query!r}, {self.error_type}: {self.message})"
+
+
+BatchResult = Union[float, BatchError]
+
+
+class BatchArrays:
+    """
+    Column-oriented batch results, one row per expression.
+
+    `values[i]` is the result as a float (NaN if the row failed), `codes[i]`
+    its ErrorCode (0 on success) and `positions[i]` the offset of a syntax
+    error in the expression (-1 otherwise). `errors` maps each failed row to
+    the BatchError that evaluate_batch() reports for it.
+    """
+
+    __slots__ = ('values', 'codes', 'positions', 'errors')
+
+    def __init__(self):
+        self.values = array('d')
+        self.codes = array('B')
+        self.positions = array('i')
+        self.errors: Dict[int, BatchError] = {}
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def extend(self, other: "BatchArrays") -> None:
+        """Append the rows of `other`."""
+        offset = len(self)
+        self.values.extend(other.values)
+        self.codes.extend(other.codes)
+        self.positions.extend(other.positions)
+        self.errors.update((row + offset, error) for row, error in other.errors.items())
+
+    def results(self) -> List[BatchResult]:
+        """Rows as evaluate_batch() returns them (results converted to float)."""
+        errors = self.errors
+        return [errors[row] if code else value
+                for row, (value, code) in enumerate(zip(self.values, self.codes))]
+
+    def __repr__(self) -> str:
+        return f"BatchArrays(rows={len(self)}, failed={len(self.errors)})"
+
+# Each worker process keeps one warm calculator for its whole lifetime
+_worker_calculator = None
+
+
+def _init_worker(state: Dict) -> None:
+    """Rebuild the parent's calculator from its worker_state()."""
+    global _worker_calculator
+    from calculator.stack_queue_calc import StackQueueCalculator
+    _worker_calculator = StackQueueCalculator.from_worker_state(state)
+
+
+def evaluate_chunk(calculator, queries: List[str]) -> List[BatchResult]:
+    """Evaluate independent expressions, turning each failure into a BatchError."""
+    results = []
+    budget = calculator.session.budget
+    for query in queries:
+        try:
+            if budget is not None:
+                budget.admit_text(query)
+            results.append(calculator.program(query).evaluate())
+        except Exception as e:
+            results.append(BatchError(query, type(e).__name__, str(e)))
+    return results
+
+
+def evaluate_chunk_arrays(calculator, queries: Iterable[str]) -> BatchArrays:
+    """
+    evaluate_chunk() into parallel arrays, without try/except on the caller's side.
+
+    Deterministic failures are remembered: a syntax error per text in the
+    calculator's failure cache, an evaluation error on the program when it
+    reads neither `ans` nor impure functions. Repeated bad inputs are then
+    answered without parsing, evaluating or raising again.
+    """
+    values = []
+    add = values.append
+    failed = []  # (row, (BatchError, code, position))
+    cache_key = calculator.cache_key
+    programs = calculator.program_cache
+    failures = calculator.failure_cache
+    session_names = calculator.dynamic_constants.keys() | calculator.impure_functions
+    budget = calculator.session.budget
+
+    for query in queries:
+        query = as_text(query)
+        key = cache_key(query)
+        program = programs.get(key)
+        failure = None
+        if program is None:
+            failure = failures.get(key)
+            if failure is None:
+                try:
+                    if budget is not None:
+                        budget.admit_text(query)
+                    program = calculator.compile(query)
+                except Exception as e:
+                    failure = (BatchError(query, type(e).__name__, str(e)),
+                               ErrorCode.classify(e, parsing=True), getattr(e, 'position', -1))
+                    if failure[1] != ErrorCode.BUDGET:  # Budgets can change; syntax cannot
+                        failures.put(key, failure)
+                else:
+                    programs.put(key, program)
+        if failure is None:
+            failure = program.known_failure
+            if failure is None:
+                try:
+                    value = program.evaluate()
+                    if type(value) is not float:
+                        value = float(value)  # Big ints and complex results fail here
+                except Exception as e:
+                    failure = (BatchError(query, type(e).__name__, str(e)), ErrorCode.classify(e), -1)
+                    if failure[1] != ErrorCode.BUDGET and not program.references(session_names):
+                        program.known_failure = failure
+                else:
+                    add(value)
+                    continue
+        failed.append((len(values), failure))
+        add(math.nan)
+
+    out = BatchArrays()
+    out.values = array('d', values)
+    out.codes = array('B', bytes(len(values)))
+    out.positions = array('i', [-1]) * len(values)
+    for row, (error, code, position) in failed:
+        out.codes[row] = code
+        out.positions[row] = position
+        out.errors[row] = error
+    return out
+
+
+def _evaluate_chunk_in_worker(queries: List[str]) -> List[BatchResult]:
+    return evaluate_chunk(_worker_calculator, queries)
+
+
+def _evaluate_chunk_arrays_in_worker(queries: List[str]) -> BatchArrays:
+    return evaluate_chunk_arrays(_worker_calculator, queries)
+
+
+def _chunks(queries: Iterable[str], chunksize: int) -> Iterator[List[str]]:
+    iterator = iter(queries)
+    while True:
+        chunk = list(itertools.islice(iterator, chunksize))
+        if not chunk:
+            return
+        yield chunk
+
+
+def iter_batch(calculator, queries: Iterable[str], workers: int = 1,
+               chunksize: int = 256, max_pending: Optional[int] = None) -> Iterator[BatchResult]:
+    """
+    Lazily evaluate `queries` in input order, optionally across worker processes.
+
+    At most `max_pending` chunks (default 2 per worker) are in flight at once,
+    so arbitrarily long iterables are processed in bounded memory.
+    """
+    for results in iter_chunks(calculator, queries, workers, chunksize, max_pending,
+                               evaluate_chunk, _evaluate_chunk_in_worker):
+        yield from results
+
+
+def batch_arrays(calculator, queries: Iterable[str], workers: int = 1, chunksize: int = 256,
+                 max_pending: Optional[int] = None) -> BatchArrays:
+    """evaluate_chunk_arrays() over all of `queries`, optionally across worker processes."""
+    if workers == 1:
+        return evaluate_chunk_arrays(calculator, queries)
+    out = BatchArrays()
+    for chunk in iter_chunks(calculator, queries, workers, chunksize, max_pending,
+                             evaluate_chunk_arrays, _evaluate_chunk_arrays_in_worker):
+        out.extend(chunk)
+    return out
+
+
+def iter_chunks(calculator, queries: Iterable[str], workers: int, chunksize: int,
+                max_pending: Optional[int], evaluate: Callable, evaluate_in_worker: Callable) -> Iterator:
+    """Yield `evaluate(calculator, chunk)` (or its worker counterpart) for each chunk, in order."""
+    if workers < 1:
+        raise ValueError(f"workers must be at least 1: {workers}")
+    if chunksize < 1:
+        raise ValueError(f"chunksize must be at least 1: {chunksize}")
+
+    if workers == 1:
+        for chunk in _chunks(queries, chunksize):
+            yield evaluate(calculator, chunk)
+        return
+
+    max_pending = max_pending or workers * 2
+    initargs = (calculator.worker_state(),)
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=initargs) as executor:
+        pending = deque()
+        for chunk in _chunks(queries, chunksize):
+            pending.append(executor.submit(evaluate_in_worker, chunk))
+            if len(pending) >= max_pending:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
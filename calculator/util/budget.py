@@ -0,0 +1,210 @@
+import math
+from typing import Iterable, List, Mapping, Optional, Tuple
+
+from calculator.util.cse import COMPARISONS, Load, Select, Store, VariadicCall
+
+# Functions with exact integer results, and those returning one of their arguments
+INTEGER_FUNCTIONS = frozenset({'floor', 'ceil', 'round', 'trunc'})
+PASSTHROUGH_FUNCTIONS = frozenset({'abs', 'max', 'min'})
+OPERATORS = frozenset("+-*/%^") | frozenset(COMPARISONS)
+
+
+class BudgetExceeded(Exception):
+    """An expression was rejected before running because it exceeds the caller's Budget."""
+
+
+class Cost:
+    """
+    Static estimate of what running a program takes.
+
+    `steps` is the number of instructions a run executes (for a
+    conditional, its dearer branch), `int_bits` the size of the largest
+    exact integer the program is known to build, and `work` the steps plus
+    one unit per 64-bit word of big-integer results. Values that depend on
+    variables or `ans` are not bounded here; MathFunctions.MAX_EXACT_BITS
+    caps them while the program runs.
+    """
+
+    __slots__ = ('steps', 'work', 'int_bits')
+
+    def __init__(self, steps: int = 0, work: float = 0, int_bits: float = 0):
+        self.steps = steps
+        self.work = work
+        self.int_bits = int_bits
+
+    def __repr__(self) -> str:
+        return f"Cost(steps={self.steps}, work={self.work}, int_bits={self.int_bits})"
+
+
+class Budget:
+    """
+    Limits on the expressions one caller (a Session) may run.
+
+    Checked before any work is done: the text length before parsing, and
+    the program's Cost before every run (the cost is computed once per
+    program, so a rejection is a few comparisons). Give each tenant a
+    Session with its own Budget to keep one expensive formula from
+    holding up everyone else. A limit of None is not checked.
+    """
+
+    __slots__ = ('max_length', 'max_steps', 'max_work', 'max_int_bits')
+
+    def __init__(self, max_length: Optional[int] = 4096, max_steps: Optional[int] = 10_000,
+                 max_work: Optional[float] = 100_000, max_int_bits: Optional[float] = 1 << 16):
+        self.max_length = max_length
+        self.max_steps = max_steps
+        self.max_work = max_work
+        self.max_int_bits = max_int_bits
+
+    def admit_text(self, query: str) -> None:
+        """Raise BudgetExceeded if `query` is too long to parse."""
+        if self.max_length is not None and len(query) > self.max_length:
+            raise BudgetExceeded(f"Expression too long: {len(query)} characters "
+                                 f"(budget {self.max_length})")
+
+    def admit(self, cost: Cost) -> None:
+        """Raise BudgetExceeded if a program of `cost` may not run."""
+        if self.max_steps is not None and cost.steps > self.max_steps:
+            raise BudgetExceeded(f"Expression too long: {cost.steps} operations (budget {self.max_steps})")
+        if self.max_int_bits is not None and cost.int_bits > self.max_int_bits:
+            raise BudgetExceeded(f"Expression too expensive: builds integers of about "
+                                 f"{cost.int_bits:.0f} bits (budget {self.max_int_bits})")
+        if self.max_work is not None and cost.work > self.max_work:
+            raise BudgetExceeded(f"Expression too expensive: about {cost.work:.0f} work units "
+                                 f"(budget {self.max_work})")
+
+    def __repr__(self) -> str:
+        return (f"Budget(max_length={self.max_length}, max_steps={self.max_steps}, "
+                f"max_work={self.max_work}, max_int_bits={self.max_int_bits})")
+
+
+class CostEstimator:
+    """
+    Computes the Cost of a postfix program without running it.
+
+    Tracks, for each value on the evaluation stack, whether it is a float
+    (0), an exact integer of at most some number of bits, or of unknown size
+    (None: variables, `ans`, and anything computed from them). Integer
+    powers with a literal exponent are bounded by base bits * exponent.
+    """
+
+    def __init__(self, functions: Iterable[str], binary_functions: Iterable[str],
+                 user_functions: Optional[Mapping] = None):
+        self.functions = frozenset(functions)
+        self.binary_functions = frozenset(binary_functions)
+        self.user_functions = user_functions if user_functions is not None else {}
+
+    def estimate(self, postfix: List) -> Cost:
+        steps, work, int_bits, _ = self._estimate(postfix)
+        return Cost(steps, work, int_bits)
+
+    def _estimate(self, postfix: List) -> Tuple[int, float, float, Tuple]:
+        """(steps, work, int_bits, entry of the result) of one program or branch."""
+        # One (bits, exact integer value or None) per stack entry
+        stack: List[Tuple[Optional[float], Optional[int]]] = []
+        slots = {}
+        work = 0
+        int_bits = 0
+
+        steps = len(postfix)
+        for token in postfix:
+            kind = type(token)
+            if kind is float:
+                entry = (0, None)
+            elif kind is int:
+                entry = (max(1, token.bit_length()), token)
+            elif kind is Store:
+                slots[token.slot] = stack[-1]
+                continue
+            elif kind is Load:
+                entry = slots[token.slot]
+            elif kind is Select:
+                # Only one branch runs: charge the dearer one
+                stack.pop()
+                branches = [self._estimate(token.then), self._estimate(token.otherwise)]
+                steps += max(branch[0] for branch in branches)
+                work += max(branch[1] for branch in branches)
+                int_bits = max(int_bits, *(branch[2] for branch in branches))
+                (then_bits, _), (otherwise_bits, _) = (branch[3] for branch in branches)
+                entry = ((None if then_bits is None or otherwise_bits is None
+                          else max(then_bits, otherwise_bits)), None)
+            elif kind is VariadicCall:
+                arguments = stack[len(stack) - token.count:]
+                del stack[len(stack) - token.count:]
+                entry = self._variadic(token.name, arguments)
+            elif token == '~':
+                bits, value = stack.pop()
+                entry = (bits, None if value is None else -value)
+            elif token in self.functions:
+                entry = self._unary(token, stack.pop())
+            elif token in self.binary_functions or token in OPERATORS:
+                b = stack.pop()
+                entry = self._binary(token, stack.pop(), b)
+            elif token in self.user_functions:
+                function = self.user_functions[token]
+                del stack[len(stack) - function.arity:]
+                entry = (None, None)
+                steps += len(function.postfix)  # The called body runs as well
+                work += len(function.postfix)
+            else:
+                entry = (None, None)  # Variable or dynamic constant
+            stack.append(entry)
+
+            bits = entry[0]
+            work += 1
+            if bits:
+                work += bits / 64
+                int_bits = max(int_bits, bits)
+
+        return steps, work, int_bits, stack[-1] if stack else (None, None)
+
+    @staticmethod
+    def _unary(name: str, argument: Tuple) -> Tuple:
+        bits, value = argument
+        if name in INTEGER_FUNCTIONS:
+            return (1024 if bits == 0 else bits, None)  # A float's integer part has at most 1024 bits
+        if name in PASSTHROUGH_FUNCTIONS:
+            return (bits, None if value is None else abs(value))
+        if name == 'exp10':
+            return CostEstimator._power((4, 10), argument)
+        return (0, None)
+
+    @staticmethod
+    def _variadic(name: str, arguments: List[Tuple]) -> Tuple:
+        if name in PASSTHROUGH_FUNCTIONS:
+            if any(bits is None for bits, _ in arguments):
+                return (None, None)
+            return (max(bits for bits, _ in arguments), None)
+        return (0, None)  # The aggregates all return floats
+
+    @staticmethod
+    def _binary(name: str, a: Tuple, b: Tuple) -> Tuple:
+        if name == '^' or name == 'pow':
+            return CostEstimator._power(a, b)
+        if name in PASSTHROUGH_FUNCTIONS:
+            if a[0] is None or b[0] is None:
+                return (None, None)
+            return (max(a[0], b[0]), None)
+        if name in ('+', '-', '*', '%'):
+            if a[0] is None or b[0] is None:
+                return (None, None)
+            if not (a[0] and b[0]):
+                return (0, None)  # Mixed with a float: the result is a float
+            if name == '*':
+                return (a[0] + b[0], None)
+            if name == '%':
+                return (b[0], None)
+            return (max(a[0], b[0]) + 1, None)
+        return (0, None)
+
+    @staticmethod
+    def _power(base: Tuple, exponent: Tuple) -> Tuple:
+        if base[0] is None or exponent[0] is None:
+            return (None, None)
+        if not (base[0] and exponent[0]):
+            return (0, None)
+        if base[1] is not None and abs(base[1]) <= 1:
+            return (1, None)
+        if exponent[1] is not None:
+            return (base[0] * exponent[1], None) if exponent[1] > 0 else (0, None)
+        return (math.inf, None)  # An integer exponent of unknown value
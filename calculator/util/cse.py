@@ -0,0 +1,211 @@
+import math
+from typing import Dict, Iterable, Iterator, List, Mapping, Set
+
+# Comparison operators; they give 1.0 for true and 0.0 for false
+COMPARISONS = ('<', '<=', '>', '>=', '==', '!=')
+
+
+class Store:
+    """Postfix marker: remember the value on top of the stack (without popping) in `slot`."""
+
+    __slots__ = ('slot',)
+
+    def __init__(self, slot: int):
+        self.slot = slot
+
+    def __repr__(self) -> str:
+        return f"store#{self.slot}"
+
+
+class Load:
+    """Postfix marker: push the value remembered in `slot`."""
+
+    __slots__ = ('slot',)
+
+    def __init__(self, slot: int):
+        self.slot = slot
+
+    def __repr__(self) -> str:
+        return f"load#{self.slot}"
+
+
+class VariadicCall:
+    """Postfix marker: call the variadic function `name` on the top `count` values."""
+
+    __slots__ = ('name', 'count')
+
+    def __init__(self, name: str, count: int):
+        self.name = name
+        self.count = count
+
+    def __eq__(self, other) -> bool:
+        return type(other) is VariadicCall and other.name == self.name and other.count == self.count
+
+    def __hash__(self) -> int:
+        return hash((VariadicCall, self.name, self.count))
+
+    def __repr__(self) -> str:
+        return f"{self.name}/{self.count}"
+
+
+class Select:
+    """
+    Postfix marker: pop a condition and run one of two branch programs.
+
+    `then` runs if the condition is non-zero, `otherwise` if it is zero;
+    each is a postfix list of its own that pushes exactly one value, and
+    the branch not taken is never evaluated. Branches have their own
+    shared-subexpression slots (numbered apart from the enclosing program's)
+    and never Load a slot stored outside them.
+    """
+
+    __slots__ = ('then', 'otherwise')
+
+    def __init__(self, then: List, otherwise: List):
+        self.then = then
+        self.otherwise = otherwise
+
+    def __repr__(self) -> str:
+        return f"select({self.then!r}, {self.otherwise!r})"
+
+
+def walk(postfix: List) -> Iterator:
+    """Every token of `postfix`, including those inside Select branches."""
+    pending = [iter(postfix)]
+    while pending:
+        for token in pending[-1]:
+            if type(token) is Select:
+                pending.append(iter(token.otherwise))
+                pending.append(iter(token.then))
+                break
+            yield token
+        else:
+            pending.pop()
+
+
+class SubexpressionEliminator:
+    """
+    Common-subexpression elimination over postfix programs.
+
+    Builds a hash-consed DAG of the program: structurally identical pure
+    operations map to one node. Each operation node used more than once is
+    computed at its first occurrence and stored (Store); later occurrences
+    are replaced by a Load of that slot. Impure functions (e.g. `rand`) are
+    never merged, so every call still produces its own value. The branches
+    of a conditional (Select) are eliminated separately, so nothing computed
+    in a branch that may not run is reused outside it.
+
+    Run it after PostfixOptimizer; the optimizer does not understand slots.
+    """
+
+    OPERATORS = set("+-*/%^") | set(COMPARISONS)
+
+    def __init__(self, functions: Iterable[str], binary_functions: Iterable[str],
+                 impure_functions: Set[str], user_functions: Mapping = None):
+        self.functions = frozenset(functions)
+        self.binary_functions = frozenset(binary_functions)
+        self.impure_functions = impure_functions
+        # Name -> number of arguments of each user-defined function
+        self.user_arities = {name: function.arity for name, function in (user_functions or {}).items()}
+
+    def eliminate(self, postfix: List) -> List:
+        """Return `postfix` with repeated subexpressions computed once (unchanged if none repeat)."""
+        return self._eliminate(postfix, [0])
+
+    def _eliminate(self, postfix: List, next_slot: List[int]) -> List:
+        """eliminate() of one branch; `next_slot` holds the first slot number still free."""
+        # Pass 1: hash-cons every token into a DAG node and count edges into each node
+        node_of: Dict = {}       # structural key -> node id
+        uses: List[int] = []     # node id -> number of distinct parent edges
+        is_operation: List[bool] = []
+        token_nodes: List[int] = []
+        arities: List[int] = []
+        stack: List[int] = []
+
+        for token in postfix:
+            arity = self._arity(token)
+            if arity is None:
+                return postfix  # Not a program this pass understands
+            if len(stack) < arity:
+                return postfix  # Malformed; let the evaluator report it
+            if arity:
+                children = tuple(stack[-arity:])
+                del stack[-arity:]
+                key = None if type(token) is Select or token in self.impure_functions else (token, children)
+            else:
+                children = ()
+                key = self._leaf_key(token)
+
+            node = node_of.get(key) if key is not None else None
+            if node is None:
+                node = len(uses)
+                uses.append(0)
+                is_operation.append(arity > 0)
+                for child in children:
+                    uses[child] += 1
+                if key is not None:
+                    node_of[key] = node
+            stack.append(node)
+            token_nodes.append(node)
+            arities.append(arity)
+
+        if len(stack) != 1:
+            return postfix
+        if (not any(count > 1 and operation for count, operation in zip(uses, is_operation))
+                and not any(type(token) is Select for token in postfix)):
+            return postfix
+
+        # Pass 2: re-emit, storing shared operations and truncating their repeats to a Load
+        out = []
+        starts: List[int] = []  # Start index in `out` of each operand on the evaluation stack
+        slots: Dict[int, int] = {}
+
+        for token, node, arity in zip(postfix, token_nodes, arities):
+            if arity:
+                start = starts[-arity]
+                del starts[-arity:]
+            else:
+                start = len(out)
+
+            slot = slots.get(node)
+            if slot is not None:
+                del out[start:]
+                out.append(Load(slot))
+            elif type(token) is Select:
+                out.append(Select(self._eliminate(token.then, next_slot),
+                                  self._eliminate(token.otherwise, next_slot)))
+            else:
+                out.append(token)
+                if is_operation[node] and uses[node] > 1:
+                    slot = next_slot[0]
+                    next_slot[0] += 1
+                    slots[node] = slot
+                    out.append(Store(slot))
+            starts.append(start)
+
+        return out
+
+    def _arity(self, token):
+        if isinstance(token, (int, float)):
+            return 0
+        if type(token) is VariadicCall:
+            return token.count
+        if type(token) is Select:
+            return 1  # The condition; the branches are eliminated on their own
+        if not isinstance(token, str):
+            return None
+        if token == '~' or token in self.functions:
+            return 1
+        if token in self.binary_functions or token in self.OPERATORS:
+            return 2
+        if token in self.user_arities:
+            return self.user_arities[token]
+        return 0  # Variable or dynamic constant: constant within one evaluation
+
+    @staticmethod
+    def _leaf_key(token):
+        # 0.0 == -0.0 and 1 == 1.0, but they can give different results
+        if isinstance(token, (int, float)):
+            zero_sign = math.copysign(1.0, token) if token == 0 else 0.0
+            return ('#', type(token), token, zero_sign)
+        return ('$', token)
@@ -0,0 +1,259 @@
+from typing import Callable, Dict, List, Optional, Tuple
+
+from calculator.funtions.math_functions import MathFunctions
+from calculator.util.cse import COMPARISONS, Load, Select, Store, VariadicCall
+from calculator.util.dual_eval import OPERATORS, DualEvaluator
+from calculator.util.postfix_compiler import PostfixCompiler
+from calculator.util.session import Session
+
+# (value, {variable index: partial}) of one stack entry, as Python expressions
+Entry = Tuple[str, Dict[int, str]]
+
+
+class DualCompiler:
+    """
+    Translates a postfix program and its derivatives into one native Python function.
+
+    The generated code is what DualEvaluator does, unrolled: each operation
+    computes its value as PostfixCompiler would, then one plain float per
+    partial derivative it has (known when generating, so constants cost
+    nothing), with no dual-number objects or dictionaries at run time.
+    Arithmetic is differentiated inline; other functions call their rule
+    from Derivatives once and scale each partial by it.
+    """
+
+    def __init__(self, dual_evaluator: DualEvaluator):
+        self.dual_evaluator = dual_evaluator
+        self.evaluator = dual_evaluator.evaluator
+        self.derivatives = dual_evaluator.derivatives
+
+    def compile(self, postfix: List, variables: Tuple[str, ...] = ()
+                ) -> Callable[[Optional[Dict[str, float]], Optional[Session]], Tuple[float, Dict[str, float]]]:
+        """Return `f(variables, session) -> (value, {name: partial})` for each name in `variables`."""
+        namespace = {'__builtins__': {'ZeroDivisionError': ZeroDivisionError, 'type': type, 'int': int, 'sum': sum}}
+        source = self._generate(postfix, variables, namespace)
+        code = None
+        if source is not None:
+            try:
+                code = compile(source, '<calculator gradient>', 'exec')
+            except (SyntaxError, RecursionError):
+                pass  # Conditionals nested too deeply for Python's own compiler
+        if code is None:
+            evaluate = self.dual_evaluator.evaluate
+            return lambda values=None, session=None: evaluate(
+                postfix, {name: values[name] for name in variables}, session)
+        exec(code, namespace)
+        return namespace['gradient']
+
+    def _generate(self, postfix: List, variables: Tuple[str, ...], namespace: Dict) -> Optional[str]:
+        """Python source for `postfix` and its gradient, or None if it is not a well-formed program."""
+        if not postfix:
+            return None
+
+        evaluator = self.evaluator
+        derivatives = self.derivatives
+        index = {name: i for i, name in enumerate(variables)}
+        bound = {}  # id(object) -> global name in the generated function
+        lines = ["def gradient(variables=None, session=None):"]
+        stack: List[Entry] = []
+        temps = set()
+        slots: Dict[int, Entry] = {}
+        indent = ["    "]
+        float_literals = set()
+        bodies = {}  # User function name -> global name of its compiled gradient
+
+        def bind(value) -> str:
+            name = bound.get(id(value))
+            if name is None:
+                name = f"_g{len(bound)}"
+                bound[id(value)] = name
+                namespace[name] = value
+            return name
+
+        def temporary() -> str:
+            name = f"t{len(temps)}"
+            temps.add(name)
+            return name
+
+        def emit(expression: str) -> str:
+            name = temporary()
+            lines.append(f"{indent[0]}{name} = {expression}")
+            return name
+
+        def scaled(factor: str, partial: str) -> str:
+            return partial if factor == "1.0" else factor if partial == "1.0" else f"{factor} * {partial}"
+
+        def rule(name: str, function: Callable, *arguments: str) -> str:
+            """The derivative factor of `name` at `arguments` (the last is the result)."""
+            partial = bind(DualEvaluator._partial)
+            return emit(f"{partial}({name!r}, {bind(function)}, {', '.join(arguments)})")
+
+        def chain(*terms: Tuple[str, Dict[int, str]]) -> Dict[int, str]:
+            """Sum over (factor, gradient) of factor * gradient, per variable."""
+            gradient: Dict[int, List[str]] = {}
+            for factor, partials in terms:
+                for i, partial in partials.items():
+                    gradient.setdefault(i, []).append(scaled(factor, partial))
+            # A single part that is a name or literal needs no temporary of its own
+            return {i: (parts[0] if len(parts) == 1 and ' ' not in parts[0]
+                        else emit(parts[0] if len(parts) == 1 else " + ".join(parts) if len(parts) <= 8
+                                  else f"sum(({', '.join(parts)},))"))
+                    for i, parts in gradient.items()}
+
+        def divide(numerator: str, divisor: str, operator: str) -> Tuple[str, str]:
+            """(quotient or remainder, divisor), guarded like PostfixEvaluator._calc."""
+            divisor = divisor if divisor in temps else emit(divisor)  # Evaluated once
+            message = "Cannot divide by zero" if operator == '/' else "Cannot modulo by zero"
+            lines.append(f"{indent[0]}if {divisor} == 0:")
+            lines.append(f"{indent[0]}    raise ZeroDivisionError({message!r})")
+            return emit(f"{numerator} {operator} {divisor}"), divisor
+
+        def power(base: str, exponent: str) -> str:
+            if exponent in float_literals:
+                return emit(f"{base} ** {exponent}")
+            # Integer exponents may build huge exact integers; guard them like _calc
+            exponent = exponent if exponent in temps else emit(exponent)
+            return emit(f"{base} ** {exponent} if type({exponent}) is not int "
+                        f"else {bind(MathFunctions.exact_power)}({base}, {exponent})")
+
+        def binary(token: str, a: Entry, b: Entry) -> Entry:
+            (x, x_gradient), (y, y_gradient) = a, b
+            if token in ('+', '-', '*'):
+                value = emit(f"{x} {token} {y}")
+                if token == '*':
+                    return value, chain((y, x_gradient), (x, y_gradient))
+                negated = {i: emit(f"-{partial}") for i, partial in y_gradient.items()} if token == '-' else y_gradient
+                return value, chain(("1.0", x_gradient), ("1.0", negated))
+            if token == '/':
+                value, divisor = divide(x, y, '/')
+                factors = []
+                if x_gradient:
+                    factors.append((emit(f"1 / {divisor}"), x_gradient))
+                if y_gradient:
+                    factors.append((emit(f"-{value} / {divisor}"), y_gradient))
+                return value, chain(*factors)
+            if token in COMPARISONS:
+                return emit(f"1.0 if {x} {token} {y} else 0.0"), {}
+            if token == '%':
+                value, _ = divide(x, y, '%')
+            elif token == '^':
+                value = power(x, y)
+            else:
+                value = emit(f"{bind(evaluator.binary_functions[token])}({x}, {y})")
+            if token in derivatives.CONSTANT or not (x_gradient or y_gradient):
+                return value, {}
+            x_rule, y_rule = derivatives.binary[token]
+            factors = []
+            if x_gradient:
+                factors.append((rule(token, x_rule, x, y, value), x_gradient))
+            if y_gradient:
+                factors.append((rule(token, y_rule, x, y, value), y_gradient))
+            return value, chain(*factors)
+
+        def block(tokens: List) -> bool:
+            """Generate statements for `tokens`; False if they are not a well-formed program."""
+            for token in tokens:
+                if isinstance(token, (int, float)):
+                    literal = PostfixCompiler._literal(token, bind)
+                    if type(token) is float:
+                        float_literals.add(literal)
+                    stack.append((literal, {}))
+                elif type(token) is Select:
+                    if len(stack) < 1:
+                        return False
+                    condition, _ = stack.pop()
+                    value = temporary()
+                    outer = indent[0]
+                    results = []
+                    for keyword, branch in ((f"if {condition}:", token.then), ("else:", token.otherwise)):
+                        lines.append(f"{outer}{keyword}")
+                        indent[0] = outer + "    "
+                        depth = len(stack)
+                        if not block(branch) or len(stack) != depth + 1:
+                            return False
+                        results.append((len(lines), indent[0], stack.pop()))
+                    indent[0] = outer
+                    # Both branches assign the same temporaries: the value and every partial either has
+                    partials = {i: temporary() for i in sorted({i for *_, (_, g) in results for i in g})}
+                    for end, inner, (branch_value, gradient) in reversed(results):
+                        assignments = [f"{inner}{value} = {branch_value}"]
+                        assignments += [f"{inner}{name} = {gradient.get(i, '0.0')}" for i, name in partials.items()]
+                        lines[end:end] = assignments
+                    stack.append((value, partials))
+                elif token in index:
+                    stack.append((f"variables[{token!r}]", {index[token]: "1.0"}))
+                elif token in evaluator.dynamic_constants:
+                    stack.append((f"{bind(evaluator.dynamic_constants[token])}(session)", {}))
+                elif token == '~':
+                    if len(stack) < 1:
+                        return False
+                    value, gradient = stack.pop()
+                    stack.append((emit(f"-{value}"), {i: emit(f"-{partial}") for i, partial in gradient.items()}))
+                elif token in evaluator.functions:
+                    if len(stack) < 1:
+                        return False
+                    x, gradient = stack.pop()
+                    value = emit(f"{bind(evaluator.functions[token])}({x})")
+                    if gradient and token not in derivatives.CONSTANT:
+                        factor = rule(token, derivatives.unary[token], x, value)
+                        stack.append((value, chain((factor, gradient))))
+                    else:
+                        stack.append((value, {}))
+                elif token in evaluator.binary_functions or token in OPERATORS:
+                    if len(stack) < 2:
+                        return False
+                    b = stack.pop()
+                    stack.append(binary(token, stack.pop(), b))
+                elif token in evaluator.user_functions:
+                    function = evaluator.user_functions[token]
+                    if len(stack) < function.arity:
+                        return False
+                    arguments = stack[-function.arity:]
+                    del stack[-function.arity:]
+                    # The body's own gradient with respect to its parameters, chained to the arguments
+                    if token not in bodies:
+                        bodies[token] = bind(self.compile(function.postfix, function.parameters))
+                    body = bodies[token]
+                    call = ", ".join(f"{parameter!r}: {value}"
+                                     for parameter, (value, _) in zip(function.parameters, arguments))
+                    result = emit(f"{body}({{{call}}})")
+                    partials = emit(f"{result}[1]")
+                    factors = [(emit(f"{partials}[{parameter!r}]"), gradient)
+                               for parameter, (_, gradient) in zip(function.parameters, arguments) if gradient]
+                    stack.append((emit(f"{result}[0]"), chain(*factors)))
+                elif type(token) is VariadicCall:
+                    if len(stack) < token.count or token.name not in evaluator.variadic_functions:
+                        return False
+                    arguments = stack[-token.count:]
+                    del stack[-token.count:]
+                    values = ", ".join(value for value, _ in arguments)
+                    value = emit(f"{bind(evaluator.variadic_functions[token.name])}({values})")
+                    if token.name in derivatives.CONSTANT or not any(gradient for _, gradient in arguments):
+                        stack.append((value, {}))
+                        continue
+                    factors = rule(token.name, derivatives.variadic[token.name], f"[{values}]", value)
+                    stack.append((value, chain(*((f"{factors}[{j}]", gradient)
+                                                 for j, (_, gradient) in enumerate(arguments) if gradient))))
+                elif type(token) is Load:
+                    if token.slot not in slots:
+                        return False
+                    stack.append(slots[token.slot])
+                elif type(token) is Store:
+                    if len(stack) < 1:
+                        return False
+                    value, gradient = stack.pop()
+                    if value not in temps:
+                        value = emit(value)
+                    stack.append((value, gradient))
+                    slots[token.slot] = stack[-1]
+                else:
+                    return False
+            return True
+
+        if not block(postfix) or len(stack) != 1:
+            return None
+
+        value, gradient = stack[0]
+        partials = ", ".join(f"{name!r}: {gradient.get(i, '0.0')}" for name, i in index.items())
+        lines.append(f"    return {value}, {{{partials}}}")
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,227 @@
+from typing import Dict, List, Optional, Tuple
+
+from calculator.funtions.derivatives import Derivatives
+from calculator.funtions.vectorized_functions import require_numpy
+from calculator.util.cse import Load, Select, Store, VariadicCall
+from calculator.util.opcodes import COMPARISON_FUNCTIONS
+from calculator.util.postfix_eval import PostfixEvaluator
+from calculator.util.session import Session
+from calculator.util.vectorized_eval import VectorizedEvaluator
+
+# Partial derivatives by variable name; a missing name means zero
+Gradient = Dict[str, float]
+NO_GRADIENT: Gradient = {}
+OPERATORS = frozenset('+-*/%^') | frozenset(COMPARISON_FUNCTIONS)
+
+
+def _scaled(gradient: Gradient, factor) -> Gradient:
+    return {name: factor * partial for name, partial in gradient.items()}
+
+
+def _accumulate(total: Gradient, gradient: Gradient, factor) -> None:
+    """total += factor * gradient, in place (`total` must be a fresh dict)."""
+    for name, partial in gradient.items():
+        total[name] = total[name] + factor * partial if name in total else factor * partial
+
+
+class DualEvaluator:
+    """
+    Evaluates a postfix program and all its partial derivatives in one pass.
+
+    Forward-mode differentiation: every stack entry is a dual number, the
+    value PostfixEvaluator would compute paired with its gradient, and each
+    step applies the chain rule with the rules in Derivatives. Gradients are
+    sparse, so constant subexpressions carry none and no rule runs for them.
+    A conditional follows the branch taken; its condition contributes no
+    derivative.
+    """
+
+    def __init__(self, evaluator: PostfixEvaluator, derivatives: Derivatives):
+        self.evaluator = evaluator
+        self.derivatives = derivatives
+
+    def evaluate(self, postfix: List, variables: Optional[Dict[str, float]] = None,
+                 session: Optional[Session] = None) -> Tuple[float, Gradient]:
+        """
+        Run `postfix` at the point `variables`.
+
+        Returns:
+            (value, gradient) with one partial derivative per variable
+
+        Raises:
+            ValueError: if a function is not differentiable at the point
+        """
+        if not postfix:
+            raise ValueError("Empty postfix expression")
+        duals = {name: (value, {name: 1.0}) for name, value in (variables or {}).items()}
+        value, gradient = self._run(postfix, duals, session, None)
+        return value, {name: gradient.get(name, 0.0) for name in duals}
+
+    def _run(self, postfix: List, variables: Dict[str, Tuple], session: Optional[Session],
+             errors) -> Tuple:
+        evaluator = self.evaluator
+        constant = self.derivatives.CONSTANT
+        stack = []
+        slots = {}  # Shared subexpressions (see SubexpressionEliminator)
+
+        for token in postfix:
+            if isinstance(token, (int, float)):
+                stack.append((token, NO_GRADIENT))
+            elif token in variables:
+                stack.append(variables[token])
+            elif token in evaluator.dynamic_constants:
+                stack.append((evaluator.dynamic_constants[token](session), NO_GRADIENT))
+            elif token == '~':
+                value, gradient = stack.pop()
+                stack.append((-value, _scaled(gradient, -1.0)))
+            elif token in evaluator.functions:
+                x, gradient = stack.pop()
+                y = self._apply(errors, evaluator.functions[token], x)
+                if gradient and token not in constant:
+                    gradient = _scaled(gradient, self._partial(token, self.derivatives.unary[token], x, y))
+                else:
+                    gradient = NO_GRADIENT
+                stack.append((y, gradient))
+            elif token in evaluator.binary_functions or token in OPERATORS:
+                b, b_gradient = stack.pop()
+                a, a_gradient = stack.pop()
+                if token in evaluator.binary_functions:
+                    y = self._apply(errors, evaluator.binary_functions[token], a, b)
+                else:
+                    y = self._operate(errors, a, b, token)
+                gradient = NO_GRADIENT
+                if (a_gradient or b_gradient) and token not in constant:
+                    a_rule, b_rule = self.derivatives.binary[token]
+                    gradient = {}
+                    if a_gradient:
+                        _accumulate(gradient, a_gradient, self._partial(token, a_rule, a, b, y))
+                    if b_gradient:
+                        _accumulate(gradient, b_gradient, self._partial(token, b_rule, a, b, y))
+                stack.append((y, gradient))
+            elif token in evaluator.user_functions:
+                # Not inlined: differentiate through the compiled body
+                function = evaluator.user_functions[token]
+                arguments = stack[-function.arity:]
+                del stack[-function.arity:]
+                stack.append(self._run(function.postfix, dict(zip(function.parameters, arguments)), None, errors))
+            elif type(token) is VariadicCall:
+                arguments = stack[-token.count:]
+                del stack[-token.count:]
+                values = [value for value, _ in arguments]
+                y = self._apply(errors, evaluator.variadic_functions[token.name], *values)
+                gradient = NO_GRADIENT
+                if token.name not in constant and any(partials for _, partials in arguments):
+                    gradient = {}
+                    rule = self.derivatives.variadic[token.name]
+                    for (_, argument_gradient), partial in zip(arguments, self._partial(token.name, rule, values, y)):
+                        if argument_gradient:
+                            _accumulate(gradient, argument_gradient, partial)
+                stack.append((y, gradient))
+            elif type(token) is Select:
+                condition, _ = stack.pop()
+                stack.append(self._select(token, condition, variables, session, errors))
+            elif type(token) is Load:
+                stack.append(slots[token.slot])
+            elif type(token) is Store:
+                slots[token.slot] = stack[-1]
+            else:
+                raise ValueError(f"Invalid token in postfix: {token}")
+
+        if len(stack) != 1:
+            raise ValueError("Invalid expression: too many operands")
+        return stack[0]
+
+    def _select(self, select: Select, condition, variables: Dict[str, Tuple], session, errors) -> Tuple:
+        return self._run(select.then if condition else select.otherwise, variables, session, errors)
+
+    def _apply(self, errors, function, *arguments):
+        return function(*arguments)
+
+    def _operate(self, errors, a, b, operator: str):
+        if operator in COMPARISON_FUNCTIONS:
+            return COMPARISON_FUNCTIONS[operator](a, b)
+        return self.evaluator._calc(a, b, operator)
+
+    @staticmethod
+    def _partial(name: str, rule, *arguments):
+        """rule(*arguments), whose last argument is the result; raises where it is undefined."""
+        try:
+            return rule(*arguments)
+        except (ArithmeticError, ValueError):
+            point = arguments[0] if type(arguments[0]) is list else arguments[:-1]
+            raise ValueError(f"'{name}' is not differentiable at ({', '.join(map(str, point))})") from None
+
+
+class VectorizedDualEvaluator(DualEvaluator):
+    """
+    DualEvaluator over whole NumPy arrays of evaluation points.
+
+    As in VectorizedEvaluator, nothing raises: elements where the value or
+    a derivative is undefined are flagged in the error mask, and each
+    branch of a conditional runs only on the elements that select it.
+    """
+
+    def __init__(self, evaluator: VectorizedEvaluator, derivatives: Derivatives):
+        super().__init__(evaluator, derivatives)
+        self.np = require_numpy()
+
+    def evaluate(self, postfix: List, variables: Optional[Dict] = None,
+                 session: Optional[Session] = None) -> Tuple:
+        """
+        Run `postfix` with each variable bound to an array (or scalar) of points.
+
+        Returns:
+            (value, gradient, error_mask) broadcast to the common shape of
+            the inputs; partials are NaN where the mask is set
+        """
+        np = self.np
+        if not postfix:
+            raise ValueError("Empty postfix expression")
+        variables = {name: np.asarray(value, dtype=float) for name, value in (variables or {}).items()}
+        shape = np.broadcast_shapes(*(value.shape for value in variables.values()))
+        errors = np.zeros(shape, dtype=bool)
+        duals = {name: (value, {name: 1.0}) for name, value in variables.items()}
+
+        with np.errstate(all='ignore'):
+            value, gradient = self._run(postfix, duals, session, errors)
+            value = np.broadcast_to(np.asarray(value, dtype=float), shape).copy()
+            partials = {name: np.broadcast_to(np.asarray(gradient.get(name, 0.0), dtype=float), shape).copy()
+                        for name in duals}
+            for partial in partials.values():
+                errors |= ~np.isfinite(partial) & np.isfinite(value)
+            for partial in partials.values():
+                partial[errors] = np.nan
+        return value, partials, errors
+
+    def _select(self, select: Select, condition, variables: Dict[str, Tuple], session, errors) -> Tuple:
+        """Run each branch on the elements whose `condition` picks it, then merge."""
+        np = self.np
+        shape = errors.shape
+        taken = np.broadcast_to(np.not_equal(condition, 0), shape)
+        if taken.all() or not taken.any():
+            return self._run(select.then if taken.all() else select.otherwise, variables, session, errors)
+        value = np.empty(shape)
+        gradient = {}
+        for mask, branch in ((taken, select.then), (~taken, select.otherwise)):
+            subset = {name: (np.broadcast_to(x, shape)[mask],
+                             {wrt: np.broadcast_to(partial, shape)[mask] for wrt, partial in partials.items()})
+                      for name, (x, partials) in variables.items()}
+            failed = np.zeros(int(mask.sum()), dtype=bool)
+            branch_value, branch_gradient = self._run(branch, subset, session, failed)
+            value[mask] = branch_value
+            errors[mask] |= failed
+            for wrt, partial in branch_gradient.items():
+                if wrt not in gradient:
+                    gradient[wrt] = np.zeros(shape)
+                gradient[wrt][mask] = partial
+        return value, gradient
+
+    def _apply(self, errors, function, *arguments):
+        return self.evaluator._apply(function, errors, *arguments)
+
+    def _operate(self, errors, a, b, operator: str):
+        return self.evaluator._apply(self.evaluator._calc, errors, a, b, operator)
+
+    @staticmethod
+    def _partial(name: str, rule, *arguments):
+        return rule(*arguments)  # Undefined derivatives become inf or NaN and are flagged
@@ -0,0 +1,69 @@
+import logging
+from collections import Counter, defaultdict, deque
+from typing import Dict, List, Optional
+
+from calculator.util.cse import VariadicCall, walk
+
+
+class Instrumentation:
+    """
+    Counters collected by an instrumented StackQueueCalculator.
+
+    Records per-stage durations, token and postfix sizes, function-call counts
+    by name, exception types, and a bounded log of expressions slower than
+    `slow_threshold` seconds (also reported through `logger` at WARNING).
+    """
+
+    def __init__(self, slow_threshold: Optional[float] = None,
+                 logger: Optional[logging.Logger] = None, slow_log_size: int = 100):
+        self.slow_threshold = slow_threshold
+        self.logger = logger or logging.getLogger("calculator.slow")
+        self.slow_expressions = deque(maxlen=slow_log_size)
+        self.reset()
+
+    def reset(self) -> None:
+        self.evaluations = 0
+        self.compilations = 0
+        self.stage_seconds: Dict[str, float] = defaultdict(float)
+        self.stage_calls: Counter = Counter()
+        self.tokens = 0
+        self.postfix_length = 0
+        self.function_calls: Counter = Counter()
+        self.exceptions: Counter = Counter()
+        self.slow_expressions.clear()
+
+    def record_stage(self, stage: str, seconds: float) -> None:
+        self.stage_seconds[stage] += seconds
+        self.stage_calls[stage] += 1
+
+    def record_compile(self, token_count: int, postfix: List) -> None:
+        self.compilations += 1
+        self.tokens += token_count
+        self.postfix_length += len(postfix)
+
+    def record_evaluation(self, query: str, postfix: Optional[List], functions: set,
+                          seconds: float, error: Optional[BaseException] = None) -> None:
+        self.evaluations += 1
+        self.record_stage("total", seconds)
+        if postfix is not None:
+            self.function_calls.update(t.name if type(t) is VariadicCall else t for t in walk(postfix)
+                                       if type(t) is VariadicCall or (isinstance(t, str) and t in functions))
+        if error is not None:
+            self.exceptions[type(error).__name__] += 1
+        if self.slow_threshold is not None and seconds > self.slow_threshold:
+            self.slow_expressions.append((query, seconds))
+            self.logger.warning("Slow expression (%.3f ms): %.200s", seconds * 1e3, query)
+
+    def snapshot(self) -> Dict:
+        """Plain-dict copy of all counters, suitable for JSON export."""
+        return {
+            "evaluations": self.evaluations,
+            "compilations": self.compilations,
+            "stage_seconds": dict(self.stage_seconds),
+            "stage_calls": dict(self.stage_calls),
+            "tokens": self.tokens,
+            "postfix_length": self.postfix_length,
+            "function_calls": dict(self.function_calls),
+            "exceptions": dict(self.exceptions),
+            "slow_expressions": list(self.slow_expressions),
+        }
@@ -0,0 +1,93 @@
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+
+
+class CacheStats:
+    """Snapshot of cache counters."""
+
+    def __init__(self, hits: int, misses: int, evictions: int, size: int, maxsize: int):
+        self.hits = hits
+        self.misses = misses
+        self.evictions = evictions
+        self.size = size
+        self.maxsize = maxsize
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def __repr__(self) -> str:
+        return (f"CacheStats(hits={self.hits}, misses={self.misses}, "
+                f"evictions={self.evictions}, size={self.size}, maxsize={self.maxsize})")
+
+
+class LRUCache:
+    """
+    Bounded mapping that evicts the least recently used entry when full.
+
+    Safe to share between threads: concurrent get/put never corrupt the
+    mapping, though the hit/miss counters may undercount.
+    """
+
+    def __init__(self, maxsize: int = 1024):
+        if maxsize < 0:
+            raise ValueError(f"Cache size must be non-negative: {maxsize}")
+        self.maxsize = maxsize
+        self._data: OrderedDict = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        value = self._data.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+        try:
+            self._data.move_to_end(key)
+        except KeyError:
+            pass  # Evicted by another thread since the lookup; the value is still good
+        self.hits += 1
+        return value
+
+    def put(self, key: Hashable, value: Any) -> None:
+        if self.maxsize == 0:
+            return
+        self._data[key] = value
+        try:
+            self._data.move_to_end(key)
+        except KeyError:
+            return
+        while len(self._data) > self.maxsize:
+            try:
+                self._data.popitem(last=False)
+            except KeyError:
+                break
+            self.evictions += 1
+
+    def resize(self, maxsize: int) -> None:
+        if maxsize < 0:
+            raise ValueError(f"Cache size must be non-negative: {maxsize}")
+        self.maxsize = maxsize
+        while len(self._data) > maxsize:
+            try:
+                self._data.popitem(last=False)
+            except KeyError:
+                break  # Emptied by another thread meanwhile
+            self.evictions += 1
+
+    def clear(self) -> None:
+        self._data.clear()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def stats(self) -> CacheStats:
+        return CacheStats(self.hits, self.misses, self.evictions, len(self._data), self.maxsize)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._data
@@ -0,0 +1,52 @@
+import math
+from typing import Callable, Hashable, Tuple
+
+from calculator.util.lru_cache import CacheStats, LRUCache
+
+
+def _key(args: Tuple) -> Hashable:
+    """
+    Cache key for a call. Type and the sign of zero are part of it, because
+    5 == 5.0 and 0.0 == -0.0 but functions may treat them differently.
+    """
+    types = tuple(map(type, args))
+    if 0 in args:
+        return args, types, tuple(math.copysign(1.0, arg) for arg in args)
+    return args, types
+
+
+class MemoizedFunction:
+    """
+    Wraps a pure registry function with a bounded LRU cache.
+
+    Errors are cached too: a repeated bad input re-raises a fresh exception
+    of the same type and message without calling the function again.
+    """
+
+    __slots__ = ('name', 'function', 'cache')
+
+    def __init__(self, name: str, function: Callable, maxsize: int = 256):
+        self.name = name
+        self.function = function
+        self.cache = LRUCache(maxsize)
+
+    def __call__(self, *args):
+        key = _key(args)
+        entry = self.cache.get(key)
+        if entry is None:
+            try:
+                entry = (True, self.function(*args))
+            except Exception as e:
+                entry = (False, (type(e), e.args))
+            self.cache.put(key, entry)
+        succeeded, value = entry
+        if succeeded:
+            return value
+        error_type, error_args = value
+        raise error_type(*error_args)
+
+    def stats(self) -> CacheStats:
+        return self.cache.stats()
+
+    def __repr__(self) -> str:
+        return f"MemoizedFunction({self.name!r}, {self.cache.stats()!r})"
@@ -0,0 +1,58 @@
+from typing import Dict, Iterable, List, Tuple
+
+
+class NameTrie:
+    """Prefix tree over registry names, used for longest-match lookup while tokenizing."""
+
+    _END = ''  # Never a real character, so it can mark the end of a name
+
+    def __init__(self):
+        self._root: Dict = {}
+
+    def add(self, name: str, kind: str) -> None:
+        """Register `name` under `kind` (a name may have several kinds, e.g. `e`)."""
+        if not name:
+            raise ValueError("Cannot register an empty name")
+        node = self._root
+        for ch in name:
+            node = node.setdefault(ch, {})
+        node.setdefault(self._END, (name, set()))[1].add(kind)
+
+    def add_all(self, names: Iterable[str], kind: str) -> None:
+        for name in names:
+            self.add(name, kind)
+
+    def matches(self, text: str, start: int) -> List[Tuple[int, str, set]]:
+        """
+        All names that start at `text[start]`, shortest first.
+
+        Returns:
+            List of (end_index, name, kinds) tuples
+        """
+        found = []
+        node = self._root
+        i = start
+        n = len(text)
+        while i < n:
+            node = node.get(text[i])
+            if node is None:
+                break
+            i += 1
+            entry = node.get(self._END)
+            if entry is not None:
+                found.append((i, entry[0], entry[1]))
+        return found
+
+    def starts_with_name(self, text: str, start: int) -> bool:
+        """True if any registered name begins at `text[start]`."""
+        node = self._root
+        i = start
+        n = len(text)
+        while i < n:
+            node = node.get(text[i])
+            if node is None:
+                return False
+            if self._END in node:
+                return True
+            i += 1
+        return False
@@ -0,0 +1,318 @@
+import math
+from array import array
+from itertools import islice
+from typing import Callable, Dict, FrozenSet, List, Mapping, Optional, Tuple
+
+from calculator.funtions.math_functions import MathFunctions
+from calculator.util.cse import Load, Select, Store, VariadicCall
+from calculator.util.session import Session
+
+# Opcodes, numbered so the interpreter loop can test ranges: NEG..POW are the operators
+(CONST, VAR, NEG, ADD, SUB, MUL, DIV, MOD, POW, CALL1, CALL2, DYNAMIC, LITERAL, STORE, LOAD,
+ CALLN, CALLV, JUMP_IF_FALSE, JUMP) = range(19)
+
+OPERATOR_OPCODES = {'~': NEG, '+': ADD, '-': SUB, '*': MUL, '/': DIV, '%': MOD, '^': POW}
+OPERATOR_TOKENS = {opcode: token for token, opcode in OPERATOR_OPCODES.items()}
+
+# Comparison operators as functions giving 1.0 or 0.0; they run as CALL2 instructions
+COMPARISON_FUNCTIONS = {
+    '<': lambda a, b: 1.0 if a < b else 0.0,
+    '<=': lambda a, b: 1.0 if a <= b else 0.0,
+    '>': lambda a, b: 1.0 if a > b else 0.0,
+    '>=': lambda a, b: 1.0 if a >= b else 0.0,
+    '==': lambda a, b: 1.0 if a == b else 0.0,
+    '!=': lambda a, b: 1.0 if a != b else 0.0,
+}
+
+
+class OpcodeProgram:
+    """
+    Compact form of a postfix program.
+
+    One byte per instruction in `opcodes`, with its argument at the same
+    position in `args`: an index into `constants` (float literals), into
+    `objects` (names, exact integers and the (function index, argument
+    count) pairs of variadic calls), into the evaluator's function tables,
+    or a subexpression slot. Holds no callables, so a program can be
+    run by any evaluator built over the same function names.
+
+    The branches of a conditional (Select) are laid out after their
+    condition: JUMP_IF_FALSE skips the `then` code and the JUMP ending it,
+    and that JUMP skips the `otherwise` code. The argument of both is the
+    number of instructions skipped.
+    """
+
+    __slots__ = ('opcodes', 'args', 'constants', 'objects', 'slot_count')
+
+    def __init__(self, opcodes: array, args: array, constants: array,
+                 objects: Tuple = (), slot_count: int = 0):
+        self.opcodes = opcodes
+        self.args = args
+        self.constants = constants
+        self.objects = objects
+        self.slot_count = slot_count
+
+    def __len__(self) -> int:
+        return len(self.opcodes)
+
+    def __repr__(self) -> str:
+        return (f"OpcodeProgram(opcodes={list(self.opcodes)}, args={list(self.args)}, "
+                f"constants={list(self.constants)}, objects={self.objects!r})")
+
+
+class OpcodeEvaluator:
+    """
+    Runs OpcodeProgram instructions by integer dispatch.
+
+    Functions are called through tuples indexed by the instruction argument,
+    so evaluation does no string comparisons or dictionary lookups. Results
+    and errors match PostfixEvaluator; assemble() returns None for anything
+    it cannot represent, and the caller keeps the postfix form instead.
+    """
+
+    def __init__(self, functions: Mapping[str, Callable], binary_functions: Mapping[str, Callable],
+                 dynamic_constants: Mapping[str, Callable[[Session], float]],
+                 user_functions: Mapping[str, Callable] = None,
+                 variadic_functions: Mapping[str, Callable] = None):
+        self.unary_names = tuple(functions)
+        self.unary_table = tuple(functions.values())
+        self.binary_names = tuple(binary_functions) + tuple(COMPARISON_FUNCTIONS)
+        self.binary_table = tuple(binary_functions.values()) + tuple(COMPARISON_FUNCTIONS.values())
+        self.dynamic_names = tuple(dynamic_constants)
+        self.dynamic_table = tuple(dynamic_constants.values())
+        user_functions = user_functions if user_functions is not None else {}
+        self.user_names = tuple(user_functions)
+        self.user_table = tuple(user_functions.values())
+        self.user_arities = tuple(function.arity for function in self.user_table)
+        variadic_functions = variadic_functions if variadic_functions is not None else {}
+        self.variadic_names = tuple(variadic_functions)
+        self.variadic_table = tuple(variadic_functions.values())
+        self._unary_index = {name: i for i, name in enumerate(self.unary_names)}
+        self._binary_index = {name: i for i, name in enumerate(self.binary_names)}
+        self._dynamic_index = {name: i for i, name in enumerate(self.dynamic_names)}
+        self._user_index = {name: i for i, name in enumerate(self.user_names)}
+        self._variadic_index = {name: i for i, name in enumerate(self.variadic_names)}
+
+    def assemble(self, postfix: List, variables: Tuple[str, ...] = ()) -> Optional[OpcodeProgram]:
+        """Encode `postfix`, or return None if it is not a well-formed program."""
+        opcodes = array('B')
+        args = []
+        constants = array('d')
+        constant_index: Dict = {}
+        objects = []
+        object_index: Dict = {}
+        depth = 0
+        slots = set()
+
+        def intern(value) -> int:
+            index = object_index.get(value)
+            if index is None:
+                index = object_index[value] = len(objects)
+                objects.append(value)
+            return index
+
+        def block(tokens: List) -> bool:
+            """Append the code for `tokens`; False if they are not a well-formed program."""
+            nonlocal depth
+            for token in tokens:
+                kind = type(token)
+                if kind is Select:
+                    if depth < 1:
+                        return False
+                    depth -= 1  # The condition
+                    before = depth
+                    jump_if_false = len(opcodes)
+                    opcodes.append(JUMP_IF_FALSE)
+                    args.append(0)
+                    if not block(token.then) or depth != before + 1:
+                        return False
+                    depth = before
+                    jump = len(opcodes)
+                    opcodes.append(JUMP)
+                    args.append(0)
+                    if not block(token.otherwise) or depth != before + 1:
+                        return False
+                    args[jump_if_false] = jump - jump_if_false
+                    args[jump] = len(opcodes) - jump - 1
+                    continue
+                if kind is float:
+                    key = (token, math.copysign(1.0, token))  # Keep 0.0 and -0.0 apart
+                    index = constant_index.get(key)
+                    if index is None:
+                        index = constant_index[key] = len(constants)
+                        constants.append(token)
+                    opcode, arg, pops = CONST, index, 0
+                elif kind is int:
+                    opcode, arg, pops = LITERAL, intern(token), 0
+                elif kind is Store:
+                    slots.add(token.slot)
+                    opcode, arg, pops = STORE, token.slot, 1  # Peeks: "pops" the value and pushes it back
+                elif kind is Load:
+                    if token.slot not in slots:
+                        return False
+                    opcode, arg, pops = LOAD, token.slot, 0
+                elif kind is VariadicCall:
+                    if token.name not in self._variadic_index:
+                        return False
+                    opcode, pops = CALLV, token.count
+                    arg = intern((self._variadic_index[token.name], token.count))
+                elif kind is not str:
+                    return False
+                elif token in variables:
+                    opcode, arg, pops = VAR, intern(token), 0
+                elif token in self._dynamic_index:
+                    opcode, arg, pops = DYNAMIC, self._dynamic_index[token], 0
+                elif token == '~':
+                    opcode, arg, pops = NEG, 0, 1
+                elif token in self._unary_index:
+                    opcode, arg, pops = CALL1, self._unary_index[token], 1
+                elif token in self._binary_index:
+                    opcode, arg, pops = CALL2, self._binary_index[token], 2
+                elif token in OPERATOR_OPCODES:
+                    opcode, arg, pops = OPERATOR_OPCODES[token], 0, 2
+                elif token in self._user_index:
+                    arg = self._user_index[token]
+                    opcode, pops = CALLN, self.user_arities[arg]
+                else:
+                    return False  # Unknown name; the postfix evaluator reports it
+
+                if depth < pops:
+                    return False
+                depth += 1 - pops
+                opcodes.append(opcode)
+                args.append(arg)
+            return True
+
+        if not block(postfix) or depth != 1:
+            return None
+        largest = max(args)
+        args = array('B' if largest < 1 << 8 else 'H' if largest < 1 << 16 else 'I', args)
+        slot_count = max(slots) + 1 if slots else 0
+        return OpcodeProgram(opcodes, args, constants, tuple(objects), slot_count)
+
+    def evaluate(self, program: OpcodeProgram, variables: Optional[Dict[str, float]] = None,
+                 session: Optional[Session] = None) -> float:
+        stack = []
+        push = stack.append
+        pop = stack.pop
+        constants = program.constants
+        objects = program.objects
+        unary = self.unary_table
+        binary = self.binary_table
+        slots = [None] * program.slot_count
+
+        code = zip(program.opcodes, program.args)
+        for op, arg in code:
+            if op == CONST:
+                push(constants[arg])
+            elif op == VAR:
+                push(variables[objects[arg]])
+            elif op <= POW:
+                if op == NEG:
+                    stack[-1] = -stack[-1]
+                    continue
+                b = pop()
+                if op == ADD:
+                    stack[-1] += b
+                elif op == SUB:
+                    stack[-1] -= b
+                elif op == MUL:
+                    stack[-1] *= b
+                elif op == DIV:
+                    if b == 0:
+                        raise ZeroDivisionError("Cannot divide by zero")
+                    stack[-1] /= b
+                elif op == MOD:
+                    if b == 0:
+                        raise ZeroDivisionError("Cannot modulo by zero")
+                    stack[-1] %= b
+                elif type(b) is int:
+                    stack[-1] = MathFunctions.exact_power(stack[-1], b)
+                else:
+                    stack[-1] **= b
+            elif op == CALL1:
+                stack[-1] = unary[arg](stack[-1])
+            elif op == CALL2:
+                b = pop()
+                stack[-1] = binary[arg](stack[-1], b)
+            elif op == DYNAMIC:
+                push(self.dynamic_table[arg](session))
+            elif op == LITERAL:
+                push(objects[arg])
+            elif op == STORE:
+                slots[arg] = stack[-1]
+            elif op == LOAD:
+                push(slots[arg])
+            elif op == CALLN:
+                count = self.user_arities[arg]
+                arguments = stack[-count:]
+                del stack[-count:]
+                push(self.user_table[arg](*arguments))
+            elif op == JUMP_IF_FALSE:
+                if not pop():
+                    next(islice(code, arg - 1, None))  # Skip `arg` instructions
+            elif op == JUMP:
+                next(islice(code, arg - 1, None))
+            else:
+                index, count = objects[arg]
+                arguments = stack[-count:]
+                del stack[-count:]
+                push(self.variadic_table[index](*arguments))
+        return stack[0]
+
+    def disassemble(self, program: OpcodeProgram) -> List:
+        """The postfix list `program` was assembled from."""
+        postfix = []
+        out = postfix
+        # Conditionals being rebuilt: [enclosing list, then, otherwise, index of their last instruction]
+        selects = []
+        for pc, (op, arg) in enumerate(zip(program.opcodes, program.args)):
+            if op == CONST:
+                out.append(program.constants[arg])
+            elif op == VAR or op == LITERAL:
+                out.append(program.objects[arg])
+            elif op <= POW:
+                out.append(OPERATOR_TOKENS[op])
+            elif op == CALL1:
+                out.append(self.unary_names[arg])
+            elif op == CALL2:
+                out.append(self.binary_names[arg])
+            elif op == DYNAMIC:
+                out.append(self.dynamic_names[arg])
+            elif op == STORE:
+                out.append(Store(arg))
+            elif op == LOAD:
+                out.append(Load(arg))
+            elif op == CALLN:
+                out.append(self.user_names[arg])
+            elif op == JUMP_IF_FALSE:
+                selects.append([out, [], None, None])
+                out = selects[-1][1]
+            elif op == JUMP:
+                out = selects[-1][2] = []
+                selects[-1][3] = pc + arg
+            else:
+                index, count = program.objects[arg]
+                out.append(VariadicCall(self.variadic_names[index], count))
+            while selects and selects[-1][3] == pc:
+                out, then, otherwise, _ = selects.pop()
+                out.append(Select(then, otherwise))
+        return postfix
+
+    def symbols(self, program: OpcodeProgram) -> FrozenSet[str]:
+        """Names of the functions, variables and dynamic constants `program` uses."""
+        names = set()
+        for op, arg in zip(program.opcodes, program.args):
+            if op == VAR:
+                names.add(program.objects[arg])
+            elif op == CALL1:
+                names.add(self.unary_names[arg])
+            elif op == CALL2:
+                names.add(self.binary_names[arg])
+            elif op == DYNAMIC:
+                names.add(self.dynamic_names[arg])
+            elif op == CALLN:
+                names.add(self.user_names[arg])
+            elif op == CALLV:
+                names.add(self.variadic_names[program.objects[arg][0]])
+        return frozenset(names)
@@ -0,0 +1,355 @@
+import re
+from typing import Iterable, List, Optional, Tuple, Union
+
+from calculator.util.cse import COMPARISONS, Select, VariadicCall
+from calculator.util.name_trie import NameTrie
+from calculator.util.tokenizer import Tokenizer
+
+# AST nodes are plain values so they are compact and hashable:
+#   float             number literal (constants are already substituted)
+#   str               name resolved at run time (variable or dynamic constant such as `ans`)
+#   (op, *operands)   operator ('+', '-', '*', '/', '%', '^', '~' for negation, comparisons)
+#                     or function call; `op` is a VariadicCall for calls of variadic functions
+#   ('if', c, a, b)   conditional: only the operand selected by `c` is evaluated
+Node = Union[float, str, tuple]
+
+IF = 'if'
+# Conditionals nested deeper than this are rejected: later stages recurse into branches
+MAX_CONDITIONAL_DEPTH = 64
+
+# Markers to_postfix() keeps on its stack while it flattens the branches of a conditional
+_BRANCH, _END_BRANCH, _SELECT = (object(),), (object(),), (object(),)
+
+# Frames the parser keeps for expressions it has not finished
+_INFIX, _NEGATE, _GROUP, _CALL = range(4)
+
+Text = Union[str, bytes, bytearray, memoryview]
+
+
+def as_text(query: Text) -> str:
+    """`query` as a str; bytes-like input is decoded as UTF-8 straight from its buffer."""
+    if isinstance(query, (bytes, bytearray, memoryview)):
+        return str(query, 'utf-8')
+    return query
+
+
+def syntax_error(message: str, position: int) -> ValueError:
+    """A ValueError whose `position` attribute is the offset where parsing failed."""
+    error = ValueError(message)
+    error.position = position
+    return error
+
+
+def _source_offset(query: str, index: int) -> int:
+    """Offset in `query` of the character at `index` once spaces are removed."""
+    for offset, ch in enumerate(query):
+        if ch != ' ':
+            if index == 0:
+                return offset
+            index -= 1
+    return len(query)
+
+
+class Parser:
+    """
+    Precedence-climbing (Pratt) parser from expression text to an AST in one pass.
+
+    Reads characters directly, without an intermediate token list. Implicit
+    multiplication (`2(3)`, `2pi`, `3sin(x)`, `(a)(b)`) is parsed as
+    juxtaposition at the precedence of `*`. Unary minus keeps the
+    Tokenizer's binding: directly before a number, constant, variable or
+    call it negates just that operand, so `-2^2` is `(-2)^2` and `2^-1` is
+    `2^(-1)`; before `(` or another `-` it binds tighter than `*` and looser
+    than `^`, so `-(2)^2` is `-(2^2)`. Name resolution and number syntax (exponents,
+    angle suffixes) follow the Tokenizer. Calls of small user-defined
+    functions are replaced by their body (see UserFunction.inline).
+
+    Comparisons (`<`, `<=`, `>`, `>=`, `==`, `!=`) bind looser than `+`
+    and give 1 or 0. `if(c, a, b)`, `and(a, b)` and `or(a, b)` evaluate
+    only the operands they need; `and` and `or` give 1 or 0.
+    """
+
+    # Binding powers: (left, right). Right-associative operators bind their right side looser.
+    INFIX = {
+        '+': (10, 10),
+        '-': (10, 10),
+        '*': (20, 20),
+        '/': (20, 20),
+        '%': (20, 20),
+        '^': (30, 29),
+        **{op: (5, 5) for op in COMPARISONS},
+    }
+    IMPLICIT = 20  # Juxtaposition multiplies at the precedence of '*'
+    PREFIX_MINUS = 25  # '-' before '(' or '-'
+    NEGATIVE_OPERAND = 40  # '-' before a number or name: nothing binds its operand away
+
+    # Digits and dots, then an optional exponent that must contain a digit (as Tokenizer._scan_number)
+    NUMBER = re.compile(r'[0-9.]+(?:[eE][+-]?[0-9]+)?')
+
+    def __init__(self, tokenizer: Tokenizer):
+        self.tokenizer = tokenizer
+        self.names = tokenizer.names
+        self.constants = tokenizer.constants
+        self.dynamic_constants = tokenizer.dynamic_constants
+        self.functions = tokenizer.functions
+        self.binary_functions = tokenizer.binary_functions
+        self.variadic_functions = tokenizer.variadic_functions
+        self.user_functions = tokenizer.user_functions
+
+    def parse(self, query: Text, variables: Iterable[str] = ()) -> Node:
+        """
+        Parse `query` into an AST.
+
+        Args:
+            query: Mathematical expression as string, or as UTF-8 bytes
+            variables: Names of free variables allowed in the expression
+            
+        Raises:
+            ValueError: on a syntax error; its `position` attribute is the
+                offset in `query` where parsing stopped
+        """
+        query = as_text(query)
+        if not query or query.isspace():
+            raise syntax_error("Empty expression", 0)
+        text = query.replace(' ', '') if ' ' in query else query
+
+        variable_names = None
+        if variables:
+            variable_names = NameTrie()
+            variable_names.add_all(variables, Tokenizer.VARIABLE)
+
+        try:
+            node, pos = self._expression(text, variable_names)
+            if pos < len(text):
+                if text[pos] == ')':
+                    raise syntax_error("Mismatched parentheses: extra ')'", pos)
+                raise syntax_error("Comma outside of function call", pos)
+        except ValueError as e:
+            if len(text) != len(query) and hasattr(e, 'position'):
+                e.position = _source_offset(query, e.position)
+            raise
+        return node
+
+    def parse_postfix(self, query: Text, variables: Iterable[str] = ()) -> List:
+        """Parse `query` straight to the postfix program the evaluators run."""
+        return to_postfix(self.parse(query, variables))
+
+    # ==================== Expressions ====================
+
+    def _expression(self, text: str, variable_names: Optional[NameTrie]) -> Tuple[Node, int]:
+        """
+        Parse the longest expression at the start of `text`.
+
+        Works like a recursive Pratt parser, but every point where one would
+        recurse (an operator's right operand, a parenthesised group, a
+        negation, a call argument) pushes a frame onto `pending` instead, so
+        depth is limited by memory rather than the interpreter's stack.
+        """
+        infix = self.INFIX
+        n = len(text)
+        pos = 0
+        power = 0  # Binding power the expression being parsed must exceed
+        pending = []
+        push = pending.append
+
+        while True:
+            # Operand: a leaf, or an opener that starts a nested expression
+            if pos >= n:
+                raise syntax_error("Expression ends with operator", pos)
+            ch = text[pos]
+            if ch.isdigit() or ch == '.':
+                node, pos = self._number(text, pos)
+            elif ch == '(':
+                push((_GROUP, power))
+                pos, power = pos + 1, 0
+                continue
+            elif ch == '-':
+                push((_NEGATE, power))
+                following = text[pos + 1:pos + 2]
+                pos, power = pos + 1, (self.PREFIX_MINUS if following in ('(', '-')
+                                       else self.NEGATIVE_OPERAND)
+                continue
+            else:
+                name = self._name(text, pos, variable_names)
+                if name is None:
+                    if ch == ')' and pending and pending[-1][0] == _CALL and not pending[-1][5]:
+                        _, _, function, arity, start, _ = pending[-1]
+                        expected = "at least 1" if arity is None else arity
+                        raise syntax_error(f"Function '{function}' expects {expected} argument(s), got 0", start)
+                    if ch in infix or ch in '),':
+                        raise syntax_error("Invalid expression: operator followed by operator", pos)
+                    raise syntax_error(f"Invalid character: '{ch}'", pos)
+                end, kind, value = name
+                if kind == Tokenizer.FUNCTION or kind == Tokenizer.BINARY_FUNCTION:
+                    arity = 1 if kind == Tokenizer.FUNCTION else 2
+                    push((_CALL, power, value, arity, pos, []))
+                    pos, power = end + 1, 0
+                    continue
+                if kind == Tokenizer.CONDITIONAL:
+                    push((_CALL, power, value, Tokenizer.CONDITIONALS[value], pos, []))
+                    pos, power = end + 1, 0
+                    continue
+                if kind == Tokenizer.VARIADIC_FUNCTION:
+                    push((_CALL, power, value, None, pos, []))  # Any number of arguments
+                    pos, power = end + 1, 0
+                    continue
+                if kind == Tokenizer.USER_FUNCTION:
+                    push((_CALL, power, value, self.user_functions[value].arity, pos, []))
+                    pos, power = end + 1, 0
+                    continue
+                node, pos = value, end
+
+            # Operators: extend `node`, or end the innermost expression and resume its frame
+            while True:
+                if pos < n:
+                    ch = text[pos]
+                    if ch in '<>=!' and text.startswith('=', pos + 1):
+                        ch = text[pos:pos + 2]  # Two-character comparison
+                    powers = infix.get(ch)
+                    if powers is not None:
+                        if powers[0] > power:
+                            push((_INFIX, power, ch, node))
+                            pos, power = pos + len(ch), powers[1]
+                            break
+                    elif ch != ')' and ch != ',' and self.IMPLICIT > power:
+                        # Anything else that can start an operand is an implicit multiplication
+                        push((_INFIX, power, '*', node))
+                        power = self.IMPLICIT
+                        break
+
+                if not pending:
+                    return node, pos
+                frame = pending.pop()
+                kind = frame[0]
+                power = frame[1]
+                if kind == _INFIX:
+                    node = (frame[2], frame[3], node)
+                elif kind == _NEGATE:
+                    node = -node if isinstance(node, float) else ('~', node)
+                elif kind == _GROUP:
+                    if pos >= n or text[pos] != ')':
+                        raise syntax_error("Mismatched parentheses or commas", pos)
+                    pos += 1
+                else:
+                    _, _, function, arity, start, arguments = frame
+                    arguments.append(node)
+                    if pos >= n:
+                        raise syntax_error("Mismatched parentheses or commas", pos)
+                    if text[pos] != ')':
+                        push(frame)
+                        pos, power = pos + 1, 0  # ','
+                        break
+                    if arity is None:
+                        # Two arguments to max, min, gcd or lcm: the binary function
+                        if len(arguments) != 2 or function not in self.binary_functions:
+                            function = VariadicCall(function, len(arguments))
+                    elif len(arguments) != arity:
+                        raise syntax_error(f"Function '{function}' expects {arity} argument(s), "
+                                           f"got {len(arguments)}", start)
+                    if function in Tokenizer.CONDITIONALS:
+                        node = self._conditional(function, arguments)
+                        pos += 1
+                        continue
+                    node = (function, *arguments)
+                    user_function = self.user_functions.get(function)
+                    if user_function is not None:
+                        inlined = user_function.inline(arguments)
+                        if inlined is not None:
+                            node = inlined
+                    pos += 1
+
+    @staticmethod
+    def _conditional(function: str, arguments: List[Node]) -> Node:
+        """The ('if', ...) node for a call of `if`, `and` or `or`."""
+        if function == 'and':
+            return (IF, arguments[0], ('!=', arguments[1], 0.0), 0.0)
+        if function == 'or':
+            return (IF, arguments[0], 1.0, ('!=', arguments[1], 0.0))
+        return (IF, *arguments)
+
+    # ==================== Lexing ====================
+
+    def _number(self, text: str, pos: int) -> Tuple[float, int]:
+        end = self.NUMBER.match(text, pos).end()
+        try:
+            value = float(text[pos:end])
+        except ValueError:
+            raise syntax_error(f"Invalid number format: {text[pos:end]}", pos) from None
+        if end < len(text) and text[end] in '°rgt':
+            angle = self.tokenizer._handle_angle_unit(text, end, value)
+            if angle:
+                end, value = angle
+        return value, end
+
+    def _name(self, text: str, pos: int,
+              variable_names: Optional[NameTrie]) -> Optional[Tuple[int, str, Node]]:
+        """
+        Longest constant, variable or function name at `pos`, with the Tokenizer's rules.
+
+        Returns:
+            (end, kind, value): for functions `value` is the name and `end` is
+            the index of its '('; otherwise `value` is the AST leaf
+        """
+        matches = self.names.matches(text, pos)
+        if variable_names is not None:
+            matches = Tokenizer._merge_matches(matches, variable_names.matches(text, pos))
+
+        for end, name, kinds in reversed(matches):
+            followed_by_paren = end < len(text) and text[end] == '('
+            if followed_by_paren and Tokenizer.FUNCTION in kinds:
+                return end, Tokenizer.FUNCTION, name
+            if followed_by_paren and Tokenizer.VARIADIC_FUNCTION in kinds:
+                return end, Tokenizer.VARIADIC_FUNCTION, name
+            if followed_by_paren and Tokenizer.CONDITIONAL in kinds:
+                return end, Tokenizer.CONDITIONAL, name
+            if followed_by_paren and Tokenizer.BINARY_FUNCTION in kinds:
+                return end, Tokenizer.BINARY_FUNCTION, name
+            if followed_by_paren and Tokenizer.USER_FUNCTION in kinds:
+                return end, Tokenizer.USER_FUNCTION, name
+            if Tokenizer.VARIABLE in kinds:
+                return end, Tokenizer.VARIABLE, name
+            if Tokenizer.CONSTANT in kinds and not followed_by_paren:
+                if name in self.dynamic_constants:
+                    return end, Tokenizer.CONSTANT, name
+                return end, Tokenizer.CONSTANT, float(self.constants[name])
+        return None
+
+
+def to_postfix(node: Node) -> List:
+    """
+    Flatten an AST into the postfix program consumed by the evaluators.
+
+    A conditional becomes its condition followed by a Select holding the
+    two branches as postfix lists of their own.
+    """
+    out = []
+    outs = [out]       # Output lists: the program, then the branches being flattened
+    branches = []      # Finished branches waiting for their Select
+    append = out.append
+    # Operators wait on the stack as 1-tuples until their operands are emitted
+    stack = [node]
+    pop = stack.pop
+    while stack:
+        node = pop()
+        if type(node) is not tuple:
+            append(node)
+        elif len(node) != 1:
+            if node[0] == IF:
+                stack += (_SELECT, _END_BRANCH, node[3], _BRANCH, _END_BRANCH, node[2], _BRANCH, node[1])
+            else:
+                stack.append((node[0],))
+                stack.extend(node[:0:-1])
+        elif node is _BRANCH:
+            if len(outs) > MAX_CONDITIONAL_DEPTH:
+                raise ValueError(f"Conditionals nested too deeply (limit {MAX_CONDITIONAL_DEPTH})")
+            outs.append([])
+            append = outs[-1].append
+        elif node is _END_BRANCH:
+            branches.append(outs.pop())
+            append = outs[-1].append
+        elif node is _SELECT:
+            otherwise = branches.pop()
+            append(Select(branches.pop(), otherwise))
+        else:
+            append(node[0])
+    return out
@@ -0,0 +1,185 @@
+import math
+from typing import Callable, Dict, List, Optional, Tuple
+
+from calculator.funtions.math_functions import MathFunctions
+from calculator.util.cse import COMPARISONS, Load, Select, Store, VariadicCall
+from calculator.util.postfix_eval import PostfixEvaluator
+from calculator.util.session import Session
+
+
+class PostfixCompiler:
+    """
+    Translates a postfix program into a single native Python function.
+
+    Each operation becomes one straight-line statement with its registry
+    callable bound as a global of the generated function, so running it does
+    no token dispatch at all. Conditionals become if/else blocks, so only
+    the selected branch runs. Error behaviour matches PostfixEvaluator; a
+    program the evaluator would reject is delegated to it unchanged.
+    """
+
+    OPERATORS = {'+': '+', '-': '-', '*': '*'}
+
+    def __init__(self, evaluator: PostfixEvaluator):
+        self.evaluator = evaluator
+
+    def compile(self, postfix: List, variables: Tuple[str, ...] = ()
+                ) -> Callable[[Optional[Dict[str, float]], Optional[Session]], float]:
+        """Return a function `f(variables, session) -> float` equivalent to evaluating `postfix`."""
+        namespace = {'__builtins__': {'ZeroDivisionError': ZeroDivisionError, 'type': type, 'int': int}}
+        source = self._generate(postfix, variables, namespace)
+        code = None
+        if source is not None:
+            try:
+                code = compile(source, '<calculator program>', 'exec')
+            except (SyntaxError, RecursionError):
+                pass  # Conditionals nested too deeply for Python's own compiler
+        if code is None:
+            evaluate = self.evaluator.evaluate
+            return lambda variables=None, session=None: evaluate(postfix, variables, session)
+        exec(code, namespace)
+        return namespace['program']
+
+    def _generate(self, postfix: List, variables: Tuple[str, ...], namespace: Dict) -> Optional[str]:
+        """Python source for `postfix`, or None if it is not a well-formed program."""
+        if not postfix:
+            return None
+
+        functions = self.evaluator.functions
+        binary_functions = self.evaluator.binary_functions
+        dynamic_constants = self.evaluator.dynamic_constants
+        user_functions = self.evaluator.user_functions
+        variadic_functions = self.evaluator.variadic_functions
+        bound = {}  # id(callable) -> global name in the generated function
+
+        def bind(value) -> str:
+            name = bound.get(id(value))
+            if name is None:
+                name = f"_g{len(bound)}"
+                bound[id(value)] = name
+                namespace[name] = value
+            return name
+
+        lines = ["def program(variables=None, session=None):"]
+        stack = []
+        temps = set()
+        slots = {}  # Shared subexpression slot -> temporary holding its value
+        indent = ["    "]  # Of the statements being generated; deeper inside branches
+
+        def emit(expression: str) -> str:
+            name = f"t{len(temps)}"
+            temps.add(name)
+            lines.append(f"{indent[0]}{name} = {expression}")
+            return name
+
+        float_literals = set()  # Exponents that cannot build big integers
+
+        def block(tokens: List) -> bool:
+            """Generate statements for `tokens`; False if they are not a well-formed program."""
+            for token in tokens:
+                if isinstance(token, (int, float)):
+                    stack.append(self._literal(token, bind))
+                    if type(token) is float:
+                        float_literals.add(stack[-1])
+                elif type(token) is Select:
+                    # Each branch assigns the same temporary; only the one selected runs
+                    if len(stack) < 1:
+                        return False
+                    condition = stack.pop()
+                    result = f"t{len(temps)}"
+                    temps.add(result)
+                    outer = indent[0]
+                    for keyword, branch in ((f"if {condition}:", token.then), ("else:", token.otherwise)):
+                        lines.append(f"{outer}{keyword}")
+                        indent[0] = outer + "    "
+                        depth = len(stack)
+                        if not block(branch) or len(stack) != depth + 1:
+                            return False
+                        lines.append(f"{indent[0]}{result} = {stack.pop()}")
+                    indent[0] = outer
+                    stack.append(result)
+                elif token in variables:
+                    stack.append(f"variables[{token!r}]")
+                elif token in dynamic_constants:
+                    stack.append(f"{bind(dynamic_constants[token])}(session)")
+                elif token == '~':
+                    if len(stack) < 1:
+                        return False
+                    stack.append(emit(f"-{stack.pop()}"))
+                elif token in functions:
+                    if len(stack) < 1:
+                        return False
+                    stack.append(emit(f"{bind(functions[token])}({stack.pop()})"))
+                elif token in binary_functions:
+                    if len(stack) < 2:
+                        return False
+                    arg2 = stack.pop()
+                    arg1 = stack.pop()
+                    stack.append(emit(f"{bind(binary_functions[token])}({arg1}, {arg2})"))
+                elif token in user_functions:
+                    count = user_functions[token].arity
+                    if len(stack) < count:
+                        return False
+                    arguments = ", ".join(stack[-count:])
+                    del stack[-count:]
+                    stack.append(emit(f"{bind(user_functions[token])}({arguments})"))
+                elif type(token) is VariadicCall:
+                    if len(stack) < token.count or token.name not in variadic_functions:
+                        return False
+                    arguments = ", ".join(stack[-token.count:])
+                    del stack[-token.count:]
+                    stack.append(emit(f"{bind(variadic_functions[token.name])}({arguments})"))
+                elif type(token) is Load:
+                    if token.slot not in slots:
+                        return False
+                    stack.append(slots[token.slot])
+                elif type(token) is Store:
+                    if len(stack) < 1:
+                        return False
+                    if stack[-1] not in temps:
+                        stack.append(emit(stack.pop()))
+                    slots[token.slot] = stack[-1]
+                elif token in COMPARISONS:
+                    if len(stack) < 2:
+                        return False
+                    num2 = stack.pop()
+                    num1 = stack.pop()
+                    stack.append(emit(f"1.0 if {num1} {token} {num2} else 0.0"))
+                elif isinstance(token, str) and len(token) == 1 and token in "+-*/%^":
+                    if len(stack) < 2:
+                        return False
+                    num2 = stack.pop()
+                    num1 = stack.pop()
+                    if token in self.OPERATORS:
+                        stack.append(emit(f"{num1} {self.OPERATORS[token]} {num2}"))
+                    elif token == '^':
+                        if num2 in float_literals:
+                            stack.append(emit(f"{num1} ** {num2}"))
+                        else:
+                            # Integer exponents may build huge exact integers; guard them like _calc
+                            exponent = num2 if num2 in temps else emit(num2)
+                            power = bind(MathFunctions.exact_power)
+                            stack.append(emit(f"{num1} ** {exponent} if type({exponent}) is not int "
+                                              f"else {power}({num1}, {exponent})"))
+                    else:
+                        # Evaluate the divisor once, then guard it like PostfixEvaluator._calc
+                        divisor = num2 if num2 in temps else emit(num2)
+                        message = "Cannot divide by zero" if token == '/' else "Cannot modulo by zero"
+                        lines.append(f"{indent[0]}if {divisor} == 0:")
+                        lines.append(f"{indent[0]}    raise ZeroDivisionError({message!r})")
+                        stack.append(emit(f"{num1} {token} {divisor}"))
+                else:
+                    return False
+            return True
+
+        if not block(postfix) or len(stack) != 1:
+            return None
+
+        lines.append(f"    return {stack[0]}")
+        return "\n".join(lines) + "\n"
+
+    @staticmethod
+    def _literal(value, bind: Callable) -> str:
+        if isinstance(value, float) and not math.isfinite(value):
+            return bind(value)
+        return f"({value!r})"
@@ -1,41 +1,51 @@
 from collections import deque
-from typing import Dict, List
+from typing import Dict, List, Optional
+
+from calculator.util.cse import VariadicCall
 
 
 class PostfixConverter:
     """Converts infix notation to postfix (RPN) using Shunting Yard algorithm."""
     
-    def __init__(self, functions: set, binary_functions: set):
+    def __init__(self, functions: set, binary_functions: set, dynamic_constants: set = frozenset(),
+                 variadic_functions: set = frozenset()):
         self.functions = functions
         self.binary_functions = binary_functions
+        self.dynamic_constants = dynamic_constants
+        self.variadic_functions = variadic_functions
         self.precedence = self._build_precedence()
         self.right_assoc = self._build_right_assoc()
     
     def _build_precedence(self) -> Dict[str, int]:
         precedence = {'+': 1, '-': 1, '*': 2, '/': 2, '%': 2, '~': 2, '^': 3}
-        for func in self.functions | self.binary_functions:
+        for func in self.functions | self.binary_functions | self.variadic_functions:
             precedence[func] = 4
         return precedence
     
     def _build_right_assoc(self) -> set:
-        return {'^', '~'} | self.functions | self.binary_functions
+        return {'^', '~'} | self.functions | self.binary_functions | self.variadic_functions
     
-    def convert(self, tokens: List) -> List:
+    def convert(self, tokens: List, variables: set = frozenset()) -> List:
         if not tokens:
             raise ValueError("No tokens to convert")
         
         stack = []
         queue = deque()
+        # Arguments seen so far in each open parenthesis (None unless it belongs to a variadic call)
+        counts: List[Optional[int]] = []
         
         for t in tokens:
-            if isinstance(t, (int, float)):
+            if isinstance(t, (int, float)) or t in self.dynamic_constants or t in variables:
                 queue.append(t)
             elif t == '(':
+                counts.append(1 if stack and stack[-1] in self.variadic_functions else None)
                 stack.append(t)
             elif t == ')':
-                self._handle_closing_paren(stack, queue)
+                self._handle_closing_paren(stack, queue, counts.pop() if counts else None)
             elif t == ',':
                 self._handle_comma(stack, queue)
+                if counts and counts[-1] is not None:
+                    counts[-1] += 1
             elif t in self.precedence:
                 self._handle_operator(t, stack, queue)
             else:
@@ -48,13 +58,18 @@ class PostfixConverter:
         
         return list(queue)
     
-    def _handle_closing_paren(self, stack: List, queue: deque) -> None:
+    def _handle_closing_paren(self, stack: List, queue: deque, count: Optional[int] = None) -> None:
         while stack and stack[-1] not in '(,':
             queue.append(stack.pop())
         if not stack or stack[-1] != '(':
             raise ValueError("Mismatched parentheses: extra ')'")
         stack.pop()
-        if stack and (stack[-1] in self.functions or stack[-1] in self.binary_functions):
+        if count is not None:
+            function = stack.pop()
+            # Two arguments to max, min, gcd or lcm: the binary function
+            queue.append(function if count == 2 and function in self.binary_functions
+                         else VariadicCall(function, count))
+        elif stack and (stack[-1] in self.functions or stack[-1] in self.binary_functions):
             queue.append(stack.pop())
     
     def _handle_comma(self, stack: List, queue: deque) -> None:
@@ -1,22 +1,45 @@
-from typing import Dict, List
+from typing import Callable, Dict, List, Mapping, Optional
+
+from calculator.funtions.math_functions import MathFunctions
+from calculator.util.cse import Load, Select, Store, VariadicCall
+from calculator.util.opcodes import COMPARISON_FUNCTIONS, OpcodeEvaluator
+from calculator.util.session import Session
 
 
 class PostfixEvaluator:
     """Evaluates postfix expressions."""
     
-    def __init__(self, functions: Dict, binary_functions: Dict):
+    def __init__(self, functions: Dict, binary_functions: Dict,
+                 dynamic_constants: Optional[Dict[str, Callable[[Session], float]]] = None,
+                 user_functions: Optional[Mapping[str, Callable]] = None,
+                 variadic_functions: Optional[Mapping[str, Callable]] = None):
         self.functions = functions
         self.binary_functions = binary_functions
+        self.dynamic_constants = dynamic_constants if dynamic_constants is not None else {}
+        # Callables with an `arity` (UserFunction), taking that many arguments
+        self.user_functions = user_functions if user_functions is not None else {}
+        # Called by VariadicCall tokens, with the number of arguments they give
+        self.variadic_functions = variadic_functions if variadic_functions is not None else {}
+        # Integer-dispatch form of the same tables, used by CompiledProgram
+        self.opcodes = OpcodeEvaluator(functions, binary_functions, self.dynamic_constants,
+                                       self.user_functions, self.variadic_functions)
     
-    def evaluate(self, postfix: List) -> float:
+    def evaluate(self, postfix: List, variables: Optional[Dict[str, float]] = None,
+                 session: Optional[Session] = None) -> float:
         if not postfix:
             raise ValueError("Empty postfix expression")
         
         stack = []
+        slots = {}  # Values of shared subexpressions (see SubexpressionEliminator)
+        variables = variables or {}
         
         for token in postfix:
             if isinstance(token, (int, float)):
                 stack.append(token)
+            elif token in variables:
+                stack.append(variables[token])
+            elif token in self.dynamic_constants:
+                stack.append(self.dynamic_constants[token](session))
             elif token == '~':
                 if len(stack) < 1:
                     raise ValueError("Insufficient operands for unary minus")
@@ -32,6 +55,36 @@ class PostfixEvaluator:
                 arg2 = stack.pop()
                 arg1 = stack.pop()
                 stack.append(self.binary_functions[token](arg1, arg2))
+            elif token in self.user_functions:
+                function = self.user_functions[token]
+                if len(stack) < function.arity:
+                    raise ValueError(f"Insufficient operands for function '{token}'")
+                arguments = stack[-function.arity:]
+                del stack[-function.arity:]
+                stack.append(function(*arguments))
+            elif type(token) is VariadicCall:
+                if len(stack) < token.count:
+                    raise ValueError(f"Insufficient operands for function '{token.name}'")
+                arguments = stack[-token.count:]
+                del stack[-token.count:]
+                stack.append(self.variadic_functions[token.name](*arguments))
+            elif type(token) is Select:
+                if not stack:
+                    raise ValueError("Insufficient operands for conditional")
+                # Only the branch selected runs; it has slots of its own
+                branch = token.then if stack.pop() else token.otherwise
+                stack.append(self.evaluate(branch, variables, session))
+            elif type(token) is Load:
+                stack.append(slots[token.slot])
+            elif type(token) is Store:
+                if not stack:
+                    raise ValueError("Nothing to store")
+                slots[token.slot] = stack[-1]
+            elif token in COMPARISON_FUNCTIONS:
+                if len(stack) < 2:
+                    raise ValueError(f"Insufficient operands for operator '{token}'")
+                num2 = stack.pop()
+                stack[-1] = COMPARISON_FUNCTIONS[token](stack[-1], num2)
             elif token in "+-*/%^":
                 if len(stack) < 2:
                     raise ValueError(f"Insufficient operands for operator '{token}'")
@@ -62,6 +115,6 @@ class PostfixEvaluator:
                 raise ZeroDivisionError("Cannot modulo by zero")
             return num1 % num2
         elif op == '^':
-            return num1 ** num2
+            return MathFunctions.exact_power(num1, num2)
         else:
             raise ValueError(f"Unknown operator: {op}")
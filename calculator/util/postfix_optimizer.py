@@ -0,0 +1,104 @@
+from typing import List, Set
+
+from calculator.util.cse import COMPARISONS, Select, VariadicCall
+from calculator.util.postfix_eval import PostfixEvaluator
+
+
+class PostfixOptimizer:
+    """
+    Folds constant subexpressions of a postfix program at compile time.
+
+    Only pure operations whose operands are all literals are folded. Impure
+    functions (e.g. `rand`) and names resolved at run time (`ans`, variables)
+    are left alone, and a fold that raises (e.g. `recip(0)`) is kept as code so
+    the error surfaces when the program is evaluated. A conditional whose
+    condition folds to a literal is replaced by the branch it selects.
+    """
+
+    OPERATORS = set("+-*/%^") | set(COMPARISONS)
+    # Exact integer powers larger than this are left for run time, where a
+    # Budget can weigh them before they are computed
+    POWERS = frozenset({'^', 'pow', 'exp10'})
+    MAX_FOLDED_BITS = 1024
+
+    def __init__(self, evaluator: PostfixEvaluator, impure_functions: Set[str]):
+        self.evaluator = evaluator
+        self.impure_functions = impure_functions
+
+    def optimize(self, postfix: List) -> List:
+        out = []
+        # One entry per operand on the evaluation stack: (is_literal, start index in `out`)
+        stack = []
+
+        for token in postfix:
+            start = len(out)
+            if isinstance(token, (int, float)):
+                out.append(token)
+                stack.append((True, start))
+                continue
+            if type(token) is Select:
+                if not stack:
+                    return postfix
+                literal, start = stack.pop()
+                if literal:
+                    branch = self.optimize(token.then if out[start] else token.otherwise)
+                    del out[start:]
+                    out.extend(branch)
+                    stack.append((self._is_literal(branch), start))
+                else:
+                    out.append(Select(self.optimize(token.then), self.optimize(token.otherwise)))
+                    stack.append((False, start))
+                continue
+
+            arity = self._arity(token)
+            if arity is None:  # Run-time name (variable, `ans`, ...)
+                out.append(token)
+                stack.append((False, start))
+                continue
+            if len(stack) < arity:
+                return postfix  # Malformed; let the evaluator report it
+
+            operands = stack[-arity:]
+            del stack[-arity:]
+            start = operands[0][1]
+            out.append(token)
+
+            if token not in self.impure_functions and all(literal for literal, _ in operands):
+                folded = self._fold(out[start:])
+                if folded is not None:
+                    del out[start:]
+                    out.append(folded)
+                    stack.append((True, start))
+                    continue
+            stack.append((False, start))
+
+        return out
+
+    def _arity(self, token) -> int:
+        if type(token) is VariadicCall:
+            return token.count
+        if token == '~' or token in self.evaluator.functions:
+            return 1
+        if token in self.evaluator.binary_functions or token in self.OPERATORS:
+            return 2
+        if token in self.evaluator.user_functions:
+            return self.evaluator.user_functions[token].arity
+        return None
+
+    @staticmethod
+    def _is_literal(operand: List) -> bool:
+        return len(operand) == 1 and isinstance(operand[0], (int, float))
+
+    def _fold(self, code: List):
+        exponent = code[-2]
+        if code[-1] in self.POWERS and type(exponent) is int and exponent > 0:
+            base = code[0] if len(code) == 3 else 10
+            if type(base) is int and (base.bit_length() - 1) * exponent > self.MAX_FOLDED_BITS:
+                return None
+        try:
+            value = self.evaluator.evaluate(code)
+        except Exception:
+            return None  # Defer the error to evaluation time
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            return None
+        return value
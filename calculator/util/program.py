@@ -0,0 +1,154 @@
+from typing import Collection, Dict, FrozenSet, List, Optional, Tuple
+
+from calculator.util.budget import Cost, CostEstimator
+from calculator.util.cse import VariadicCall, walk
+from calculator.util.dual_compiler import DualCompiler
+from calculator.util.dual_eval import DualEvaluator
+from calculator.util.postfix_compiler import PostfixCompiler
+from calculator.util.postfix_eval import PostfixEvaluator
+from calculator.util.session import Session
+
+
+class CompiledProgram:
+    """
+    A parsed expression that can be evaluated repeatedly without re-parsing.
+
+    The postfix list is kept in compact opcode form (see OpcodeProgram) and
+    the first runs are interpreted from it; once a program has run
+    NATIVE_THRESHOLD times it is translated to a native Python function, so
+    one-off expressions never pay the translation cost. gradient() runs
+    the same way: interpreted by a DualEvaluator at first, then native.
+
+    Programs hold no per-user state: `ans` is read from the Session passed to
+    evaluate() (or the default session given at construction), so one
+    program can be run from many threads at once.
+    """
+
+    NATIVE_THRESHOLD = 8
+
+    __slots__ = ('source', 'variables', 'session', 'known_failure', '_variable_set', '_evaluator',
+                 '_code', '_postfix', '_symbols', '_cost', '_run', '_runs',
+                 '_dual_evaluator', '_gradient', '_gradient_runs')
+
+    def __init__(self, source: str, postfix: List, evaluator: PostfixEvaluator,
+                 variables: Tuple[str, ...] = (), session: Optional[Session] = None,
+                 dual_evaluator: Optional[DualEvaluator] = None):
+        self.source = source
+        self.variables = variables
+        self.session = session if session is not None else Session()
+        # Set by no-raise batch evaluation when the program fails regardless of input
+        self.known_failure = None
+        self._variable_set = frozenset(variables)
+        self._evaluator = evaluator
+        self._code = evaluator.opcodes.assemble(postfix, variables)
+        # Malformed programs keep their list so the evaluator reports the error
+        self._postfix = postfix if self._code is None else None
+        self._symbols: Optional[FrozenSet[str]] = None
+        self._cost: Optional[Cost] = None
+        self._run = self._interpret
+        self._runs = 0
+        # Derivative rules for gradient(); None for programs that cannot be differentiated
+        self._dual_evaluator = dual_evaluator
+        self._gradient = self._differentiate
+        self._gradient_runs = 0
+        if len(postfix) == 1 and type(postfix[0]) in (int, float):
+            # Folded to a literal: nothing to interpret or translate
+            value = postfix[0]
+            self._run = lambda variables, session: value
+
+    @property
+    def postfix(self) -> List:
+        """The program as a postfix token list (decoded on each access)."""
+        if self._code is None:
+            return self._postfix
+        return self._evaluator.opcodes.disassemble(self._code)
+
+    def evaluate(self, variables: Optional[Dict[str, float]] = None,
+                 session: Optional[Session] = None) -> float:
+        """
+        Run the program. Dynamic constants such as `ans` are read now from `session`.
+
+        Raises:
+            BudgetExceeded: if the session has a Budget the program's cost exceeds
+        """
+        if self.variables and not (variables and variables.keys() >= self._variable_set):
+            self.check_bound(variables)
+        if session is None:
+            session = self.session
+        if session.budget is not None:
+            session.budget.admit(self.cost)
+        return self._run(variables, session)
+
+    def __call__(self, **variables: float) -> float:
+        return self.evaluate(variables)
+
+    def _interpret(self, variables: Optional[Dict[str, float]], session: Session) -> float:
+        self._runs += 1  # Racy under threads, but only decides when to go native
+        if self._runs >= self.NATIVE_THRESHOLD:
+            self.compile_native()
+        if self._code is None:
+            return self._evaluator.evaluate(self._postfix, variables, session)
+        return self._evaluator.opcodes.evaluate(self._code, variables, session)
+
+    def gradient(self, variables: Optional[Dict[str, float]] = None,
+                 session: Optional[Session] = None) -> Tuple[float, Dict[str, float]]:
+        """
+        Run the program and its partial derivatives with respect to each of its variables.
+
+        Raises:
+            BudgetExceeded: if the session has a Budget the program's cost exceeds
+            ValueError: if the program is not differentiable at `variables`
+        """
+        if self._dual_evaluator is None:
+            raise ValueError("Program was compiled without derivative rules")
+        if self.variables and not (variables and variables.keys() >= self._variable_set):
+            self.check_bound(variables)
+        if session is None:
+            session = self.session
+        if session.budget is not None:
+            session.budget.admit(self.cost)
+        return self._gradient(variables, session)
+
+    def _differentiate(self, variables: Optional[Dict[str, float]], session: Session) -> Tuple:
+        self._gradient_runs += 1
+        if self._gradient_runs >= self.NATIVE_THRESHOLD:
+            self._gradient = DualCompiler(self._dual_evaluator).compile(self.postfix, self.variables)
+        point = {name: variables[name] for name in self.variables}
+        return self._dual_evaluator.evaluate(self.postfix, point, session)
+
+    def compile_native(self) -> None:
+        """Switch to the native backend now instead of waiting for the threshold."""
+        self._run = PostfixCompiler(self._evaluator).compile(self.postfix, self.variables)
+
+    @property
+    def cost(self) -> Cost:
+        """Static estimate of what one run takes (computed on first use)."""
+        if self._cost is None:
+            if self._code is None:
+                self._cost = Cost(len(self._postfix), len(self._postfix))  # Malformed; it fails at once
+            else:
+                evaluator = self._evaluator
+                estimator = CostEstimator(evaluator.functions, evaluator.binary_functions,
+                                          evaluator.user_functions)
+                self._cost = estimator.estimate(self.postfix)
+        return self._cost
+
+    def references(self, names: Collection[str]) -> bool:
+        """True if the program calls or reads any of `names` (functions, variables, `ans`...)."""
+        if self._symbols is None:
+            if self._code is None:
+                self._symbols = frozenset(token.name if type(token) is VariadicCall else token
+                                          for token in walk(self._postfix)
+                                          if isinstance(token, (str, VariadicCall)))
+            else:
+                self._symbols = self._evaluator.opcodes.symbols(self._code)
+        return not self._symbols.isdisjoint(names)
+
+    def check_bound(self, variables: Optional[Dict]) -> None:
+        """Raise if any free variable of the program has no value."""
+        missing = [name for name in self.variables if not variables or name not in variables]
+        if missing:
+            raise ValueError(f"Unbound variable(s): {', '.join(missing)}")
+
+    def __repr__(self) -> str:
+        return f"CompiledProgram({self.source!r}, postfix={self.postfix!r})"
@@ -0,0 +1,330 @@
+import mmap
+import os
+import struct
+import sys
+import tempfile
+import threading
+import zlib
+from array import array
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from calculator.util.cse import Load, Store, VariadicCall
+
+MAGIC = b'CALCPROG'
+FORMAT_VERSION = 1
+
+# Opcodes of a serialized postfix token; their operands live in separate arrays
+OP_FLOAT, OP_INT, OP_NAME, OP_STORE, OP_LOAD, OP_CALL = range(6)
+
+# magic, format version, registry fingerprint, string count, string bytes, program count
+_HEADER = struct.Struct('<8sH32sIQI')
+_RECORD = struct.Struct('<II')  # token count, CRC-32 of the rest of the record
+_SWAP = sys.byteorder != 'little'  # The file is little-endian; arrays use native order
+_ENCODABLE = frozenset({float, str, int, Store, Load, VariadicCall})  # Token types with an opcode
+
+
+def _read_array(typecode: str, data, start: int, count: int) -> Tuple[array, int]:
+    values = array(typecode)
+    end = start + count * values.itemsize
+    if end > len(data):
+        raise ValueError("Truncated program store")
+    values.frombytes(data[start:end])
+    if _SWAP:
+        values.byteswap()
+    return values, end
+
+
+def _array_bytes(values: array) -> bytes:
+    if _SWAP:
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+
+class _Image:
+    """A memory-mapped store file: string table and index decoded, programs decoded on demand."""
+
+    __slots__ = ('data', 'strings', 'index')
+
+    def __init__(self, data=b'', strings: List[str] = (), index: Dict[str, Tuple[int, int]] = None):
+        self.data = data
+        self.strings = strings
+        self.index = index or {}
+
+    @classmethod
+    def open(cls, path: str, fingerprint: bytes) -> "_Image":
+        """Map `path`; a missing, foreign, outdated or truncated file reads as empty."""
+        try:
+            with open(path, 'rb') as f:
+                data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):  # ValueError: empty file
+            return cls()
+        try:
+            magic, version, file_fingerprint, string_count, string_bytes, count = _HEADER.unpack_from(data)
+            if magic != MAGIC or version != FORMAT_VERSION or file_fingerprint != fingerprint:
+                return cls()
+            lengths, pos = _read_array('I', data, _HEADER.size, string_count)
+            text = data[pos:pos + string_bytes].decode('utf-8')
+            pos += string_bytes
+            strings = []
+            offset = 0
+            for length in lengths:
+                strings.append(text[offset:offset + length])
+                offset += length
+            keys, pos = _read_array('I', data, pos, count)
+            bounds, pos = _read_array('Q', data, pos, count + 1)
+            if bounds[-1] > len(data):
+                return cls()
+            index = {strings[key]: (bounds[i], bounds[i + 1]) for i, key in enumerate(keys)}
+        except (struct.error, ValueError, IndexError):
+            return cls()
+        return cls(data, strings, index)
+
+    def get(self, key: str) -> Optional[List]:
+        bounds = self.index.get(key)
+        if bounds is None:
+            return None
+        try:
+            return self._decode(*bounds)
+        except (struct.error, ValueError, IndexError, StopIteration):
+            return None  # Damaged record; the caller compiles instead
+
+    def _decode(self, start: int, end: int) -> List:
+        data = self.data
+        strings = self.strings
+        count, checksum = _RECORD.unpack_from(data, start)
+        pos = start + _RECORD.size
+        if zlib.crc32(data[pos:end]) != checksum:
+            raise ValueError("Damaged program record")
+        opcodes = data[pos:pos + count]
+        floats, pos = _read_array('d', data, pos + count, opcodes.count(OP_FLOAT))
+        operands, _ = _read_array('I', data, pos, (end - pos) // 4)
+        floats = iter(floats)
+        operands = iter(operands)
+
+        postfix = []
+        append = postfix.append
+        for op in opcodes:
+            if op == OP_FLOAT:
+                append(next(floats))
+            elif op == OP_NAME:
+                append(strings[next(operands)])
+            elif op == OP_INT:
+                append(int(strings[next(operands)]))
+            elif op == OP_STORE:
+                append(Store(next(operands)))
+            elif op == OP_LOAD:
+                append(Load(next(operands)))
+            elif op == OP_CALL:
+                append(VariadicCall(strings[next(operands)], next(operands)))
+            else:
+                raise IndexError(f"Unknown opcode {op}")
+        return postfix
+
+    def items(self) -> Iterable[Tuple[str, List]]:
+        for key in self.index:
+            postfix = self.get(key)
+            if postfix is not None:
+                yield key, postfix
+
+
+class _ProgramFile:
+    """Programs of one (angle unit, registry fingerprint) pair: the mapped file plus unsaved additions."""
+
+    def __init__(self, path: str, fingerprint: bytes):
+        self.path = path
+        self.fingerprint = fingerprint
+        self.image = _Image.open(path, fingerprint)
+        self.pending: Dict[str, List] = {}
+
+    def get(self, key: str) -> Optional[List]:
+        postfix = self.pending.get(key)
+        if postfix is not None:
+            return list(postfix)
+        return self.image.get(key)
+
+    def flush(self) -> int:
+        """Merge unsaved programs into the file on disk; returns how many were written."""
+        if not self.pending:
+            return 0
+        # Re-read the file: another process may have saved programs since we mapped it
+        programs = dict(_Image.open(self.path, self.fingerprint).items())
+        programs.update(self.pending)
+        data = self._encode(programs)
+
+        directory = os.path.dirname(self.path)
+        fd, temporary = tempfile.mkstemp(prefix='.', suffix='.tmp', dir=directory)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(temporary, self.path)  # Atomic: readers see the old or the new file
+        except BaseException:
+            try:
+                os.unlink(temporary)
+            except OSError:
+                pass
+            raise
+        written = len(self.pending)
+        self.image = _Image.open(self.path, self.fingerprint)
+        self.pending = {}
+        return written
+
+    def _encode(self, programs: Dict[str, List]) -> bytes:
+        strings: Dict[str, int] = {}
+
+        def intern(text: str) -> int:
+            index = strings.get(text)
+            if index is None:
+                index = strings[text] = len(strings)
+            return index
+
+        keys = array('I')
+        bounds = array('Q')
+        records = []
+        size = 0
+        for key, postfix in programs.items():
+            record = self._encode_program(postfix, intern)
+            if record is None:
+                continue
+            keys.append(intern(key))
+            bounds.append(size)
+            records.append(record)
+            size += len(record)
+        bounds.append(size)
+
+        lengths = array('I', map(len, strings))
+        text = ''.join(strings).encode('utf-8')
+        header_size = (_HEADER.size + len(lengths) * 4 + len(text)
+                       + len(keys) * 4 + len(bounds) * 8)
+        bounds = array('Q', (offset + header_size for offset in bounds))
+        header = _HEADER.pack(MAGIC, FORMAT_VERSION, self.fingerprint,
+                              len(strings), len(text), len(keys))
+        return b''.join([header, _array_bytes(lengths), text,
+                         _array_bytes(keys), _array_bytes(bounds), *records])
+
+    @staticmethod
+    def _encode_program(postfix: List, intern) -> Optional[bytes]:
+        opcodes = bytearray()
+        floats = array('d')
+        operands = array('I')
+        for token in postfix:
+            kind = type(token)
+            if kind is float:
+                opcodes.append(OP_FLOAT)
+                floats.append(token)
+            elif kind is str:
+                opcodes.append(OP_NAME)
+                operands.append(intern(token))
+            elif kind is int:
+                opcodes.append(OP_INT)
+                operands.append(intern(str(token)))
+            elif kind is Store:
+                opcodes.append(OP_STORE)
+                operands.append(token.slot)
+            elif kind is Load:
+                opcodes.append(OP_LOAD)
+                operands.append(token.slot)
+            elif kind is VariadicCall:
+                opcodes.append(OP_CALL)  # Two operands: name, argument count
+                operands.append(intern(token.name))
+                operands.append(token.count)
+            else:
+                return None  # Not representable; this program is just not persisted
+        body = b''.join([bytes(opcodes), _array_bytes(floats), _array_bytes(operands)])
+        return _RECORD.pack(len(opcodes), zlib.crc32(body)) + body
+
+
+class ProgramStore:
+    """
+    On-disk cache of compiled programs, shared by processes and across restarts.
+
+    Programs are stored as compact opcode/constant arrays that refer to
+    functions by registry name, one file per angle unit and registry
+    fingerprint. Files are memory-mapped; only the string table and index
+    are decoded on open, each program when it is first looked up. Keys are
+    the expression text without spaces plus the sorted variable names.
+
+    A change to the functions, constants or compilation pipeline changes the
+    fingerprint, so programs built by older code are never loaded; damaged
+    files or records fail their checks and are compiled again. New
+    programs are kept in memory until flush(), which merges them into the
+    file with an atomic rename. Safe to share between threads.
+    """
+
+    SUFFIX = '.prog'
+
+    def __init__(self, directory: str, read_only: bool = False):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.read_only = read_only  # Load programs but never queue or write new ones
+        self._files: Dict[Tuple, _ProgramFile] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(query: str, variables: Iterable[str] = ()) -> str:
+        """Normalized cache key: the text as the parser sees it plus the sorted variable names."""
+        text = query.replace(' ', '')
+        if variables:
+            return f"{text}\0{','.join(sorted(variables))}"
+        return text
+
+    def get(self, registry, query: str, variables: Iterable[str] = ()) -> Optional[List]:
+        """Stored postfix program for `query` under `registry`, or None."""
+        postfix = self._file(registry).get(self.key(query, variables))
+        if postfix is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return postfix
+
+    def put(self, registry, query: str, variables: Iterable[str], postfix: List) -> None:
+        """
+        Remember a freshly compiled program; it is written on the next flush().
+
+        Programs the file format cannot represent (conditionals) are not kept.
+        """
+        if self.read_only or not all(type(token) in _ENCODABLE for token in postfix):
+            return
+        program_file = self._file(registry)
+        with self._lock:
+            program_file.pending[self.key(query, variables)] = list(postfix)
+
+    def flush(self) -> int:
+        """Write unsaved programs to disk; returns how many were written."""
+        with self._lock:
+            return sum(program_file.flush() for program_file in self._files.values())
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            files = list(self._files.values())
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "stored": sum(len(f.image.index) for f in files),
+            "pending": sum(len(f.pending) for f in files),
+        }
+
+    def _file(self, registry) -> _ProgramFile:
+        fingerprint = registry.fingerprint
+        file_key = (registry.angle_unit, fingerprint)
+        program_file = self._files.get(file_key)
+        if program_file is None:
+            with self._lock:
+                program_file = self._files.get(file_key)
+                if program_file is None:
+                    name = f"{registry.angle_unit.value}-{fingerprint[:16]}{self.SUFFIX}"
+                    program_file = _ProgramFile(os.path.join(self.directory, name),
+                                                bytes.fromhex(fingerprint))
+                    self._files[file_key] = program_file
+        return program_file
+
+    def __enter__(self) -> "ProgramStore":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.flush()
+
+    def __repr__(self) -> str:
+        return f"ProgramStore({self.directory!r}, {self.stats()!r}{', read_only=True' if self.read_only else ''})"
@@ -0,0 +1,24 @@
+from typing import Optional
+
+from calculator.util.budget import Budget
+
+
+class Session:
+    """
+    Per-user calculator state: the last answer (`ans`), the memory register
+    and an optional Budget limiting which expressions may run.
+
+    Compiled programs and function registries are shared and read-only, so a
+    single calculator can serve many threads as long as each one passes its
+    own Session to evaluate().
+    """
+
+    __slots__ = ('ans', 'memory', 'budget')
+
+    def __init__(self, ans: float = 0.0, memory: float = 0.0, budget: Optional[Budget] = None):
+        self.ans = ans
+        self.memory = memory
+        self.budget = budget
+
+    def __repr__(self) -> str:
+        return f"Session(ans={self.ans!r}, memory={self.memory!r})"
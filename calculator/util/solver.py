@@ -0,0 +1,341 @@
+import math
+import sys
+from typing import Callable, Optional, Tuple
+
+from calculator.funtions.vectorized_functions import require_numpy
+
+# Relative precision a root can be located to; minima only to its square root
+RTOL = 4 * sys.float_info.epsilon
+MINIMUM_RTOL = math.sqrt(sys.float_info.epsilon)
+GOLDEN = (3 - math.sqrt(5)) / 2
+
+# (x, value or derivative at x, iterations, converged)
+Outcome = Tuple[float, float, int, bool]
+
+
+class SolveResult:
+    """
+    Outcome of solve() or minimize().
+
+    `x` is the root or minimizer and `value` the expression there.
+    `iterations` counts solver steps and `evaluations` runs of the compiled
+    program (a run that also computes the derivative counts once). For a
+    vectorized batch, `x`, `value`, `iterations` and `converged` are arrays
+    with one element per problem and `evaluations` counts passes over the
+    batch.
+    """
+
+    __slots__ = ('x', 'value', 'converged', 'iterations', 'evaluations', 'seconds', 'method')
+
+    def __init__(self, x, value, converged, iterations, evaluations: int, seconds: float, method: str):
+        self.x = x
+        self.value = value
+        self.converged = converged
+        self.iterations = iterations
+        self.evaluations = evaluations
+        self.seconds = seconds
+        self.method = method
+
+    def __repr__(self) -> str:
+        return (f"SolveResult(x={self.x!r}, value={self.value!r}, converged={self.converged!r}, "
+                f"iterations={self.iterations!r}, evaluations={self.evaluations}, "
+                f"seconds={self.seconds:.3g}, method={self.method!r})")
+
+
+class CountedFunction:
+    """Wraps a function and counts its calls."""
+
+    __slots__ = ('function', 'calls')
+
+    def __init__(self, function: Callable):
+        self.function = function
+        self.calls = 0
+
+    def __call__(self, *arguments):
+        self.calls += 1
+        return self.function(*arguments)
+
+
+def _opposite(a: float, b: float) -> bool:
+    return (a < 0) != (b < 0)
+
+
+def _value_of(g: Callable, value_only: Callable, x: float) -> float:
+    try:
+        return g(x)[0]
+    except ValueError:
+        return value_only(x)
+
+
+def brent_root(f: Callable[[float], float], a: float, b: float, xtol: float,
+               max_iterations: int) -> Outcome:
+    """
+    Root of `f` in [a, b] by Brent's method (bisection, secant and inverse
+    quadratic interpolation), without derivatives.
+
+    Raises:
+        ValueError: if f(a) and f(b) do not have opposite signs
+    """
+    fa, fb = f(a), f(b)
+    if fa == 0:
+        return a, fa, 0, True
+    if fb == 0:
+        return b, fb, 0, True
+    if not _opposite(fa, fb):
+        raise ValueError(f"No sign change in the bracket: f({a}) = {fa}, f({b}) = {fb}")
+
+    previous, current, f_previous, f_current = a, b, fa, fb
+    block, f_block = a, fa  # The other end of the bracket
+    step = last_step = 0.0
+    for iteration in range(1, max_iterations + 1):
+        if _opposite(f_previous, f_current):
+            block, f_block = previous, f_previous
+            step = last_step = current - previous
+        if abs(f_block) < abs(f_current):
+            previous, current, block = current, block, current
+            f_previous, f_current, f_block = f_current, f_block, f_current
+
+        tolerance = (xtol + RTOL * abs(current)) / 2
+        bisection = (block - current) / 2
+        if f_current == 0 or abs(bisection) < tolerance:
+            return current, f_current, iteration, True
+
+        if abs(last_step) > tolerance and abs(f_current) < abs(f_previous):
+            if previous == block:
+                trial = -f_current * (current - previous) / (f_current - f_previous)  # Secant
+            else:
+                slope_previous = (f_previous - f_current) / (previous - current)
+                slope_block = (f_block - f_current) / (block - current)
+                trial = -f_current * (f_block * slope_block - f_previous * slope_previous) / (
+                    slope_block * slope_previous * (f_block - f_previous))  # Inverse quadratic
+            if 2 * abs(trial) < min(abs(last_step), 3 * abs(bisection) - tolerance):
+                last_step, step = step, trial
+            else:
+                last_step = step = bisection
+        else:
+            last_step = step = bisection
+
+        previous, f_previous = current, f_current
+        current += step if abs(step) > tolerance else math.copysign(tolerance, bisection)
+        f_current = f(current)
+    return current, f_current, max_iterations, False
+
+
+def brent_minimum(f: Callable[[float], float], a: float, b: float, xtol: float,
+                  max_iterations: int) -> Outcome:
+    """
+    A local minimum of `f` inside [a, b] by Brent's method (golden-section
+    search and parabolic interpolation), without derivatives.
+    """
+    a, b = min(a, b), max(a, b)
+    x = w = v = a + GOLDEN * (b - a)
+    fx = fw = fv = f(x)
+    d = e = 0.0
+    for iteration in range(1, max_iterations + 1):
+        middle = (a + b) / 2
+        tolerance = MINIMUM_RTOL * abs(x) + xtol / 3
+        if abs(x - middle) <= 2 * tolerance - (b - a) / 2:
+            return x, fx, iteration - 1, True
+
+        golden = True
+        if abs(e) > tolerance:
+            # Parabola through (v, fv), (w, fw), (x, fx)
+            r = (x - w) * (fx - fv)
+            q = (x - v) * (fx - fw)
+            p = (x - v) * q - (x - w) * r
+            q = 2 * (q - r)
+            if q > 0:
+                p = -p
+            q = abs(q)
+            previous_e, e = e, d
+            if abs(p) < abs(q * previous_e / 2) and q * (a - x) < p < q * (b - x):
+                d = p / q
+                golden = False
+                if (x + d) - a < 2 * tolerance or b - (x + d) < 2 * tolerance:
+                    d = math.copysign(tolerance, middle - x)
+        if golden:
+            e = (b if x < middle else a) - x
+            d = GOLDEN * e
+
+        u = x + (d if abs(d) >= tolerance else math.copysign(tolerance, d))
+        fu = f(u)
+        if fu <= fx:
+            if u < x:
+                b = x
+            else:
+                a = x
+            v, fv, w, fw, x, fx = w, fw, x, fx, u, fu
+        else:
+            if u < x:
+                a = u
+            else:
+                b = u
+            if fu <= fw or w == x:
+                v, fv, w, fw = w, fw, u, fu
+            elif fu <= fv or v == x or v == w:
+                v, fv = u, fu
+    return x, fx, max_iterations, False
+
+
+def safeguarded_root(g: Callable[[float], Tuple[float, Optional[float]]], value_only: Callable[[float], float],
+                     x0: Optional[float], bracket: Optional[Tuple[float, float]], xtol: float,
+                     max_iterations: int) -> Outcome:
+    """
+    Root of `g` by Newton's method, where g(x) returns (value, slope).
+
+    A slope of None (no derivative available) takes a secant step from the
+    previous point instead. With a bracket, steps that would leave it or
+    that do not halve it fast enough are replaced by bisection, so the
+    bracket always holds a sign change and the iteration converges; without
+    one (pure Newton from `x0`) it may not. Where g raises ValueError (its
+    slope is undefined) the value comes from `value_only` and the step is a
+    bisection.
+
+    Raises:
+        ValueError: if the bracket has no sign change, or, without a
+            bracket, g or its slope is undefined at an iterate
+    """
+    low = high = None
+    if bracket is not None:
+        low, high = bracket
+        g_low, g_high = (_value_of(g, value_only, end) for end in bracket)
+        if g_low == 0:
+            return low, g_low, 0, True
+        if g_high == 0:
+            return high, g_high, 0, True
+        if not _opposite(g_low, g_high):
+            raise ValueError(f"No sign change in the bracket: f({low}) = {g_low}, f({high}) = {g_high}")
+        if g_low > 0:
+            low, high, g_low = high, low, g_high  # g(low) < 0 < g(high) from here on
+        if x0 is None:
+            x0 = (low + high) / 2
+
+    x, previous = x0, (None if bracket is None else (low, g_low))
+    last_step = step = abs(high - low) if bracket is not None else math.inf
+    for iteration in range(1, max_iterations + 1):
+        try:
+            value, slope = g(x)
+        except ValueError:
+            if bracket is None:
+                raise
+            value, slope = value_only(x), 0.0  # Slope undefined here: bisect
+        if value == 0:
+            return x, value, iteration, True
+        if bracket is not None:
+            if value < 0:
+                low = x
+            else:
+                high = x
+        if slope is None and previous is not None and previous[1] != value and previous[0] != x:
+            slope = (value - previous[1]) / (x - previous[0])
+        previous = (x, value)
+
+        newton = x - value / slope if slope else None
+        if bracket is None:
+            if newton is None or not math.isfinite(newton):
+                return x, value, iteration, False  # Flat or undefined: Newton cannot continue
+            candidate = newton
+        elif (newton is None or not min(low, high) <= newton <= max(low, high)
+              or abs(2 * (newton - x)) > abs(last_step)):
+            candidate = (low + high) / 2
+        else:
+            candidate = newton
+        last_step, step = step, candidate - x
+        x = candidate
+        tolerance = xtol + RTOL * abs(x)
+        if abs(step) <= tolerance or (bracket is not None and abs(high - low) <= tolerance):
+            return x, value, iteration, True
+    return x, value, max_iterations, False
+
+
+def vectorized_safeguarded_root(g: Callable, low, high, g_low, g_high, xtol: float, max_iterations: int,
+                                newton: bool = True) -> Tuple:
+    """
+    safeguarded_root over arrays of independent brackets at once.
+
+    g(x, index) evaluates the problems at `index` (an integer array) at
+    points `x` and returns (values, slopes); with `newton` False the slopes
+    are ignored and secant steps are taken. `g_low` and `g_high`, the values
+    at the bracket ends, must differ in sign (or be zero). Elements whose
+    slope is NaN are bisected; elements whose value is NaN stop unconverged.
+
+    Returns:
+        (x, iterations, converged, passes) where `passes` counts calls to g
+    """
+    np = require_numpy()
+    low, high = np.array(low, dtype=float), np.array(high, dtype=float)
+    swap = g_low > 0  # Orient every bracket so that g(low) < 0 < g(high)
+    low[swap], high[swap] = high[swap], low[swap]
+    g_low, g_high = np.where(swap, g_high, g_low), np.where(swap, g_low, g_high)
+
+    x = np.where(g_low == 0, low, np.where(g_high == 0, high, (low + high) / 2))
+    iterations = np.zeros(low.size, dtype=np.int64)
+    converged = (g_low == 0) | (g_high == 0)
+    active = np.flatnonzero(~converged)
+    step = np.abs(high - low)
+    last_step = step.copy()
+    previous_x, previous_value = low.copy(), g_low.copy()  # Secant steps start from the low end
+    passes = 0
+
+    with np.errstate(all='ignore'):
+        for _ in range(max_iterations):
+            if active.size == 0:
+                break
+            xa = x[active]
+            value, slope = g(xa, active)
+            passes += 1
+            iterations[active] += 1
+            failed = np.isnan(value)
+            found = value == 0
+            low[active] = np.where(value < 0, xa, low[active])
+            high[active] = np.where(value > 0, xa, high[active])
+            if not newton:
+                slope = (value - previous_value[active]) / (xa - previous_x[active])
+            previous_x[active], previous_value[active] = xa, value
+
+            la, ha = low[active], high[active]
+            proposal = xa - value / slope
+            inside = (proposal >= np.minimum(la, ha)) & (proposal <= np.maximum(la, ha))
+            fast = np.abs(2 * (proposal - xa)) <= last_step[active]
+            candidate = np.where(inside & fast, proposal, (la + ha) / 2)
+            last_step[active] = step[active]
+            step[active] = np.abs(candidate - xa)
+            tolerance = xtol + RTOL * np.abs(candidate)
+            x[active] = np.where(found, xa, candidate)
+            done = found | (step[active] <= tolerance) | (np.abs(ha - la) <= tolerance)
+            converged[active] = done & ~failed
+            active = active[~(done | failed)]
+    return x, iterations, converged, passes
+
+
+def secant_minimum(slope: Callable[[float], float], low: float, high: float, slope_low: float,
+                   slope_high: float, xtol: float, max_iterations: int) -> Outcome:
+    """
+    A local minimum of f inside [low, high], where f'(low) <= 0 <= f'(high),
+    from the roots of its derivative `slope` found by safeguarded_root.
+
+    A root is only accepted where f' changes sign from negative to positive
+    across it. One that is a maximum or an inflection (which the first
+    midpoint can hit exactly) narrows the bracket to a side of it where f'
+    still rises through zero, and the search continues there.
+
+    Raises:
+        ValueError: if `slope` is undefined at a point the search evaluates
+    """
+    known = {low: slope_low, high: slope_high}
+    g = lambda x: (known[x] if x in known else slope(x), None)
+    iterations = 0
+    while True:
+        x, g_x, steps, converged = safeguarded_root(g, slope, None, (low, high), xtol,
+                                                    max_iterations - iterations)
+        iterations += steps
+        if not converged or iterations >= max_iterations:
+            return x, g_x, iterations, converged
+        delta = 2 * (xtol + RTOL * abs(x))
+        if x - delta > low and slope(x - delta) >= 0:
+            high = x - delta
+        elif x + delta < high and slope(x + delta) <= 0:
+            low = x + delta
+        else:
+            return x, g_x, iterations, True
+        iterations += 1  # Restarting counts as a step, so exact zeros cannot loop forever
@@ -1,84 +1,98 @@
 import math
-from typing import Dict, List, Optional, Union
+from typing import Dict, Iterable, List, Mapping, Optional, Tuple, Union
+
+from calculator.util.name_trie import NameTrie
 
 
 class Tokenizer:
     """Handles tokenization of mathematical expressions."""
-    
-    def __init__(self, functions: Dict, binary_functions: Dict, constants: Dict):
+
+    CONSTANT = 'constant'
+    FUNCTION = 'function'
+    BINARY_FUNCTION = 'binary_function'
+    USER_FUNCTION = 'user_function'
+    VARIADIC_FUNCTION = 'variadic_function'
+    CONDITIONAL = 'conditional'
+    VARIABLE = 'variable'
+
+    # Calls whose arguments are evaluated lazily (see Parser), by number of arguments
+    CONDITIONALS: Mapping[str, int] = {'if': 3, 'and': 2, 'or': 2}
+
+    def __init__(self, functions: Dict, binary_functions: Dict, constants: Dict,
+                 dynamic_constants: Iterable[str] = (), user_functions: Mapping = None,
+                 variadic_functions: Mapping = None):
         self.functions = functions
         self.binary_functions = binary_functions
+        # Functions of one or more arguments (sum, mean, ...); max and min are also binary
+        self.variadic_functions = variadic_functions if variadic_functions is not None else {}
+        # User-defined functions (any arity) by name; see FunctionRegistry.with_function
+        self.user_functions = user_functions if user_functions is not None else {}
         self.constants = constants
-    
-    def tokenize(self, query: str) -> List[Union[float, str]]:
+        # Names (e.g. `ans`) whose value is only known when a program runs
+        self.dynamic_constants = frozenset(dynamic_constants) | frozenset(
+            name for name, value in constants.items() if callable(value)
+        )
+        self.names = self._build_name_trie()
+
+    def _build_name_trie(self) -> NameTrie:
+        """Index every registry name once so lookups are independent of registry size."""
+        trie = NameTrie()
+        trie.add_all(self.constants.keys(), self.CONSTANT)
+        trie.add_all(self.dynamic_constants, self.CONSTANT)
+        trie.add_all(self.functions.keys(), self.FUNCTION)
+        trie.add_all(self.binary_functions.keys(), self.BINARY_FUNCTION)
+        trie.add_all(self.variadic_functions.keys(), self.VARIADIC_FUNCTION)
+        trie.add_all(self.CONDITIONALS.keys(), self.CONDITIONAL)
+        trie.add_all(self.user_functions.keys(), self.USER_FUNCTION)
+        return trie
+
+    def tokenize(self, query: str, variables: Iterable[str] = ()) -> List[Union[float, str]]:
+        """
+        Split an expression into numbers, names, operators and parentheses.
+
+        Args:
+            query: Mathematical expression as string
+            variables: Names of free variables allowed in the expression;
+                they are emitted as name tokens and bound at evaluation time
+        """
         if not query or not query.strip():
             raise ValueError("Empty expression")
 
+        variable_names = None
+        if variables:
+            variable_names = NameTrie()
+            variable_names.add_all(variables, self.VARIABLE)
+
         query = query.replace(' ', '')
+        n = len(query)
         tokens = []
         i = 0
-        num_str = ""
         pending_close = 0  # Track how many closing parens we need to add
 
-        while i < len(query):
+        while i < n:
             ch = query[i]
 
-            # Handle angle unit suffixes (°, rad, grad, turn)
-            if ch == '°' or query[i:i+3] == 'rad' or query[i:i+4] in ['grad', 'turn']:
-                angle_info = self._handle_angle_unit(query, i, num_str)
-                if angle_info:
-                    i, num_str, angle_token = angle_info
-                    tokens.append(angle_token)
-                    continue
-
-            # Build number (including decimals and scientific notation)
+            # Numbers (including decimals, scientific notation and angle suffixes)
             if ch.isdigit() or ch == '.':
-                num_str += ch
-                i += 1
+                i = self._read_number(query, i, tokens)
                 continue
 
-            # Scientific notation (e.g., 1e-5, 2.5E+3)
-            if ch in 'eE' and num_str and i + 1 < len(query):
-                next_ch = query[i + 1]
-                if next_ch in '+-' or next_ch.isdigit():
-                    num_str += ch
-                    i += 1
-                    continue
-
-            # Check for constants
-            constant_result = self._try_parse_constant(query, i, tokens, num_str)
-            if constant_result is not None:
-                i, num_str = constant_result
-                # If we had a pending close and just processed a constant, close it
-                if pending_close > 0:
+            # Constants and function names (longest match wins)
+            name_result = self._try_parse_name(query, i, tokens, variable_names)
+            if name_result is not None:
+                i, kind = name_result
+                # If we had a pending close and just processed a value, close it
+                if kind != self.FUNCTION and pending_close > 0:
                     tokens.append(')')
                     pending_close -= 1
                 continue
 
-            # Check for binary functions
-            binary_result = self._try_parse_binary_function(query, i, tokens, num_str)
-            if binary_result is not None:
-                i, num_str = binary_result
-                continue
-
-            # Check for unary functions
-            func_result = self._try_parse_function(query, i, tokens, num_str)
-            if func_result is not None:
-                i, num_str = func_result
-                continue
-
-            # Flush pending number
-            if num_str:
-                tokens.append(self._parse_float(num_str))
-                num_str = ""
-
             # Handle unary minus
             if ch == '-' and self._is_unary_minus(i, tokens):
-                result = self._handle_unary_minus(query, i, tokens)
+                result = self._handle_unary_minus(query, i, tokens, variable_names)
                 i, num_str = result[0], result[1]
                 if num_str == "pending_close":
                     pending_close += 1
-                    num_str = ""
                 continue
 
             # Handle closing parenthesis - check if we need to add our pending close
@@ -97,84 +111,116 @@ class Tokenizer:
             else:
                 raise ValueError(f"Invalid character: '{ch}'")
 
-        # Flush final number
-        if num_str:
-            tokens.append(self._parse_float(num_str))
-
         # Close any remaining pending parentheses
         while pending_close > 0:
             tokens.append(')')
             pending_close -= 1
 
         return tokens
-    
-    def _handle_angle_unit(self, query: str, i: int, num_str: str) -> Optional[tuple]:
+
+    def _scan_number(self, query: str, i: int) -> int:
+        """Return the index just past the number literal starting at `i`."""
+        n = len(query)
+        while i < n and (query[i].isdigit() or query[i] == '.'):
+            i += 1
+
+        # Scientific notation (e.g., 1e-5, 2.5E+3); a bare `e` is left for the constant
+        if i < n and query[i] in 'eE':
+            j = i + 1
+            if j < n and query[j] in '+-':
+                j += 1
+            if j < n and query[j].isdigit():
+                i = j
+                while i < n and query[i].isdigit():
+                    i += 1
+        return i
+
+    def _read_number(self, query: str, i: int, tokens: List, negate: bool = False) -> int:
+        """Append the number starting at `i` (converted to radians if it has an angle suffix)."""
+        end = self._scan_number(query, i)
+        value = self._parse_float(query[i:end])
+        if negate:
+            value = -value
+        angle_info = self._handle_angle_unit(query, end, value)
+        if angle_info:
+            end, value = angle_info
+        tokens.append(value)
+        return end
+
+    def _handle_angle_unit(self, query: str, i: int, value: float) -> Optional[Tuple[int, float]]:
         """Handle angle unit suffixes and convert to radians."""
-        if not num_str:
+        if i >= len(query) or query[i] not in '°rgt':
             return None
-        
-        value = self._parse_float(num_str)
-        
+
         if query[i] == '°':
             # Degrees
-            radians = math.radians(value)
-            return (i + 1, "", radians)
-        elif query[i:i+3] == 'rad':
+            return (i + 1, math.radians(value))
+        elif query.startswith('rad', i):
             # Radians (no conversion needed)
-            return (i + 3, "", value)
-        elif query[i:i+4] == 'grad':
+            return (i + 3, value)
+        elif query.startswith('grad', i):
             # Gradians
-            radians = value * math.pi / 200
-            return (i + 4, "", radians)
-        elif query[i:i+4] == 'turn':
+            return (i + 4, value * math.pi / 200)
+        elif query.startswith('turn', i):
             # Turns
-            radians = value * 2 * math.pi
-            return (i + 4, "", radians)
+            return (i + 4, value * 2 * math.pi)
         
         return None
-    
-    def _try_parse_constant(self, query: str, i: int, tokens: List, num_str: str) -> Optional[tuple]:
-        for const_name, const_value in self.constants.items():
-            if query[i:i+len(const_name)] == const_name:
-                # Check if this constant name is followed by '(' - if so, it's a function, not a constant
-                next_idx = i + len(const_name)
-                if next_idx < len(query) and query[next_idx] == '(':
-                    continue  # Skip this constant, let function parser handle it
-
-                if num_str:
-                    tokens.append(self._parse_float(num_str))
-                if callable(const_value):
-                    tokens.append(const_value())
-                else:
-                    tokens.append(const_value)
-                return (i + len(const_name), "")
-        return None
-    
-    def _try_parse_binary_function(self, query: str, i: int, tokens: List, num_str: str) -> Optional[tuple]:
-        for func_name in self.binary_functions.keys():
-            if query[i:i+len(func_name)+1] == f'{func_name}(':
-                if num_str:
-                    tokens.append(self._parse_float(num_str))
-                tokens.append(func_name)
-                tokens.append('(')
-                return (i + len(func_name) + 1, "")
-        return None
-    
-    def _try_parse_function(self, query: str, i: int, tokens: List, num_str: str) -> Optional[tuple]:
-        for func_name in self.functions.keys():
-            if query[i:i+len(func_name)+1] == f'{func_name}(':
-                if num_str:
-                    tokens.append(self._parse_float(num_str))
-                tokens.append(func_name)
+
+    def _try_parse_name(self, query: str, i: int, tokens: List,
+                        variable_names: Optional[NameTrie] = None) -> Optional[Tuple[int, str]]:
+        """
+        Match the longest constant, variable or function name at `i`.
+
+        A function name followed by '(' is a call; otherwise variables shadow
+        constants, and a constant must not be followed by '('.
+
+        Returns:
+            (next_index, kind) or None if no name applies
+        """
+        matches = self.names.matches(query, i)
+        if variable_names is not None:
+            matches = self._merge_matches(matches, variable_names.matches(query, i))
+
+        for end, name, kinds in reversed(matches):
+            followed_by_paren = end < len(query) and query[end] == '('
+            if followed_by_paren and (self.BINARY_FUNCTION in kinds or self.FUNCTION in kinds
+                                      or self.VARIADIC_FUNCTION in kinds or self.USER_FUNCTION in kinds):
+                tokens.append(name)
                 tokens.append('(')
-                return (i + len(func_name) + 1, "")
+                return (end + 1, self.FUNCTION)
+            elif self.VARIABLE in kinds:
+                tokens.append(name)
+                return (end, self.VARIABLE)
+            elif self.CONSTANT in kinds and not followed_by_paren:
+                if name in self.dynamic_constants:
+                    # Dynamic constants (e.g. `ans`) are resolved by the evaluator at run time
+                    tokens.append(name)
+                else:
+                    tokens.append(self.constants[name])
+                return (end, self.CONSTANT)
         return None
-    
+
+    @staticmethod
+    def _merge_matches(registry: List[Tuple[int, str, set]],
+                       variables: List[Tuple[int, str, set]]) -> List[Tuple[int, str, set]]:
+        """Combine two shortest-first match lists, uniting kinds for names found in both."""
+        if not variables:
+            return registry
+        by_end = {end: (name, set(kinds)) for end, name, kinds in registry}
+        for end, name, kinds in variables:
+            if end in by_end:
+                by_end[end][1].update(kinds)
+            else:
+                by_end[end] = (name, kinds)
+        return [(end, name, kinds) for end, (name, kinds) in sorted(by_end.items())]
+
     def _is_unary_minus(self, i: int, tokens: List) -> bool:
         return (i == 0 or
                 (tokens and tokens[-1] in ['(', '+', '-', '*', '/', '%', '^', ',', '~']))
-    
-    def _handle_unary_minus(self, query: str, i: int, tokens: List) -> tuple:
+
+    def _handle_unary_minus(self, query: str, i: int, tokens: List,
+                            variable_names: Optional[NameTrie] = None) -> tuple:
         i += 1
         while i < len(query) and query[i] == ' ':
             i += 1
@@ -187,49 +233,24 @@ class Tokenizer:
             tokens.append('~')
             return (i, "")
 
-        all_names = (list(self.functions.keys()) +
-                    list(self.binary_functions.keys()) +
-                    list(self.constants.keys()))
-
-        # Check if followed by a function or constant
-        for name in all_names:
-            if query.startswith(name, i):
-                # For -func(...), transform to (0-func(...))
-                tokens.append('(')
-                tokens.append(0.0)
-                tokens.append('-')
-                return (i, "pending_close")
+        # Check if followed by a function, constant or variable
+        if (self.names.starts_with_name(query, i) or
+                (variable_names is not None and variable_names.starts_with_name(query, i))):
+            # For -func(...), transform to (0-func(...))
+            tokens.append('(')
+            tokens.append(0.0)
+            tokens.append('-')
+            return (i, "pending_close")
 
         if query[i] == '(':
             tokens.append('~')
             return (i, "")
 
-        neg_num = ""
-        while i < len(query) and (query[i].isdigit() or query[i] == '.'):
-            neg_num += query[i]
-            i += 1
-
-        if neg_num:
-            # Check for scientific notation
-            if i < len(query) and query[i] in 'eE':
-                next_idx = i + 1
-                if next_idx < len(query) and query[next_idx] in '+-':
-                    neg_num += query[i:next_idx+1]
-                    i = next_idx + 1
-                    while i < len(query) and query[i].isdigit():
-                        neg_num += query[i]
-                        i += 1
-                elif next_idx < len(query) and query[next_idx].isdigit():
-                    neg_num += query[i]
-                    i += 1
-                    while i < len(query) and query[i].isdigit():
-                        neg_num += query[i]
-                        i += 1
-            tokens.append(-self._parse_float(neg_num))
-            return (i, "")
+        if query[i].isdigit() or query[i] == '.':
+            return (self._read_number(query, i, tokens, negate=True), "")
         else:
             raise ValueError("Invalid expression: operator followed by operator")
-    
+
     def _parse_float(self, num_str: str) -> float:
         try:
             return float(num_str)
@@ -0,0 +1,158 @@
+from typing import Callable, Dict, List, Mapping, Optional, Tuple
+
+from calculator.funtions.vectorized_functions import VectorizedMathFunctions, require_numpy
+from calculator.util.cse import COMPARISONS, Load, Select, Store, VariadicCall
+from calculator.util.session import Session
+
+
+class VectorizedEvaluator:
+    """
+    Evaluates postfix expressions once over whole NumPy arrays.
+
+    Domain errors do not raise: the affected elements become NaN and are
+    flagged in the error mask returned alongside the result. Each branch of
+    a conditional runs only over the elements that select it.
+    """
+
+    COMPARISON_UFUNCS = {'<': 'less', '<=': 'less_equal', '>': 'greater', '>=': 'greater_equal',
+                         '==': 'equal', '!=': 'not_equal'}
+
+    def __init__(self, functions: Dict, binary_functions: Dict,
+                 dynamic_constants: Optional[Dict[str, Callable[[Session], float]]] = None,
+                 user_functions: Optional[Mapping] = None,
+                 variadic_functions: Optional[Mapping[str, Callable]] = None):
+        self.np = require_numpy()
+        self.functions = functions
+        self.binary_functions = binary_functions
+        self.dynamic_constants = dynamic_constants if dynamic_constants is not None else {}
+        # UserFunctions run their compiled body over the arrays
+        self.user_functions = user_functions if user_functions is not None else {}
+        self.variadic_functions = variadic_functions if variadic_functions is not None else {}
+
+    def evaluate(self, postfix: List, variables: Optional[Dict] = None,
+                 session: Optional[Session] = None) -> Tuple:
+        """
+        Run `postfix` with each variable bound to an array (or scalar).
+
+        Returns:
+            (result, error_mask) broadcast to the common shape of the inputs
+        """
+        np = self.np
+        if not postfix:
+            raise ValueError("Empty postfix expression")
+
+        variables = {name: np.asarray(value, dtype=float) for name, value in (variables or {}).items()}
+        shape = np.broadcast_shapes(*(value.shape for value in variables.values()))
+        errors = np.zeros(shape, dtype=bool)
+        stack = []
+        slots = {}
+
+        with np.errstate(all='ignore'):
+            for token in postfix:
+                if isinstance(token, (int, float)):
+                    stack.append(token)
+                elif token in variables:
+                    stack.append(variables[token])
+                elif token in self.dynamic_constants:
+                    stack.append(self.dynamic_constants[token](session))
+                elif token == '~':
+                    if len(stack) < 1:
+                        raise ValueError("Insufficient operands for unary minus")
+                    stack.append(np.negative(stack.pop()))
+                elif token in self.functions:
+                    if len(stack) < 1:
+                        raise ValueError(f"Insufficient operands for function '{token}'")
+                    val = stack.pop()
+                    stack.append(self._apply(self.functions[token], errors, val))
+                elif token in self.binary_functions:
+                    if len(stack) < 2:
+                        raise ValueError(f"Insufficient operands for function '{token}'")
+                    arg2 = stack.pop()
+                    arg1 = stack.pop()
+                    stack.append(self._apply(self.binary_functions[token], errors, arg1, arg2))
+                elif token in self.user_functions:
+                    function = self.user_functions[token]
+                    if len(stack) < function.arity:
+                        raise ValueError(f"Insufficient operands for function '{token}'")
+                    arguments = stack[-function.arity:]
+                    del stack[-function.arity:]
+                    value, failed = self.evaluate(function.postfix, dict(zip(function.parameters, arguments)))
+                    errors |= np.broadcast_to(failed, errors.shape)
+                    stack.append(value)
+                elif type(token) is VariadicCall:
+                    if len(stack) < token.count:
+                        raise ValueError(f"Insufficient operands for function '{token.name}'")
+                    arguments = stack[-token.count:]
+                    del stack[-token.count:]
+                    stack.append(self._apply(self.variadic_functions[token.name], errors, *arguments))
+                elif type(token) is Select:
+                    if not stack:
+                        raise ValueError("Insufficient operands for conditional")
+                    stack.append(self._select(token, stack.pop(), variables, shape, errors, session))
+                elif type(token) is Load:
+                    stack.append(slots[token.slot])
+                elif type(token) is Store:
+                    if not stack:
+                        raise ValueError("Nothing to store")
+                    slots[token.slot] = stack[-1]
+                elif token in COMPARISONS or token in "+-*/%^":
+                    if len(stack) < 2:
+                        raise ValueError(f"Insufficient operands for operator '{token}'")
+                    num2 = stack.pop()
+                    num1 = stack.pop()
+                    stack.append(self._apply(self._calc, errors, num1, num2, token))
+                else:
+                    raise ValueError(f"Invalid token in postfix: {token}")
+
+        if len(stack) != 1:
+            raise ValueError("Invalid expression: too many operands")
+
+        result = np.broadcast_to(np.asarray(stack[0], dtype=float), shape).copy()
+        return result, errors
+
+    def _select(self, select: Select, condition, variables: Dict, shape: Tuple, errors, session):
+        """Run each branch of `select` on the elements whose `condition` picks it."""
+        np = self.np
+        taken = np.broadcast_to(np.not_equal(condition, 0), shape)
+        if taken.all() or not taken.any():
+            branch = select.then if taken.all() else select.otherwise
+            value, failed = self.evaluate(branch, variables, session)
+            errors |= failed
+            return value
+        result = np.empty(shape)
+        for mask, branch in ((taken, select.then), (~taken, select.otherwise)):
+            subset = {name: np.broadcast_to(value, shape)[mask] for name, value in variables.items()}
+            value, failed = self.evaluate(branch, subset, session)
+            result[mask] = value
+            errors[mask] |= failed
+        return result
+
+    def _apply(self, func: Callable, errors, *args):
+        """Call `func` and flag elements that turned into NaN from non-NaN inputs."""
+        np = self.np
+        operands = args[:2] if func == self._calc else args
+        result = func(*args)
+        failed = np.isnan(result)
+        for operand in operands:
+            failed = failed & ~np.isnan(operand)
+        errors |= np.broadcast_to(failed, errors.shape)
+        return result
+
+    def _calc(self, num1, num2, op: str):
+        np = self.np
+        if op == '+':
+            return np.add(num1, num2)
+        elif op == '-':
+            return np.subtract(num1, num2)
+        elif op == '*':
+            return np.multiply(num1, num2)
+        elif op == '/':
+            return np.where(np.equal(num2, 0), np.nan, np.divide(num1, num2))
+        elif op == '%':
+            return np.where(np.equal(num2, 0), np.nan, np.mod(num1, num2))
+        elif op == '^':
+            return VectorizedMathFunctions.safe_power(num1, num2)
+        elif op in COMPARISONS:
+            return np.where(getattr(np, self.COMPARISON_UFUNCS[op])(num1, num2), 1.0, 0.0)
+        else:
+            raise ValueError(f"Unknown operator: {op}")
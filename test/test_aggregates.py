@@ -0,0 +1,83 @@
+import math
+import statistics
+import unittest
+
+from calculator.funtions.vectorized_functions import np
+from calculator.stack_queue_calc import StackQueueCalculator
+
+# (query, error message) for aggregates called with too few arguments
+ERRORS = [
+    ("variance(5)", "variance requires at least two values"),
+    ("stdev(5)", "stdev requires at least two values"),
+    ("median()", "Function 'median' expects at least 1 argument(s), got 0"),
+    ("sum()", "Function 'sum' expects at least 1 argument(s), got 0"),
+    ("mean()", "Function 'mean' expects at least 1 argument(s), got 0"),
+]
+
+# Python counterparts of the aggregates
+REFERENCE = {
+    "sum": math.fsum,
+    "mean": statistics.fmean,
+    "variance": statistics.variance,
+    "stdev": statistics.stdev,
+    "median": statistics.median,
+    "max": max,
+    "min": min,
+}
+
+
+def arguments(count: int):
+    """Distinct expressions of x, so nothing is folded at compile time, and their values at x."""
+    return [f"x*{i % 97 + 1}+{i}" for i in range(count)], lambda x: [x * (i % 97 + 1) + i for i in range(count)]
+
+
+class AggregateTest(unittest.TestCase):
+
+    def setUp(self):
+        self.calc = StackQueueCalculator()
+
+    def test_errors(self):
+        for query, message in ERRORS:
+            with self.subTest(query=query), self.assertRaises(ValueError) as raised:
+                self.calc.evaluate(query)
+            self.assertEqual(str(raised.exception), message)
+
+    def test_exact_results(self):
+        # Correctly rounded sum; Welford's method keeps large offsets from cancelling
+        self.assertEqual(self.calc.evaluate("sum(0.1, 0.2, 0.3)"), 0.6)
+        self.assertEqual(self.calc.evaluate("variance(1e9+1, 1e9+2, 1e9+3)"), 1.0)
+        self.assertEqual(self.calc.evaluate("stdev(1e15, 1e15+2)"), math.sqrt(2))
+
+    def test_many_arguments_match_python(self):
+        for count in (10, 1000):
+            args, values = arguments(count)
+            for name, reference in REFERENCE.items():
+                with self.subTest(name=name, count=count):
+                    program = self.calc.compile(f"{name}({','.join(args)})", ("x",))
+                    expected = reference(values(0.37))
+                    for _ in range(3):  # Interpreted runs, then the native code
+                        self.assertAlmostEqual(program.evaluate({"x": 0.37}), expected,
+                                               delta=1e-9 * abs(expected))
+                    program.compile_native()
+                    self.assertAlmostEqual(program.evaluate({"x": 0.37}), expected, delta=1e-9 * abs(expected))
+
+    def test_nested_max_matches_variadic(self):
+        args, _ = arguments(200)
+        nested = args[0]
+        for arg in args[1:]:
+            nested = f"max({nested},{arg})"
+        self.assertEqual(self.calc.evaluate(nested, {"x": 0.37}),
+                         self.calc.evaluate(f"max({','.join(args)})", {"x": 0.37}))
+
+    @unittest.skipIf(np is None, "numpy is not installed")
+    def test_vectorized_matches_scalar(self):
+        xs = np.linspace(-2, 2, 9)
+        for name in REFERENCE:
+            query = f"{name}(x, 2*x+1, x^2, 3)"
+            with self.subTest(name=name):
+                expected = [self.calc.evaluate(query, {"x": float(x)}) for x in xs]
+                np.testing.assert_allclose(self.calc.evaluate_vectorized(query, x=xs), expected, rtol=1e-12)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,141 @@
+import math
+import os
+import pickle
+import tempfile
+import unittest
+
+from calculator.stack_queue_calc import StackQueueCalculator
+from calculator.util.batch import BatchError
+from calculator.util.budget import Budget
+from calculator.util.program_store import ProgramStore
+from test.test_cases import test_cases
+
+
+class WorkerStateTest(unittest.TestCase):
+    """Batches with worker processes see the same calculator state as in-process batches."""
+
+    def assertSameInWorkers(self, calc, queries):
+        expected = calc.evaluate_batch(queries)
+        self.assertFalse(any(isinstance(result, BatchError) for result in expected), expected)
+        self.assertEqual(calc.evaluate_batch(queries, workers=2, chunksize=1), expected)
+        self.assertEqual(calc.evaluate_batch_arrays(queries, workers=2, chunksize=1).results(), expected)
+
+    def rebuilt(self, calc):
+        return StackQueueCalculator.from_worker_state(pickle.loads(pickle.dumps(calc.worker_state())))
+
+    def test_ans_and_memory(self):
+        calc = StackQueueCalculator()
+        calc.session.ans = 5.0
+        calc.memory_add(2.0)
+        self.assertSameInWorkers(calc, ["ans*2", "ans+1"])
+        worker = self.rebuilt(calc)
+        self.assertEqual((worker.session.ans, worker.session.memory), (5.0, 2.0))
+
+    def test_memoization(self):
+        calc = StackQueueCalculator()
+        calc.enable_memoization(["fact", "nCr"], maxsize=16)
+        self.assertSameInWorkers(calc, ["fact(10)", "nCr(10, 3)", "fact(10)+1"])
+        worker = self.rebuilt(calc)
+        self.assertEqual(set(worker.memoization_stats()), {"fact", "nCr"})
+
+    def test_user_functions(self):
+        calc = StackQueueCalculator()
+        calc.define("ke(m, v)", "0.5*m*v^2")
+        calc.define("twice_ke(m, v)", "2*ke(m, v)")
+        self.assertSameInWorkers(calc, ["ke(2, 3)", "twice_ke(2, 3)+1", "ke(ans, 1)"])
+        self.assertEqual(calc.evaluate_batch(["twice_ke(2, 3)"], workers=2), [18.0])
+        worker = self.rebuilt(calc)
+        self.assertEqual(list(worker.user_functions), ["ke", "twice_ke"])
+
+    def test_user_functions_with_memoization(self):
+        calc = StackQueueCalculator()
+        calc.define("choose(n, k)", "nCr(n, k)")
+        calc.enable_memoization(["nCr"])
+        self.assertSameInWorkers(calc, ["choose(10, 3)", "choose(10, 3)*2"])
+
+    def test_budget(self):
+        calc = StackQueueCalculator()
+        calc.session.ans = 3.0
+        calc.session.budget = Budget(max_length=10, max_steps=2, max_work=None, max_int_bits=None)
+        queries = ["ans", "ans*ans", "123456789+1"]
+        results = calc.evaluate_batch(queries)
+        self.assertEqual(results[0], 3.0)
+        self.assertEqual([result.message for result in results[1:]],
+                         ["Expression too long: 3 operations (budget 2)",
+                          "Expression too long: 11 characters (budget 10)"])
+        for workers in (1, 2):
+            self.assertEqual(calc.evaluate_batch(queries, workers=workers, chunksize=1), results)
+            self.assertEqual(calc.evaluate_batch_arrays(queries, workers=workers, chunksize=1).results(),
+                             results)
+        self.assertEqual(repr(self.rebuilt(calc).session.budget), repr(calc.session.budget))
+
+    def test_program_store(self):
+        with tempfile.TemporaryDirectory() as directory:
+            calc = StackQueueCalculator()
+            calc.attach_program_store(directory)
+            calc.evaluate("2*(3+4)")
+            calc.program_store.flush()
+            files = sorted(os.listdir(directory))
+            self.assertSameInWorkers(calc, ["2*(3+4)", "sqrt(16)+1"])
+            # Workers load stored programs but never write the store
+            self.assertEqual(sorted(os.listdir(directory)), files)
+            worker = self.rebuilt(calc)
+            self.assertTrue(worker.program_store.read_only)
+            worker.evaluate("2*(3+4)")
+            self.assertEqual(worker.program_store.stats()["hits"], 1)
+            worker.evaluate("9-1")
+            self.assertEqual(worker.program_store.stats()["pending"], 0)
+
+    def test_read_only_store_ignores_put(self):
+        with tempfile.TemporaryDirectory() as directory:
+            store = ProgramStore(directory, read_only=True)
+            calc = StackQueueCalculator(program_store=store)
+            calc.evaluate("1+2")
+            self.assertEqual(store.flush(), 0)
+            self.assertEqual(os.listdir(directory), [])
+
+
+# Domain errors, division by zero and syntax errors
+INVALID = [
+    "sqrt(-1)", "recip(0)", "(2+3", "2+*3", "ln(0)", "1/0", "fact(-1)", "2+3)",
+    "sin(", "acos(2)", "nCr(5)", "2 $ 3", "log(-10)*2", "((1+2)*3", "5 % 0",
+]
+
+
+class BatchArraysTest(unittest.TestCase):
+    """evaluate_batch_arrays() reports every row as evaluate_batch() does, without raising."""
+
+    def assertSameRows(self, calc, queries):
+        expected = calc.evaluate_batch(queries)
+        arrays = calc.evaluate_batch_arrays(queries)
+        self.assertEqual(len(arrays), len(queries))
+        for row, result in enumerate(expected):
+            with self.subTest(query=queries[row]):
+                if isinstance(result, BatchError):
+                    self.assertEqual(arrays.errors[row], result)
+                    self.assertNotEqual(arrays.codes[row], 0)
+                    self.assertTrue(math.isnan(arrays.values[row]))
+                else:
+                    self.assertEqual(arrays.codes[row], 0)
+                    self.assertEqual(arrays.positions[row], -1)
+                    self.assertEqual(arrays.values[row], result)
+        self.assertEqual(arrays.results(), expected)
+
+    def test_corpus_with_errors(self):
+        queries = [query for query, _ in test_cases] + INVALID
+        self.assertSameRows(StackQueueCalculator(), queries)
+
+    def test_repeated_errors(self):
+        # The second pass answers known failures from the caches
+        calc = StackQueueCalculator()
+        queries = (INVALID + ["2+2"]) * 3
+        self.assertSameRows(calc, queries)
+        self.assertSameRows(calc, queries)
+
+    def test_syntax_error_positions(self):
+        arrays = StackQueueCalculator().evaluate_batch_arrays(["2+*3", "1+1", "(2+3"])
+        self.assertEqual(list(arrays.positions), [2, -1, 4])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,89 @@
+import math
+import time
+import unittest
+
+from calculator.funtions.math_functions import MathFunctions
+from calculator.stack_queue_calc import StackQueueCalculator
+from calculator.util.budget import Budget, BudgetExceeded, Cost, CostEstimator
+from calculator.util.cse import Select
+
+FUNCTIONS = ('floor', 'round', 'abs', 'sqrt', 'exp10')
+BINARY_FUNCTIONS = ('pow', 'max')
+
+
+class CostEstimatorTest(unittest.TestCase):
+
+    def estimate(self, postfix, user_functions=None):
+        return CostEstimator(FUNCTIONS, BINARY_FUNCTIONS, user_functions).estimate(postfix)
+
+    def test_integer_power_with_literal_exponent(self):
+        cost = self.estimate([3, 100, '^'])
+        self.assertEqual((cost.steps, cost.int_bits), (3, 200))  # 3 has 2 bits
+        self.assertEqual(cost.work, 3 + (2 + 7 + 200) / 64)
+        self.assertEqual(self.estimate([3, 100, 'pow']).int_bits, 200)
+        self.assertEqual(self.estimate([3, -2, '^']).int_bits, 2)  # A float result
+        self.assertEqual(self.estimate([1, 10 ** 6, '^']).int_bits, 20)  # Powers of 1 stay small
+
+    def test_integer_power_with_unknown_exponent(self):
+        # floor() of a float is an integer, but its value is not known here
+        self.assertEqual(self.estimate([3, 2.5, 'floor', '^']).int_bits, math.inf)
+        self.assertEqual(self.estimate([3, 'x', '^']).int_bits, 2)  # Unknown size: capped at run time
+        self.assertEqual(self.estimate([3.0, 100, '^']).int_bits, 7)  # A float base
+
+    def test_floor_and_round_raised_to_powers(self):
+        self.assertEqual(self.estimate([2.5, 'floor']).int_bits, 1024)
+        self.assertEqual(self.estimate([2.5, 'round', 3, '^']).int_bits, 3072)
+        self.assertEqual(self.estimate([2.5, 'sqrt', 'floor', 2, 'pow']).int_bits, 2048)
+        self.assertEqual(self.estimate([7, 'floor', 3, '^']).int_bits, 9)  # Already an integer
+
+    def test_select_charges_the_dearer_branch(self):
+        dear = [3, 100, '^', 1, '+']
+        cheap = [1.0]
+        for then, otherwise in ((dear, cheap), (cheap, dear)):
+            with self.subTest(then=then):
+                cost = self.estimate(['x', 0.0, '>', Select(then, otherwise)])
+                self.assertEqual(cost.steps, 4 + len(dear))
+                self.assertEqual(cost.int_bits, 201)
+        cost = self.estimate(['x', Select(cheap, cheap)])
+        self.assertEqual((cost.steps, cost.int_bits), (3, 0))
+
+    def test_user_function_body_cost(self):
+        calc = StackQueueCalculator()
+        function = calc.define("cube(t)", "t*t*t+1")
+        cost = self.estimate(['x', 'cube'], {'cube': function})
+        self.assertEqual(cost.steps, 2 + len(function.postfix))
+        self.assertEqual(cost.work, 2 + len(function.postfix))
+        self.assertEqual(self.estimate([2.0, 'x', 'cube', '+'], {'cube': function}).steps,
+                         4 + len(function.postfix))
+
+
+class BudgetTest(unittest.TestCase):
+
+    def test_each_limit(self):
+        budget = Budget(max_length=10, max_steps=5, max_work=50, max_int_bits=64)
+        budget.admit_text("1+2+3+4+5")
+        budget.admit(Cost(steps=5, work=50, int_bits=64))
+        for cost, message in ((Cost(steps=6), "Expression too long: 6 operations (budget 5)"),
+                              (Cost(int_bits=65), "builds integers of about 65 bits (budget 64)"),
+                              (Cost(work=51), "about 51 work units (budget 50)")):
+            with self.subTest(message=message), self.assertRaises(BudgetExceeded) as raised:
+                budget.admit(cost)
+            self.assertIn(message, str(raised.exception))
+        with self.assertRaises(BudgetExceeded) as raised:
+            budget.admit_text("1+2+3+4+5+6")
+        self.assertEqual(str(raised.exception), "Expression too long: 11 characters (budget 10)")
+
+    def test_huge_combinatorics_are_refused_without_computing(self):
+        for function in (MathFunctions.safe_combination, MathFunctions.safe_permutation):
+            for n, r in ((1e9, 5e5), (1e300, 1e8)):
+                with self.subTest(function=function.__name__, n=n, r=r):
+                    start = time.perf_counter()
+                    with self.assertRaises(OverflowError):
+                        function(n, r)
+                    self.assertLess(time.perf_counter() - start, 0.5)
+        self.assertEqual(MathFunctions.safe_combination(1e300, 1e300), 1.0)
+        self.assertEqual(MathFunctions.safe_combination(1e8, 5), float(math.comb(10 ** 8, 5)))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -308,6 +308,85 @@ test_cases = [
     
     # Mixed functions
     ("sin(pi/4)*cos(pi/4) + tan(pi/4)", math.sin(math.pi/4)*math.cos(math.pi/4) + math.tan(math.pi/4)),
+    
+    # ==================== Tokenizer ====================
+    # Longest name wins: `exp(` is not the constant `e` followed by `xp(`
+    ("exp(2) + exp10(2)", math.exp(2) + 100),
+    
+    # Scientific notation with signed exponents
+    ("1.5e-3 + 2.5E+3", 1.5e-3 + 2.5e3),
+    
+    # ==================== Aggregates ====================
+    ("sum(1, 2, 3.5)", 6.5),
+    ("sum(7)", 7.0),
+    ("mean(1, 2, 3, 4)", 2.5),
+    ("variance(1, 2, 3, 4)", 5 / 3),
+    ("stdev(2, 4, 4, 4, 5, 5, 7, 9)", math.sqrt(32 / 7)),
+    ("median(3, 1, 2)", 2.0),
+    ("median(4, 1, 3, 2)", 2.5),
+    ("max(3, 9, 2, 7)", 9.0),
+    ("min(3, 9, 2, 7)", 2.0),
+    ("gcd(12, 18, 30)", 6.0),
+    ("lcm(2, 3, 4)", 12.0),
+    
+    # Aggregates of expressions
+    ("mean(sin(pi/2), 2^2, sqrt(16))", 3.0),
+    ("sum(1, 2)*median(2, 4, 9)", 12.0),
+    
+    # ==================== Comparisons ====================
+    # 1 for true, 0 for false; they bind looser than arithmetic
+    ("3<4", 1.0),
+    ("3<=3", 1.0),
+    ("4>5", 0.0),
+    ("5>=5", 1.0),
+    ("2==2", 1.0),
+    ("2!=2", 0.0),
+    ("1+1==2", 1.0),
+    ("2*(1<2)", 2.0),
+    
+    # ==================== Conditionals ====================
+    ("if(2>1, 10, 20)", 10.0),
+    ("if(0, 10, 20)+1", 21.0),
+    ("if(1, 2, 3)^2", 4.0),
+    ("and(2, 3)", 1.0),
+    ("and(1, 0)", 0.0),
+    ("or(0, 5)", 1.0),
+    ("or(0, 0)", 0.0),
+    
+    # The branch not taken is never evaluated, so its errors do not surface
+    ("if(0, 1/0, 5)", 5.0),
+    ("if(1, 5, ln(0))", 5.0),
+    ("if(1>2, fact(-1), 7)", 7.0),
+    ("and(0, ln(0))", 0.0),
+    ("or(1, sqrt(-1))", 1.0),
+    
+    # ==================== Unary Minus ====================
+    # Before a number, constant or call it negates just that operand
+    ("-2^2", 4.0),
+    ("2*-3^2", 18.0),
+    ("-pi^2", math.pi**2),
+    ("-sqrt(4)^2", 4.0),
+    ("2^-1^2", 2.0),
+    
+    # Before a parenthesis it binds looser than ^ and tighter than *, / and %
+    ("-(2)^2", -4.0),
+    ("-(1+1)^2", -4.0),
+    ("-(5)%3", 1.0),
+    ("2^-(1)", 0.5),
+    
+    # Repeated minus signs
+    ("--2^2", -4.0),
+    ("3--2^2", -1.0),
+    
+    # ==================== Implicit Multiplication ====================
+    ("2pi", 2*math.pi),
+    ("3sin(pi/2)", 3.0),
+    ("2(3+4)", 14.0),
+    ("(2)(3)", 6.0),
+    ("(1+1)pi", 2*math.pi),
+    ("2sqrt(9)^2", 18.0),
+    ("-2pi", -2*math.pi),
+    ("-2(3)^2", -18.0),
 ]
 # test_cases = [
 #     # Step 1: inner subtraction
@@ -0,0 +1,55 @@
+import contextlib
+import io
+import unittest
+
+from calculator.cli import build_parser, main, server_budget
+from calculator.util.budget import BudgetExceeded, Cost
+
+
+class AngleOptionTest(unittest.TestCase):
+
+    def stream(self, *arguments, text="sin(90)\n"):
+        out = io.StringIO()
+        main(["stream", *arguments], stdin=io.StringIO(text), stdout=out)
+        return out.getvalue()
+
+    def test_unit_names_and_case(self):
+        self.assertEqual(self.stream("--angle", "degrees"), "1.0\n")
+        self.assertEqual(self.stream("--angle", "DEG"), "1.0\n")
+        self.assertEqual(self.stream("--angle", "turns", text="cos(1)\n"), "1.0\n")
+
+    def test_unknown_unit_is_rejected(self):
+        for command in (["stream"], ["serve"]):
+            with self.subTest(command=command[0]), contextlib.redirect_stderr(io.StringIO()) as err:
+                with self.assertRaises(SystemExit) as exit_:
+                    build_parser().parse_args([*command, "--angle", "degree"])
+                self.assertEqual(exit_.exception.code, 2)
+                self.assertIn("invalid choice: 'degree'", err.getvalue())
+
+
+class ServeBudgetTest(unittest.TestCase):
+    """`serve` enforces only the limits given on its command line."""
+
+    def budget(self, *arguments):
+        return server_budget(build_parser().parse_args(["serve", *arguments]))
+
+    def test_no_limits(self):
+        self.assertIsNone(self.budget())
+
+    def test_only_given_limits_apply(self):
+        budget = self.budget("--max-steps", "5")
+        self.assertEqual((budget.max_length, budget.max_steps, budget.max_work, budget.max_int_bits),
+                         (None, 5, None, None))
+        budget.admit_text("1+" * 10_000 + "1")
+        budget.admit(Cost(steps=5, work=10 ** 9, int_bits=10 ** 9))
+        with self.assertRaises(BudgetExceeded):
+            budget.admit(Cost(steps=6))
+        budget = self.budget("--max-int-bits", "64")
+        self.assertEqual((budget.max_steps, budget.max_int_bits), (None, 64))
+        budget.admit(Cost(steps=10 ** 6, int_bits=64))
+        with self.assertRaises(BudgetExceeded):
+            budget.admit(Cost(int_bits=65))
+
+
+if __name__ == "__main__":
+    unittest.main()
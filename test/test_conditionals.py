@@ -0,0 +1,66 @@
+import math
+import unittest
+
+from calculator.funtions.vectorized_functions import np
+from calculator.stack_queue_calc import StackQueueCalculator
+
+# A tiered price: a cheap flat rate up to the threshold, an expensive volume formula above it
+VOLUME = "+".join(f"ln(q+{i})*sqrt(q/{i})*exp(-{i}/q)" for i in range(1, 6))
+EAGER = f"(q > 1000)*({VOLUME}) + (q <= 1000)*(q*2.5)"
+LAZY = f"if(q > 1000, {VOLUME}, q*2.5)"
+
+# (query, x at which only the untaken branch would fail, result)
+GUARDED = [
+    ("if(x>0, ln(x), 0)", 0.0, 0.0),
+    ("if(x!=0, 1/x, 0)", 0.0, 0.0),
+    ("if(x>=0, sqrt(x), -1)", -4.0, -1.0),
+    ("and(x, 1/x)", 0.0, 0.0),
+    ("or(x==0, ln(x))", 0.0, 1.0),
+    ("if(x<=1, acos(x), fact(-1))", 0.5, math.acos(0.5)),
+]
+
+
+class ConditionalTest(unittest.TestCase):
+
+    def setUp(self):
+        self.calc = StackQueueCalculator()
+
+    def test_untaken_branch_errors_are_suppressed(self):
+        for query, x, expected in GUARDED:
+            with self.subTest(query=query):
+                program = self.calc.compile(query, ("x",))
+                self.assertEqual(program.evaluate({"x": x}), expected)
+                program.compile_native()
+                self.assertEqual(program.evaluate({"x": x}), expected)
+
+    def test_taken_branch_errors_surface(self):
+        for query in ("if(1, 1/0, 5)", "if(0, 5, ln(0))", "and(1, ln(0))", "or(0, sqrt(-1))"):
+            with self.subTest(query=query), self.assertRaises((ValueError, ZeroDivisionError)):
+                self.calc.evaluate(query)
+
+    def test_short_circuit_matches_masking(self):
+        eager, lazy = self.calc.compile(EAGER, ("q",)), self.calc.compile(LAZY, ("q",))
+        for q in (1.0, 999.5, 1000.0, 1000.5, 5000.0):
+            with self.subTest(q=q):
+                self.assertAlmostEqual(lazy.evaluate({"q": q}), eager.evaluate({"q": q}), places=9)
+
+    @unittest.skipIf(np is None, "numpy is not installed")
+    def test_vectorized(self):
+        quantities = np.linspace(1, 3000, 301)
+        expected = [self.calc.evaluate(LAZY, {"q": float(q)}) for q in quantities]
+        np.testing.assert_allclose(self.calc.evaluate_vectorized(LAZY, q=quantities), expected, rtol=1e-12)
+        np.testing.assert_allclose(self.calc.evaluate_vectorized(EAGER, q=quantities), expected, rtol=1e-12)
+
+    @unittest.skipIf(np is None, "numpy is not installed")
+    def test_vectorized_masks_only_taken_branch_errors(self):
+        x = np.array([-1.0, 0.0, 4.0])
+        values, mask = self.calc.evaluate_vectorized("if(x>=0, sqrt(x), 0)", return_mask=True, x=x)
+        np.testing.assert_array_equal(values, [0.0, 0.0, 2.0])
+        self.assertFalse(mask.any())
+        values, mask = self.calc.evaluate_vectorized("if(x>0, ln(x), 1/x)", return_mask=True, x=x)
+        np.testing.assert_array_equal(mask, [False, True, False])
+        self.assertEqual(values[0], -1.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,94 @@
+import math
+import unittest
+
+from calculator.enum.angle import AngleUnit
+from calculator.funtions.vectorized_functions import np
+from calculator.stack_queue_calc import StackQueueCalculator
+from calculator.util.dual_compiler import DualCompiler
+
+# Points away from the kinks and steps of every function (no integers or halves);
+# the ones outside a function's domain are skipped
+POINTS = [0.3, 0.7, 1.6, 2.2, 3.1, -0.4, -1.7]
+PAIRS = [(0.3, 0.7), (2.2, 0.7), (1.6, -1.7), (-0.4, 2.7), (3.1, 4.2), (-2.1, 3.3), (7.3, 2.2)]
+STEP = 1e-6
+
+
+class GradientTest(unittest.TestCase):
+    """Every derivative rule agrees with a central finite difference of the function it belongs to."""
+
+    def expressions(self, calc):
+        derivatives = calc.registry.dual_evaluator.derivatives
+        for name in sorted(set(calc.functions) - {'rand'}):
+            for x in POINTS:
+                yield f"{name}(x)", {"x": x}
+        for name in sorted(set(derivatives.binary) | set(calc.binary_functions)):
+            call = f"x {name} y" if name in derivatives.binary and len(name) == 1 else f"{name}(x, y)"
+            for x, y in PAIRS:
+                yield call, {"x": x, "y": y}
+        for name in sorted(derivatives.variadic):
+            for x, y in PAIRS:
+                yield f"{name}(x, y, 1.3)", {"x": x, "y": y}
+
+    @staticmethod
+    def finite_difference(program, point, name):
+        h = STEP * max(1.0, abs(point[name]))
+        values = []
+        for shift in (h, -h):
+            value = program.evaluate({**point, name: point[name] + shift})
+            if isinstance(value, complex):
+                return None
+            values.append(value)
+        return (values[0] - values[1]) / (2 * h)
+
+    def cases(self, unit):
+        """(calculator, program, query, point, value, {name: finite difference}) where defined."""
+        calc = StackQueueCalculator(angle_unit=unit)
+        for query, point in self.expressions(calc):
+            program = calc.compile(query, tuple(point))
+            try:
+                value = program.evaluate(point)
+                estimates = {name: self.finite_difference(program, point, name) for name in point}
+            except (ArithmeticError, ValueError):
+                continue
+            if isinstance(value, complex) or None in estimates.values():
+                continue
+            yield calc, program, query, point, value, estimates
+
+    def assertPartials(self, partials, estimates):
+        for name, estimate in estimates.items():
+            self.assertTrue(math.isclose(partials[name], estimate, rel_tol=1e-5, abs_tol=1e-6),
+                            f"∂/∂{name}: {partials[name]} != {estimate}")
+
+    def test_scalar_and_native(self):
+        for unit in (AngleUnit.RADIANS, AngleUnit.DEGREES):
+            for calc, program, query, point, value, estimates in self.cases(unit):
+                with self.subTest(unit=unit.value, query=query, point=point):
+                    result, partials = calc.gradient(query, point)
+                    self.assertEqual(result, value)
+                    self.assertPartials(partials, estimates)
+                    native = DualCompiler(calc.registry.dual_evaluator).compile(program.postfix,
+                                                                                 program.variables)
+                    result, partials = native(point, calc.session)
+                    self.assertEqual(result, value)
+                    self.assertPartials(partials, estimates)
+
+    @unittest.skipIf(np is None, "numpy is not installed")
+    def test_vectorized(self):
+        for unit in (AngleUnit.RADIANS, AngleUnit.DEGREES):
+            for calc, program, query, point, value, estimates in self.cases(unit):
+                with self.subTest(unit=unit.value, query=query, point=point):
+                    at = {name: np.array([x]) for name, x in point.items()}
+                    values, partials, errors = calc.gradient_vectorized(query, at, return_mask=True)
+                    self.assertFalse(errors[0])
+                    self.assertTrue(math.isclose(values[0], value, rel_tol=1e-12))
+                    self.assertPartials({name: partial[0] for name, partial in partials.items()}, estimates)
+
+    def test_lcm(self):
+        calc = StackQueueCalculator()
+        self.assertEqual(calc.gradient("lcm(x, y)", {"x": 3.0, "y": 4.0}), (12.0, {"x": 4.0, "y": 3.0}))
+        self.assertEqual(calc.gradient("lcm(x, y, 2)", {"x": -3.0, "y": 4.0}), (12.0, {"x": -4.0, "y": 3.0}))
+        self.assertEqual(calc.gradient("lcm(x, y)", {"x": 0.0, "y": 4.0}), (0.0, {"x": 0.0, "y": 0.0}))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,51 @@
+import math
+import unittest
+
+from calculator.stack_queue_calc import StackQueueCalculator
+from test.test_cases import test_cases
+
+VARIABLES = ("x", "y")
+BINDING = {"x": 0.7, "y": 42.0}
+
+# Formulas over the variables: shared subexpressions, calls of every arity, conditionals
+FORMULAS = [
+    "sin(x)^2+sin(x)^2*y",
+    "(x+y)*(x+y)-(x+y)/2",
+    "if(x>0, sqrt(y), ln(x))",
+    "and(x<1, y/x>10)+or(x>1, 0)",
+    "max(x, y, 3)+min(x, y)+sum(x, y, 1)",
+    "nCr(y, 3)+hypot(x, y)+logb(2, y)",
+    "-x^2+2^-y",
+    "x*exp(-y/100)+atan(y)",
+]
+
+
+def same(a, b) -> bool:
+    return a == b or (isinstance(a, float) and isinstance(b, float) and math.isnan(a) and math.isnan(b))
+
+
+class OpcodeTest(unittest.TestCase):
+    """Opcode programs give the same results as postfix lists and disassemble back to them."""
+
+    def test_round_trip_and_results(self):
+        calc = StackQueueCalculator()
+        evaluator = calc.evaluator
+        opcodes = evaluator.opcodes
+        checked = 0
+        for query in [query for query, _ in test_cases] + FORMULAS:
+            # Constant folding is skipped so that constant-only expressions keep their operations
+            postfix = calc.cse.eliminate(calc.parser.parse_postfix(query, VARIABLES))
+            try:
+                expected = evaluator.evaluate(postfix, BINDING)
+            except Exception:
+                continue
+            with self.subTest(query=query):
+                program = opcodes.assemble(postfix, VARIABLES)
+                self.assertTrue(same(opcodes.evaluate(program, BINDING), expected))
+                self.assertEqual(repr(opcodes.disassemble(program)), repr(postfix))
+                checked += 1
+        self.assertGreater(checked, len(test_cases))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,46 @@
+import unittest
+
+from calculator.stack_queue_calc import StackQueueCalculator
+
+VARIABLES = ("x",)
+BINDING = {"x": 0.5}
+TOKENS = 20_000  # Far deeper than the interpreter's recursion limit
+
+# (shape, expression of about TOKENS tokens, value at x = 0.5)
+SHAPES = [
+    ("flat", "x" + "+x*2-x*3" * (TOKENS // 8), 0.5 - 0.5 * (TOKENS // 8)),
+    ("nested", "(" * (TOKENS // 6) + "x" + "+1)*1" * (TOKENS // 6), 0.5 + TOKENS // 6),
+    ("tower", "x" + "^1" * (TOKENS // 2), 0.5),
+    ("negations", "-" * (TOKENS - 1) + "x", -0.5),
+    ("calls", "abs(" * (TOKENS // 3) + "x" + ")" * (TOKENS // 3), 0.5),
+]
+
+
+class ParserTest(unittest.TestCase):
+
+    def setUp(self):
+        self.calc = StackQueueCalculator()
+
+    def test_long_expressions(self):
+        for name, query, expected in SHAPES:
+            with self.subTest(shape=name):
+                self.assertEqual(self.calc.compile(query, VARIABLES).evaluate(BINDING), expected)
+
+    def test_bytes_input_matches_str(self):
+        for name, query, _ in SHAPES:
+            with self.subTest(shape=name):
+                data = memoryview(query.encode())
+                self.assertEqual(repr(self.calc.parser.parse_postfix(data, VARIABLES)),
+                                 repr(self.calc.parser.parse_postfix(query, VARIABLES)))
+                self.assertEqual(self.calc.compile(data, VARIABLES).evaluate(BINDING),
+                                 self.calc.compile(query, VARIABLES).evaluate(BINDING))
+
+    def test_syntax_error_positions(self):
+        for query, position in (("2+*3", 2), ("(2+3", 4), ("2 + (3 * )", 9), ("nCr(5)", 0), ("1+median()", 2)):
+            with self.subTest(query=query), self.assertRaises(ValueError) as raised:
+                self.calc.evaluate(query)
+            self.assertEqual(raised.exception.position, position)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,66 @@
+import os
+import tempfile
+import unittest
+
+from calculator.stack_queue_calc import StackQueueCalculator
+from calculator.util.program_store import ProgramStore
+from test.test_cases import test_cases
+
+VARIABLES = ("x", "y")
+
+
+class ProgramStoreTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def calculator(self):
+        calc = StackQueueCalculator()
+        calc.attach_program_store(ProgramStore(self.directory.name))
+        return calc
+
+    def test_round_trip(self):
+        calc = self.calculator()
+        queries = ["2+3*ans", "max(ans, 1, 2)", "x^2+sin(x)"]
+        expected = [calc.evaluate(query, {"x": 0.5} if "x" in query else None) for query in queries]
+        self.assertEqual(calc.program_store.flush(), 3)
+        self.assertEqual(calc.program_store.flush(), 0)
+
+        restarted = self.calculator()
+        results = [restarted.evaluate(query, {"x": 0.5} if "x" in query else None) for query in queries]
+        self.assertEqual(results, expected)
+        self.assertEqual(restarted.program_store.stats()["hits"], 3)
+
+    def test_loaded_programs_are_identical(self):
+        formulas = [query for query, _ in test_cases] + ["x*y+sin(x)^2+sin(x)^2", "max(x, y, 1)+gcd(12, 18, 30)"]
+        compile_all = lambda calc: [repr(calc.compile(query, VARIABLES).postfix) for query in formulas]
+        cold = compile_all(StackQueueCalculator())
+        calc = self.calculator()
+        compile_all(calc)
+        calc.program_store.flush()
+
+        warm = self.calculator()
+        self.assertEqual(compile_all(warm), cold)
+        stats = warm.program_store.stats()
+        self.assertEqual(stats["misses"], sum("select(" in postfix for postfix in cold))  # Conditionals
+        self.assertEqual(stats["pending"], 0)
+
+    def test_conditionals_are_not_queued(self):
+        calc = self.calculator()
+        store = calc.program_store
+        calc.evaluate("if(ans>0, 1, 2)")
+        calc.evaluate("and(ans, 1/ans)")
+        self.assertEqual(store.stats()["pending"], 0)
+        self.assertEqual(store.flush(), 0)
+        self.assertEqual(os.listdir(self.directory.name), [])
+
+        calc.evaluate("ans+1")
+        calc.evaluate("or(ans, 2)")
+        self.assertEqual(store.stats()["pending"], 1)
+        self.assertEqual(store.flush(), 1)
+        self.assertEqual(store.stats()["stored"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,56 @@
+import asyncio
+import json
+import unittest
+
+from calculator.server import CalculatorServer
+
+
+class ServerResponseTest(unittest.TestCase):
+    """Every request gets a valid JSON response line, and the connection stays usable."""
+
+    def exchange(self, requests):
+        async def run():
+            server = CalculatorServer(workers=2)
+            listener = await server.start_tcp("127.0.0.1", 0)
+            port = listener.sockets[0].getsockname()[1]
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            lines = []
+            try:
+                for request in requests:
+                    writer.write(request.encode() + b"\n")
+                    await writer.drain()
+                    lines.append(await asyncio.wait_for(reader.readline(), 5))
+            finally:
+                writer.close()
+                listener.close()
+                await listener.wait_closed()
+                server.close()
+            return lines
+        # Strict parsing: Infinity and NaN in a response would fail here
+        return [json.loads(line, parse_constant=self.fail) for line in asyncio.run(run())]
+
+    def test_complex_result_is_an_error(self):
+        complex_, after = self.exchange(['{"id": 1, "expr": "(-8)^(1/3)"}', '{"id": 2, "expr": "1+1"}'])
+        self.assertEqual(complex_["id"], 1)
+        self.assertEqual(complex_["error"]["type"], "ValueError")
+        self.assertIn("not a real number", complex_["error"]["message"])
+        self.assertEqual(after, {"id": 2, "result": 2.0})
+
+    def test_infinite_and_nan_results_are_errors(self):
+        infinite, nan, after = self.exchange(['{"id": 1, "expr": "1e308*10"}',
+                                              '{"id": 2, "expr": "1e308*10-1e308*10"}',
+                                              '{"id": 3, "expr": "2*3"}'])
+        for response in (infinite, nan):
+            self.assertEqual(response["error"]["type"], "ValueError")
+            self.assertIn("not finite", response["error"]["message"])
+        self.assertEqual(after, {"id": 3, "result": 6.0})
+
+    def test_non_json_constants_in_requests_are_rejected(self):
+        rejected, after = self.exchange(['{"id": NaN, "expr": "1"}', '{"id": 2, "expr": "4/2"}'])
+        self.assertEqual(rejected, {"id": None, "error": {"type": "ValueError",
+                                                          "message": "Invalid JSON constant: NaN"}})
+        self.assertEqual(after, {"id": 2, "result": 2.0})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,78 @@
+import unittest
+
+from calculator.funtions.vectorized_functions import np
+from calculator.stack_queue_calc import StackQueueCalculator
+
+# (expression, bracket, minimizers, minimum). The secant search's first midpoint is a maximum
+# in the first row and an inflection in the second; the low end is a maximum in the last.
+MINIMA = [
+    ("x^4-x^2", (-2, 2), (-0.5 ** 0.5, 0.5 ** 0.5), -0.25),
+    ("x^4/4-x^3/3", (-2, 2), (1.0,), -1 / 12),
+    ("x^3-3*x", (-1, 2), (1.0,), -2.0),
+]
+
+
+class MinimizeTest(unittest.TestCase):
+    """minimize() and minimize_vectorized() return minima, never other stationary points."""
+
+    def setUp(self):
+        self.calc = StackQueueCalculator()
+
+    def test_scalar(self):
+        for query, bracket, minimizers, value in MINIMA:
+            for method in ("secant", "brent"):
+                with self.subTest(query=query, bracket=bracket, method=method):
+                    result = self.calc.minimize(query, "x", bracket, method=method)
+                    self.assertTrue(result.converged)
+                    self.assertEqual(result.method, method)
+                    self.assertAlmostEqual(min(abs(result.x - x) for x in minimizers), 0, places=7)
+                    self.assertAlmostEqual(result.value, value, places=12)
+
+    @unittest.skipIf(np is None, "numpy is not installed")
+    def test_vectorized(self):
+        for query, bracket, minimizers, value in MINIMA:
+            with self.subTest(query=query, bracket=bracket):
+                result = self.calc.minimize_vectorized(query, "x", bracket)
+                self.assertTrue(result.converged)
+                self.assertAlmostEqual(min(abs(float(result.x) - x) for x in minimizers), 0, places=9)
+                self.assertAlmostEqual(float(result.value), value, places=12)
+
+    @unittest.skipIf(np is None, "numpy is not installed")
+    def test_vectorized_matches_scalar(self):
+        shifts = np.linspace(-0.5, 0.5, 11)
+        batch = self.calc.minimize_vectorized("x^4-x^2+a*x", "x", (-2, 2), variables={"a": shifts})
+        for a, x in zip(shifts, batch.x):
+            self.assertAlmostEqual(x, self.calc.minimize("x^4-x^2+a*x", "x", (-2, 2), variables={"a": a}).x)
+
+
+@unittest.skipIf(np is None, "numpy is not installed")
+class SolveVectorizedTest(unittest.TestCase):
+    """A problem without a root in its bracket fails alone; the rest of the batch is solved."""
+
+    def setUp(self):
+        self.calc = StackQueueCalculator()
+
+    def assertSolved(self, result, roots):
+        for x, converged, root in zip(result.x, result.converged, roots):
+            if root is None:
+                self.assertFalse(converged)
+                self.assertTrue(np.isnan(x))
+            else:
+                self.assertTrue(converged)
+                self.assertAlmostEqual(x, root, places=10)
+
+    def test_no_sign_change(self):
+        result = self.calc.solve_vectorized("x^2-c", "x", (0, 10), variables={"c": [2.0, 9.0, -1.0]})
+        self.assertSolved(result, [2 ** 0.5, 3.0, None])
+        with self.assertRaises(ValueError):
+            self.calc.solve("x^2-c", "x", (0, 10), variables={"c": -1.0})
+
+    def test_undefined_at_an_end(self):
+        result = self.calc.solve_vectorized("sqrt(x)-c", "x", ([0.0, -1.0, 1.0], 10), variables={"c": 2.0})
+        self.assertSolved(result, [4.0, None, 4.0])
+        result = self.calc.solve_vectorized("sqrt(x)-c", "x", (-1, 10), variables={"c": [2.0, 1.0]})
+        self.assertSolved(result, [None, None])
+
+
+if __name__ == "__main__":
+    unittest.main()
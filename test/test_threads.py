@@ -0,0 +1,105 @@
+import random
+import sys
+import threading
+import unittest
+from typing import Callable, List
+
+from calculator.enum.angle import AngleUnit
+from calculator.funtions.registry import FunctionRegistry
+from calculator.stack_queue_calc import StackQueueCalculator
+from calculator.util.lru_cache import LRUCache
+from calculator.util.session import Session
+from test.test_cases import test_cases
+
+THREADS = 8
+
+
+def run_threads(work: Callable[[int], None], threads: int = THREADS) -> List[BaseException]:
+    """Run work(index) on `threads` threads started together; returns what they raised."""
+    barrier = threading.Barrier(threads)
+    errors = []
+
+    def worker(index: int) -> None:
+        barrier.wait()
+        try:
+            work(index)
+        except BaseException as e:
+            errors.append(e)
+
+    pool = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    return errors
+
+
+class ThreadStressTest(unittest.TestCase):
+    """Shared caches and registries under many threads, switching as often as the interpreter allows."""
+
+    def setUp(self):
+        interval = sys.getswitchinterval()
+        sys.setswitchinterval(1e-6)
+        self.addCleanup(sys.setswitchinterval, interval)
+
+    def test_lru_cache(self):
+        cache = LRUCache(64)
+
+        def work(index: int) -> None:
+            rng = random.Random(index)
+            for i in range(20_000):
+                key = rng.randrange(256)
+                value = cache.get(key)
+                if value is None:
+                    cache.put(key, ("value", key))
+                else:
+                    assert value == ("value", key), (key, value)
+                if i % 5000 == 4999:
+                    cache.resize(32 if cache.maxsize == 64 else 64)
+
+        self.assertEqual(run_threads(work), [])
+        self.assertLessEqual(len(cache), cache.maxsize)
+        self.assertEqual(len(list(cache._data)), len(cache))
+        stats = cache.stats()
+        self.assertLessEqual(stats.hits + stats.misses, THREADS * 20_000)
+
+    def test_registry_is_built_once(self):
+        unit = AngleUnit.GRADIANS
+        original = FunctionRegistry._instances.pop(unit, None)
+        try:
+            registries = [None] * THREADS
+
+            def work(index: int) -> None:
+                registries[index] = FunctionRegistry.for_unit(unit)
+
+            self.assertEqual(run_threads(work), [])
+            self.assertEqual(len({id(registry) for registry in registries}), 1)
+        finally:
+            if original is not None:
+                FunctionRegistry._instances[unit] = original
+
+    def test_shared_calculator_with_sessions(self):
+        calc = StackQueueCalculator(cache_size=16)  # Smaller than the corpus: constant eviction
+        calc.enable_memoization(["fact", "nCr"], maxsize=4)
+        queries = [query for query, _ in test_cases if "ans" not in query and "rand" not in query] + ["fact(20)/fact(18)", "nCr(30, 4)"]
+        expected = [calc.evaluate(query) for query in queries]
+        increment = calc.compile("ans + 1")
+
+        def work(index: int) -> None:
+            session = Session(ans=index * 1000)
+            for i in range(1000):
+                session.ans = increment.evaluate(session=session)
+            assert session.ans == (index + 1) * 1000, session.ans
+            rng = random.Random(index)
+            for _ in range(2000):
+                row = rng.randrange(len(queries))
+                result = calc.evaluate(queries[row], session=Session())
+                assert result == expected[row], (queries[row], result, expected[row])
+
+        self.assertEqual(run_threads(work), [])
+        self.assertLessEqual(len(calc.program_cache), 16)
+        self.assertEqual(calc.session.ans, expected[-1])  # Untouched by the threads' sessions
+
+
+if __name__ == "__main__":
+    unittest.main()
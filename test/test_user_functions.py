@@ -0,0 +1,68 @@
+import unittest
+
+from calculator.funtions.user_function import UserFunction
+from calculator.stack_queue_calc import StackQueueCalculator
+
+BODY = "0.5*m*v^2 + m*9.81*h"
+VARIABLES = ("x", "y", "z")
+
+# (signature, body, error message) of definitions that must be rejected
+INVALID = [
+    ("f(x)", "x+", "In function 'f': Expression ends with operator"),
+    ("sin(x)", "x", "Cannot redefine built-in name: 'sin'"),
+    ("pi(x)", "x", "Cannot redefine built-in name: 'pi'"),
+    ("g(a,a)", "a", "Duplicate parameter in 'g(a,a)'"),
+    ("h(x)", "y", "In function 'h': Invalid character: 'y'"),
+    ("k(x)", "ans*x", "Function 'k' cannot use ans: pass it as an argument instead"),
+]
+
+
+def padded(body: str) -> str:
+    """`body` plus terms that add nothing, enough to exceed the inlining limit."""
+    return body + "".join(f" + 0*m*{i}" for i in range(UserFunction.INLINE_MAX_NODES // 4 + 1))
+
+
+class UserFunctionTest(unittest.TestCase):
+
+    def setUp(self):
+        self.calc = StackQueueCalculator()
+
+    def test_inlined_and_called_match_hand_written(self):
+        self.calc.define("energy(m, v, h)", BODY)
+        large = self.calc.define("energy_called(m, v, h)", padded(BODY))
+        self.assertIsNotNone(self.calc.user_functions["energy"].body)
+        self.assertIsNone(large.body)
+        programs = [self.calc.compile(query, VARIABLES) for query in
+                    ("0.5*x*y^2 + x*9.81*z + sqrt(x)", "energy(x, y, z) + sqrt(x)",
+                     "energy_called(x, y, z) + sqrt(x)")]
+        for i in range(60):  # Long enough to run natively as well
+            binding = {"x": 1 + i % 50, "y": i % 7 * 0.5, "z": i % 11}
+            expected = programs[0].evaluate(binding)
+            for program in programs[1:]:
+                self.assertAlmostEqual(program.evaluate(binding), expected, delta=1e-9 * max(1.0, abs(expected)))
+
+    def test_python_call(self):
+        energy = self.calc.define("energy(m, v, h)", BODY)
+        self.assertAlmostEqual(energy(2, 3, 4), 0.5 * 2 * 9 + 2 * 9.81 * 4)
+
+    def test_invalid_definitions(self):
+        for signature, body, message in INVALID:
+            with self.subTest(signature=signature), self.assertRaises(ValueError) as raised:
+                self.calc.define(signature, body)
+            self.assertEqual(str(raised.exception), message)
+        self.assertEqual(dict(self.calc.user_functions), {})
+
+    def test_undefine(self):
+        self.calc.define("sq(x)", "x^2")
+        self.calc.define("quad(x)", "sq(sq(x))")
+        self.assertEqual(self.calc.evaluate("quad(2)"), 16.0)
+        with self.assertRaises(ValueError):
+            self.calc.undefine("sq")  # quad still uses it
+        self.calc.undefine("quad")
+        self.calc.undefine("sq")
+        with self.assertRaises(ValueError):
+            self.calc.evaluate("sq(2)")
+
+
+if __name__ == "__main__":
+    unittest.main()
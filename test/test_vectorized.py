@@ -0,0 +1,67 @@
+import math
+import time
+import unittest
+
+from calculator.funtions.vectorized_functions import np
+from calculator.stack_queue_calc import StackQueueCalculator
+
+
+@unittest.skipIf(np is None, "numpy is not installed")
+class VectorizedParityTest(unittest.TestCase):
+    """evaluate_vectorized() flags exactly the points where evaluate() raises, and agrees elsewhere."""
+
+    EXPRESSIONS = [
+        "x^y", "pow(x, y)", "exp10(y)", "x/y", "x%y", "sqrt(x)*y", "ln(x)+y",
+        "exp(x)", "e(y)", "sinh(x)", "cosh(x)", "csch(x)", "sech(x)", "nrt(x, y)",
+        "gcd(x, y)", "lcm(x, y)", "nPr(x, y)", "nCr(x, y)",
+    ]
+    POINTS = [0.0, -0.5, -1.0, -2.0, 0.5, 1.0, 2.0, 3.0, 400.0, -400.0, 1000.0, 2e5, 1e8, 1e300]
+
+    def setUp(self):
+        self.calc = StackQueueCalculator()
+
+    def test_masks_and_values_match_scalar(self):
+        xs, ys = np.meshgrid(self.POINTS, self.POINTS)
+        xs, ys = xs.ravel(), ys.ravel()
+        for query in self.EXPRESSIONS:
+            values, errors = self.calc.evaluate_vectorized(query, return_mask=True, x=xs, y=ys)
+            for x, y, value, error in zip(xs, ys, values, errors):
+                with self.subTest(query=query, x=x, y=y):
+                    try:
+                        expected = self.calc.evaluate(query, {"x": float(x), "y": float(y)})
+                        if isinstance(expected, complex):
+                            raise ValueError("complex result")
+                    except (ArithmeticError, ValueError):
+                        self.assertTrue(error)
+                        self.assertTrue(math.isnan(value))
+                        continue
+                    self.assertFalse(error)
+                    self.assertTrue(math.isclose(value, expected, rel_tol=1e-12, abs_tol=1e-300))
+
+    def test_zero_to_negative_power_is_flagged(self):
+        for query in ("0^x", "pow(0, x)"):
+            with self.assertRaises(ZeroDivisionError):
+                self.calc.evaluate(query, {"x": -1.0})
+            values, errors = self.calc.evaluate_vectorized(query, return_mask=True, x=np.array([-1.0, 2.0]))
+            self.assertEqual(errors.tolist(), [True, False])
+            self.assertTrue(math.isnan(values[0]))
+            self.assertEqual(values[1], 0.0)
+
+    def test_huge_combinatorics_are_flagged_without_computing(self):
+        start = time.perf_counter()
+        values, errors = self.calc.evaluate_vectorized("nCr(x, 200000)", return_mask=True,
+                                                       x=np.array([1e8, 1e300, 200001.0]))
+        self.assertLess(time.perf_counter() - start, 0.5)
+        self.assertEqual(errors.tolist(), [True, True, False])
+        self.assertEqual(values[2], 200001.0)
+
+    def test_overflow_is_flagged(self):
+        with self.assertRaises(OverflowError):
+            self.calc.evaluate("10.0^x", {"x": 400.0})
+        values, errors = self.calc.evaluate_vectorized("10.0^x", return_mask=True, x=np.array([400.0, 2.0]))
+        self.assertEqual(errors.tolist(), [True, False])
+        self.assertEqual(values[1], 100.0)
+
+
+if __name__ == "__main__":
+    unittest.main()